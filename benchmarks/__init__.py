@@ -0,0 +1 @@
+"""Throughput benchmarks: DataPipeline end to end against deterministic in-process fakes"""
@@ -0,0 +1,69 @@
+# dataset.py
+import csv
+import io
+import json
+import random
+from datetime import date, timedelta
+from typing import Iterator, List, Dict, Any, Optional
+
+# Columns of get_athena_source_query() output; child_data holds the vehicle ROWs cast to JSON
+HEADERS = ['orgno', 'child_data']
+
+VEHICLE_STATUSES = ['I trafik', 'I trafik', 'I trafik', 'Avställd', 'Avregistrerad']
+VEHICLE_TYPES = ['Personbil', 'Personbil', 'Personbil', 'Lätt lastbil', 'Tung lastbil', 'Motorcykel', 'Moped', 'Buss', 'Släpvagn']
+BRANDS = ['VOLVO', 'VOLKSWAGEN', 'TOYOTA', 'KIA', 'TESLA', 'BMW', 'MERCEDES-BENZ', 'SCANIA', 'FORD', 'RENAULT', 'SKODA', 'AUDI']
+FUELS = ['Bensin', 'Diesel', 'El', 'Elhybrid', 'Laddhybrid', 'Etanol', 'Gas']
+
+def _day(rng: random.Random, start_year: int, end_year: int) -> date:
+    start = date(start_year, 1, 1)
+    return start + timedelta(days=rng.randrange((date(end_year, 12, 31) - start).days))
+
+def vehicle(rng: random.Random, orgno: str) -> Dict[str, Any]:
+    """One child_data element: the ROW fields in query order, typed the way the JSON cast renders them"""
+    vehicle_year = rng.randint(1990, 2025)
+    first_in_traffic = _day(rng, vehicle_year, min(vehicle_year + 1, 2025))
+    imported = rng.random() < 0.1
+    fuels = rng.sample(FUELS, rng.choice((1, 1, 1, 2, 3)))
+    return {
+        'orgno': int(orgno),
+        'vehicle_status': rng.choice(VEHICLE_STATUSES),
+        'vehicle_type': rng.choice(VEHICLE_TYPES),
+        'brand': rng.choice(BRANDS),
+        'vehicle_year': vehicle_year,
+        'model_year': vehicle_year + rng.choice((0, 0, 1)),
+        'last_ownership_change': _day(rng, vehicle_year, 2025).isoformat(),
+        'pre_registered_date': (first_in_traffic - timedelta(days=rng.randrange(1, 60))).isoformat(),
+        'first_in_traffic_date': first_in_traffic.isoformat(),
+        'first_on_roads_date': (_day(rng, vehicle_year, 2025) if imported else first_in_traffic).isoformat(),
+        'next_inspection_due_date': _day(rng, 2025, 2027).isoformat() if rng.random() < 0.9 else None,
+        'registered_for_commercial_traffic': 'true' if rng.random() < 0.15 else 'false',
+        'imported': imported,
+        'leasing': rng.random() < 0.3,
+        'purchased_on_credit': rng.random() < 0.2,
+        'odometer_reading': rng.randrange(0, 45000) if rng.random() < 0.95 else None,
+        'odometer_unit': 'mil',
+        'fuel_type_1': fuels[0],
+        'fuel_type_2': fuels[1] if len(fuels) > 1 else None,
+        'fuel_type_3': fuels[2] if len(fuels) > 2 else None
+    }
+
+def generate_rows(organizations: int, seed: int = 0, max_vehicles: int = 50) -> Iterator[List[str]]:
+    """
+    Result rows as Athena returns them: orgno and the JSON text of its vehicle array.
+    Fleet sizes are skewed like the real extract: most organizations own one to three vehicles,
+    a few own dozens. The same seed always yields the same rows.
+    """
+    rng = random.Random(seed)
+    for index in range(organizations):
+        orgno = str(5560000000 + index)
+        count = min(max_vehicles, int(rng.paretovariate(1.2)))
+        vehicles = [vehicle(rng, orgno) for _ in range(count)]
+        yield [orgno, json.dumps(vehicles, ensure_ascii=False, separators=(',', ':'))]
+
+def to_athena_csv(rows: Iterator[List[str]], headers: Optional[List[str]] = None) -> bytes:
+    """Render rows the way Athena writes its result CSV (every field quoted)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_ALL, lineterminator='\n')
+    writer.writerow(headers or HEADERS)
+    writer.writerows(rows)
+    return buffer.getvalue().encode('utf-8')
@@ -0,0 +1,261 @@
+# fakes.py
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, Tuple, Any, Optional
+from botocore.exceptions import ClientError
+from opensearchpy.exceptions import TransportError
+from opensearchpy.serializer import JSONSerializer
+
+def draw(seed: int, *key) -> float:
+    """
+    A uniform value in [0, 1) fixed by the seed and key. Faults are decided by what is being
+    sent and how often it was sent before, so a run injects the same faults whatever order
+    the threads get to them.
+    """
+    digest = hashlib.blake2b(':'.join(map(str, (seed,) + key)).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') / 2**64
+
+class Latency:
+    """Simulated service time: a fixed delay plus up to jitter more, drawn per request"""
+
+    def __init__(self, seconds: float = 0.0, jitter: float = 0.0, seed: int = 0):
+        self.seconds = seconds
+        self.jitter = jitter
+        self.seed = seed
+
+    def wait(self, *key) -> None:
+        delay = self.seconds + (self.jitter * draw(self.seed, 'latency', *key) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+class _Attempts:
+    """How often each key was sent, for decisions that depend on the attempt"""
+
+    def __init__(self):
+        self._counts: Dict[Any, int] = {}
+        self._lock = threading.Lock()
+
+    def next(self, key: Any) -> int:
+        with self._lock:
+            attempt = self._counts[key] = self._counts.get(key, 0) + 1
+        return attempt
+
+class FakeAthenaClient:
+    """Runs every query for query_seconds, then points at the result object"""
+
+    def __init__(self, output_location: str, data_scanned_bytes: int = 0, query_seconds: float = 0.0):
+        self.output_location = output_location
+        self.data_scanned_bytes = data_scanned_bytes
+        self.query_seconds = query_seconds
+        self._started: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def start_query_execution(self, QueryString, **kwargs):
+        with self._lock:
+            query_execution_id = f"bench-{len(self._started) + 1}"
+            self._started[query_execution_id] = time.monotonic()
+        return {'QueryExecutionId': query_execution_id}
+
+    def get_query_execution(self, QueryExecutionId):
+        elapsed = time.monotonic() - self._started[QueryExecutionId]
+        done = elapsed >= self.query_seconds
+        return {
+            'QueryExecution': {
+                'QueryExecutionId': QueryExecutionId,
+                'Status': {'State': 'SUCCEEDED' if done else 'RUNNING'},
+                'Statistics': {
+                    'DataScannedInBytes': self.data_scanned_bytes if done else 0,
+                    'EngineExecutionTimeInMillis': int(elapsed * 1000)
+                },
+                'ResultConfiguration': {'OutputLocation': self.output_location}
+            }
+        }
+
+class _StreamingBody:
+    def __init__(self, data: memoryview):
+        self._data = data
+
+    def read(self) -> bytes:
+        return bytes(self._data)
+
+    def iter_chunks(self, chunk_size: int = 1024):
+        for start in range(0, len(self._data), chunk_size):
+            yield bytes(self._data[start:start + chunk_size])
+
+class FakeS3Client:
+    """Serves objects from memory, honouring Range headers, with latency on every GET"""
+
+    def __init__(self, objects: Dict[Tuple[str, str], bytes], latency: Optional[Latency] = None):
+        self.objects = {location: memoryview(body) for location, body in objects.items()}
+        self.latency = latency or Latency()
+        self.get_requests = 0
+        self._lock = threading.Lock()
+
+    def _lookup(self, bucket: str, key: str, operation: str) -> memoryview:
+        if (bucket, key) not in self.objects:
+            raise ClientError({'Error': {'Code': 'NoSuchKey', 'Message': 'Not found'}}, operation)
+        return self.objects[(bucket, key)]
+
+    def head_object(self, Bucket, Key):
+        return {'ContentLength': len(self._lookup(Bucket, Key, 'HeadObject'))}
+
+    def get_object(self, Bucket, Key, Range=None):
+        data = self._lookup(Bucket, Key, 'GetObject')
+        with self._lock:
+            self.get_requests += 1
+        self.latency.wait(Key, Range)
+        if Range:
+            start, end = Range.split('=')[1].split('-')
+            data = data[int(start):int(end) + 1]
+        return {'Body': _StreamingBody(data)}
+
+class _Transport:
+    def __init__(self):
+        self.serializer = JSONSerializer()
+
+    def close(self):
+        pass
+
+class FakeOpenSearchClient:
+    """
+    Answers _bulk requests action by action after the configured latency.
+    A request_reject_rate fraction of requests fails whole with a 429; of the rest, each action
+    is rejected with a 429 at reject_rate and fails for good (400) at fail_rate. Only the action
+    lines are decoded, so the fake adds little CPU to the sink stage it runs in.
+    """
+
+    def __init__(self, latency: Optional[Latency] = None, reject_rate: float = 0.0,
+                 request_reject_rate: float = 0.0, fail_rate: float = 0.0, seed: int = 0):
+        self.transport = _Transport()
+        self.latency = latency or Latency()
+        self.reject_rate = reject_rate
+        self.request_reject_rate = request_reject_rate
+        self.fail_rate = fail_rate
+        self.seed = seed
+        self.requests = 0
+        self.rejected_requests = 0
+        self.rejected_actions = 0
+        self._attempts = _Attempts()
+        self._lock = threading.Lock()
+
+    def bulk(self, body, request_timeout=None, **kwargs):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        actions = []
+        lines = body.split(b'\n')
+        index = 0
+        while index < len(lines):
+            if not lines[index]:
+                index += 1
+                continue
+            op_type, meta = next(iter(json.loads(lines[index]).items()))
+            index += 1 if op_type == 'delete' else 2
+            actions.append((op_type, str(meta.get('_id'))))
+
+        # A request is identified by its first action, so retries of it are told apart
+        first_id = actions[0][1] if actions else ''
+        attempt = self._attempts.next(('request', first_id))
+        with self._lock:
+            self.requests += 1
+        self.latency.wait('bulk', first_id, attempt)
+        if self.request_reject_rate and draw(self.seed, 'request', first_id, attempt) < self.request_reject_rate:
+            with self._lock:
+                self.rejected_requests += 1
+            raise TransportError(429, 'es_rejected_execution_exception', {})
+
+        items = []
+        rejected = 0
+        for op_type, doc_id in actions:
+            attempt = self._attempts.next(doc_id)
+            if self.reject_rate and draw(self.seed, 'reject', doc_id, attempt) < self.reject_rate:
+                rejected += 1
+                items.append({op_type: {'_id': doc_id, 'status': 429,
+                                        'error': {'type': 'es_rejected_execution_exception'}}})
+            elif self.fail_rate and draw(self.seed, 'fail', doc_id) < self.fail_rate:
+                items.append({op_type: {'_id': doc_id, 'status': 400,
+                                        'error': {'type': 'mapper_parsing_exception'}}})
+            else:
+                items.append({op_type: {'_id': doc_id, 'status': 200}})
+        if rejected:
+            with self._lock:
+                self.rejected_actions += rejected
+        return {'errors': any(next(iter(item.values()))['status'] >= 300 for item in items), 'items': items}
+
+    def delete_by_query(self, index, body, **kwargs):
+        self.latency.wait('delete_by_query', index)
+        return {'deleted': 0}
+
+def _throttle_error(operation: str) -> ClientError:
+    return ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException',
+                                  'Message': 'The level of configured provisioned throughput for the table was exceeded'}},
+                       operation)
+
+class FakeDynamoDBResource:
+    """
+    BatchWriteItem after the configured latency. A throttle_rate fraction of requests is
+    throttled whole; of the rest, each item comes back unprocessed at unprocessed_rate.
+    """
+
+    def __init__(self, key_field: str = 'orgno', latency: Optional[Latency] = None,
+                 throttle_rate: float = 0.0, unprocessed_rate: float = 0.0, seed: int = 0):
+        self.key_field = key_field
+        self.latency = latency or Latency()
+        self.throttle_rate = throttle_rate
+        self.unprocessed_rate = unprocessed_rate
+        self.seed = seed
+        self.requests = 0
+        self.throttled_requests = 0
+        self.unprocessed_items = 0
+        self._attempts = _Attempts()
+        self._lock = threading.Lock()
+
+    def batch_write_item(self, RequestItems, ReturnConsumedCapacity=None, **kwargs):
+        (table_name, requests), = RequestItems.items()
+        keys = [str(request['PutRequest']['Item'].get(self.key_field)) for request in requests]
+        with self._lock:
+            self.requests += 1
+        attempt = self._attempts.next(keys[0])
+        self.latency.wait('batch_write_item', keys[0], attempt)
+        if self.throttle_rate and draw(self.seed, 'throttle', keys[0], attempt) < self.throttle_rate:
+            with self._lock:
+                self.throttled_requests += 1
+            raise _throttle_error('BatchWriteItem')
+
+        unprocessed = [
+            request for request, key in zip(requests, keys)
+            if self.unprocessed_rate and draw(self.seed, 'unprocessed', key, self._attempts.next(('item', key))) < self.unprocessed_rate
+        ]
+        with self._lock:
+            self.unprocessed_items += len(unprocessed)
+        response = {'UnprocessedItems': {table_name: unprocessed} if unprocessed else {}}
+        if ReturnConsumedCapacity:
+            response['ConsumedCapacity'] = [{'TableName': table_name, 'CapacityUnits': float(len(requests) - len(unprocessed))}]
+        return response
+
+class FakeDynamoDBClient:
+    """UpdateItem after the configured latency; a throttle_rate fraction of calls is throttled"""
+
+    def __init__(self, latency: Optional[Latency] = None, throttle_rate: float = 0.0, seed: int = 0):
+        self.latency = latency or Latency()
+        self.throttle_rate = throttle_rate
+        self.seed = seed
+        self.requests = 0
+        self.throttled_requests = 0
+        self._attempts = _Attempts()
+        self._lock = threading.Lock()
+
+    def update_item(self, TableName, Key, AttributeUpdates, ReturnConsumedCapacity=None, **kwargs):
+        key = json.dumps(Key, sort_keys=True)
+        with self._lock:
+            self.requests += 1
+        attempt = self._attempts.next(key)
+        self.latency.wait('update_item', key, attempt)
+        if self.throttle_rate and draw(self.seed, 'throttle', key, attempt) < self.throttle_rate:
+            with self._lock:
+                self.throttled_requests += 1
+            raise _throttle_error('UpdateItem')
+        if ReturnConsumedCapacity:
+            return {'ConsumedCapacity': {'TableName': TableName, 'CapacityUnits': 1.0}}
+        return {}
@@ -0,0 +1,452 @@
+# run_pipeline.py
+"""
+End-to-end DataPipeline benchmark against in-process fakes of Athena, S3, OpenSearch and DynamoDB.
+
+    python -m benchmarks.run_pipeline --organizations 50000 --output run.json
+    python -m benchmarks.run_pipeline --organizations 50000 --log-mode production --baseline run.json
+
+The dataset and every injected fault are fixed by --seed, so two runs of the same scenario
+differ only by the code under test and the machine's noise.
+"""
+import os
+import sys
+import json
+import math
+import time
+import logging
+import argparse
+import resource
+import tempfile
+import threading
+from typing import Callable, Dict, List, Tuple, Any, Literal, Optional, get_args, get_origin
+from pydantic import BaseModel, ConfigDict, Field
+from etl_athena_to_es_dynamodb.athena_source import AthenaDataSource
+from etl_athena_to_es_dynamodb.batch_processor import SimpleBatchProcessor
+from etl_athena_to_es_dynamodb.dynamodb_sink import DynamoDBDataSink
+from etl_athena_to_es_dynamodb.interfaces import TelemetryExporter
+from etl_athena_to_es_dynamodb.logging_setup import configure_logging
+from etl_athena_to_es_dynamodb.models import (AWSConfig, AthenaConfig, OpenSearchConfig, DynamoDBConfig,
+                                              DocumentConfig, BatchConfig, LoggingConfig)
+from etl_athena_to_es_dynamodb.opensearch_sink import OpenSearchDataSink
+from etl_athena_to_es_dynamodb.pipeline import DataPipeline
+from etl_athena_to_es_dynamodb.telemetry import Telemetry
+from etl_athena_to_es_dynamodb.transform_pool import ProcessPoolTransformProcessor
+from etl_athena_to_es_dynamodb.utils import get_athena_source_query
+from benchmarks.dataset import generate_rows, to_athena_csv
+from benchmarks.fakes import (Latency, FakeAthenaClient, FakeS3Client, FakeOpenSearchClient,
+                              FakeDynamoDBResource, FakeDynamoDBClient)
+
+RESULT_BUCKET = 'bench-results'
+RESULT_KEY = 'athena/bench.csv'
+
+# Thread name prefixes of each stage; the pipeline's transform stage runs on the calling thread
+STAGE_THREADS = (
+    ('fetch', ('pipeline-reader', 's3-range-reader')),
+    ('transform', ('MainThread',)),
+    ('opensearch', ('pipeline-OpenSearchDataSink', 'opensearch-bulk')),
+    ('dynamodb', ('pipeline-DynamoDBDataSink', 'dynamodb-writer')),
+    ('sampler', ('benchmark-cpu-sampler',))
+)
+
+class BenchmarkScenario(BaseModel):
+    """One benchmark run: dataset, pipeline settings, fake service behaviour and logging"""
+    model_config = ConfigDict(frozen=True)
+
+    organizations: int = Field(default=20000, ge=1, description="Result rows (organizations) in the synthetic extract")
+    max_vehicles: int = Field(default=50, ge=1, description="Largest fleet of one organization")
+    seed: int = Field(default=0, description="Seed of the dataset and of every injected fault")
+    document_type: Literal['parent', 'child'] = Field(default='child', description="Index one document per organization or per vehicle")
+    batch_size: int = Field(default=1000, ge=1, le=10000, description="Pipeline batch size")
+    max_workers: int = Field(default=4, ge=1, le=10, description="Sink worker threads, shared between the sinks")
+    queue_depth: int = Field(default=4, ge=1, le=100, description="Batches buffered between stages")
+    transform_workers: int = Field(default=0, ge=0, le=64, description="Worker processes converting records; 0 converts in the sinks")
+    athena_query_seconds: float = Field(default=0.2, ge=0, description="Time the fake query runs before it succeeds")
+    s3_read_concurrency: int = Field(default=4, ge=1, le=64, description="Ranges of the result object read in parallel")
+    s3_read_chunk_size: int = Field(default=1024 * 1024, ge=64 * 1024, description="Byte range size of each S3 GET")
+    s3_latency: float = Field(default=0.01, ge=0, description="Seconds added to every S3 GET")
+    opensearch_latency: float = Field(default=0.02, ge=0, description="Seconds added to every _bulk request")
+    opensearch_jitter: float = Field(default=0.01, ge=0, description="Up to this many more seconds per _bulk request")
+    opensearch_bulk_concurrency: int = Field(default=2, ge=1, le=64, description="_bulk requests in flight per sink worker")
+    opensearch_bulk_max_actions: int = Field(default=500, ge=1, description="Actions per _bulk request")
+    opensearch_reject_rate: float = Field(default=0.0, ge=0, le=1, description="Fraction of bulk actions rejected with a 429")
+    opensearch_request_reject_rate: float = Field(default=0.0, ge=0, le=1, description="Fraction of _bulk requests rejected whole with a 429")
+    opensearch_fail_rate: float = Field(default=0.0, ge=0, le=1, description="Fraction of documents failing with a 400")
+    opensearch_retry_base_delay: float = Field(default=0.05, gt=0, description="Base backoff before resending rejected actions")
+    dynamodb_write_mode: Literal['batch_write', 'update'] = Field(default='batch_write', description="BatchWriteItem or UpdateItem")
+    dynamodb_write_concurrency: int = Field(default=4, ge=1, le=64, description="Concurrent DynamoDB requests per batch")
+    dynamodb_latency: float = Field(default=0.005, ge=0, description="Seconds added to every DynamoDB request")
+    dynamodb_jitter: float = Field(default=0.005, ge=0, description="Up to this many more seconds per DynamoDB request")
+    dynamodb_throttle_rate: float = Field(default=0.0, ge=0, le=1, description="Fraction of DynamoDB requests throttled")
+    dynamodb_unprocessed_rate: float = Field(default=0.0, ge=0, le=1, description="Fraction of BatchWriteItem items left unprocessed")
+    dynamodb_adaptive_throttling: bool = Field(default=False, description="Pace DynamoDB writes with the AIMD rate limiter")
+    log_mode: Literal['development', 'production'] = Field(default='development', description="Logging mode under test")
+    log_level: Literal['DEBUG', 'INFO', 'WARNING', 'ERROR'] = Field(default='INFO', description="Root log level")
+    log_file: Optional[str] = Field(None, description="Keep the run's log here; by default it is written to a temporary file")
+    log_payload_sample_rate: float = Field(default=0.0, ge=0, le=1, description="Fraction of record payloads logged at DEBUG")
+
+class LatencyRecorder(TelemetryExporter):
+    """Keeps every observation of the named histograms, for exact percentiles (SRP)"""
+
+    def __init__(self, names: Tuple[str, ...]):
+        self.names = set(names)
+        self.values: Dict[Tuple[str, Tuple], List[float]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def receives_measurements(self) -> bool:
+        return True
+
+    def record(self, kind: str, name: str, value: float, labels: Dict[str, str]) -> None:
+        if kind != 'histogram' or name not in self.names:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.values.setdefault(key, []).append(value)
+
+    def export(self, snapshot: Dict[str, Any]) -> None:
+        pass
+
+    def summary(self, name: str, **labels) -> Dict[str, float]:
+        with self._lock:
+            values = sorted(self.values.get((name, tuple(sorted((k, str(v)) for k, v in labels.items()))), []))
+        if not values:
+            return {'count': 0, 'p50': 0.0, 'p99': 0.0, 'max': 0.0}
+        return {
+            'count': len(values),
+            'p50': round(percentile(values, 0.50), 4),
+            'p99': round(percentile(values, 0.99), 4),
+            'max': round(values[-1], 4)
+        }
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+class StageCpuSampler:
+    """
+    Samples the CPU clock of every thread, and of the transform worker processes, and sums it
+    per pipeline stage (SRP). The last interval of a thread or process before it exits is
+    missed; the run total comes from getrusage, and the difference is reported as unattributed.
+    """
+
+    def __init__(self, interval: float = 0.1, processes: bool = False):
+        self.interval = interval
+        self.processes = processes  # Scanning /proc costs CPU of its own; only when there are workers
+        self._threads: Dict[threading.Thread, float] = {}
+        self._processes: Dict[int, float] = {}
+        self._baseline: Dict[Any, float] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='benchmark-cpu-sampler', daemon=True)
+        self.supported = hasattr(time, 'pthread_getcpuclockid')
+
+    @staticmethod
+    def stage_of(thread_name: str) -> str:
+        for stage, prefixes in STAGE_THREADS:
+            if thread_name.startswith(prefixes):
+                return stage
+        return 'other'
+
+    @staticmethod
+    def _descendant_cpu() -> Dict[int, float]:
+        """CPU seconds of every live descendant process, from /proc; empty where there is no /proc"""
+        parents: Dict[int, int] = {}
+        cpu: Dict[int, float] = {}
+        try:
+            pids = [int(name) for name in os.listdir('/proc') if name.isdigit()]
+        except OSError:
+            return {}
+        ticks = os.sysconf('SC_CLK_TCK')
+        for pid in pids:
+            try:
+                with open(f"/proc/{pid}/stat", encoding='utf-8') as f:
+                    fields = f.read().rsplit(')', 1)[1].split()
+            except (OSError, IndexError):
+                continue
+            parents[pid] = int(fields[1])
+            cpu[pid] = (int(fields[11]) + int(fields[12])) / ticks  # utime + stime
+        descendants = {}
+        for pid in cpu:
+            ancestor = parents.get(pid)
+            while ancestor and ancestor != os.getpid():
+                ancestor = parents.get(ancestor)
+            if ancestor:
+                descendants[pid] = cpu[pid]
+        return descendants
+
+    def _sample(self) -> None:
+        for thread in threading.enumerate():
+            if thread.ident is None:
+                continue
+            try:
+                self._threads[thread] = time.clock_gettime(time.pthread_getcpuclockid(thread.ident))
+            except (OSError, ProcessLookupError):
+                continue  # Exited since enumerate()
+        if self.processes:
+            self._processes.update(self._descendant_cpu())
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        if not self.supported:
+            return
+        self._sample()
+        self._baseline = {**self._threads, **self._processes}
+        self._thread.start()
+
+    def stop(self) -> Dict[str, float]:
+        if not self.supported:
+            return {}
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        stages: Dict[str, float] = {}
+        for thread, cpu in self._threads.items():
+            stage = self.stage_of(thread.name)
+            stages[stage] = stages.get(stage, 0.0) + cpu - self._baseline.get(thread, 0.0)
+        stages['transform_workers'] = sum((cpu - self._baseline.get(pid, 0.0) for pid, cpu in self._processes.items()), 0.0)
+        return stages
+
+def _process_cpu() -> float:
+    """User plus system CPU seconds of this process"""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def build_pipeline(scenario: BenchmarkScenario, result_csv: bytes, telemetry: Telemetry,
+                   workdir: str) -> Tuple[DataPipeline, Callable[[], Dict[str, int]]]:
+    """The production source, sinks and pipeline, with the fakes in place of the AWS clients; also returns a reader of the fakes' counters"""
+    aws_config = AWSConfig(region='eu-north-1')
+    document_config = DocumentConfig(document_type=scenario.document_type, child_relation_type='vehicle')
+
+    source = AthenaDataSource(aws_config, AthenaConfig(
+        database='vehicle_data',
+        table='vehicle_data',
+        s3_output_location=f"s3://{RESULT_BUCKET}/athena/",
+        result_reader='s3',
+        s3_read_chunk_size=scenario.s3_read_chunk_size,
+        s3_read_concurrency=scenario.s3_read_concurrency,
+        poll_initial_interval=0.05,
+        poll_max_interval=0.5
+    ), telemetry)
+    athena = FakeAthenaClient(f"s3://{RESULT_BUCKET}/{RESULT_KEY}", len(result_csv), scenario.athena_query_seconds)
+    s3 = FakeS3Client({(RESULT_BUCKET, RESULT_KEY): result_csv}, Latency(scenario.s3_latency, seed=scenario.seed))
+    source._athena_client = athena
+    source._s3_client = s3
+
+    search = OpenSearchDataSink(OpenSearchConfig(
+        endpoint='localhost',
+        index_name='vehicles',
+        bulk_max_actions=scenario.opensearch_bulk_max_actions,
+        bulk_concurrency=scenario.opensearch_bulk_concurrency,
+        bulk_retry_base_delay=scenario.opensearch_retry_base_delay,
+        bulk_load_marker_path=os.path.join(workdir, 'opensearch_bulk_load.json')
+    ), document_config, telemetry)
+    search_client = FakeOpenSearchClient(
+        Latency(scenario.opensearch_latency, scenario.opensearch_jitter, scenario.seed),
+        reject_rate=scenario.opensearch_reject_rate,
+        request_reject_rate=scenario.opensearch_request_reject_rate,
+        fail_rate=scenario.opensearch_fail_rate,
+        seed=scenario.seed
+    )
+    search._client = search_client
+
+    table = DynamoDBDataSink(aws_config, DynamoDBConfig(
+        table_name='vehicles',
+        overwrite_by_pkeys=['orgno'],
+        write_mode=scenario.dynamodb_write_mode,
+        write_concurrency=scenario.dynamodb_write_concurrency,
+        adaptive_throttling=scenario.dynamodb_adaptive_throttling
+    ), document_config, telemetry)
+    dynamodb_latency = Latency(scenario.dynamodb_latency, scenario.dynamodb_jitter, scenario.seed)
+    table_resource = FakeDynamoDBResource('orgno', dynamodb_latency, scenario.dynamodb_throttle_rate,
+                                          scenario.dynamodb_unprocessed_rate, scenario.seed)
+    table_client = FakeDynamoDBClient(dynamodb_latency, scenario.dynamodb_throttle_rate, scenario.seed)
+    table._resource = table_resource
+    table._client = table_client
+
+    batch_processor = SimpleBatchProcessor(telemetry)
+    if scenario.transform_workers:
+        batch_processor = ProcessPoolTransformProcessor(batch_processor, scenario.transform_workers)
+    pipeline = DataPipeline(source, [search, table], batch_processor, BatchConfig(
+        batch_size=scenario.batch_size,
+        max_workers=scenario.max_workers,
+        queue_depth=scenario.queue_depth,
+        transform_workers=scenario.transform_workers
+    ), telemetry=telemetry)
+
+    def faults() -> Dict[str, int]:
+        return {
+            's3_get_requests': s3.get_requests,
+            'opensearch_requests': search_client.requests,
+            'opensearch_rejected_requests': search_client.rejected_requests,
+            'opensearch_rejected_actions': search_client.rejected_actions,
+            'dynamodb_requests': table_resource.requests + table_client.requests,
+            'dynamodb_throttled_requests': table_resource.throttled_requests + table_client.throttled_requests,
+            'dynamodb_unprocessed_items': table_resource.unprocessed_items
+        }
+    return pipeline, faults
+
+def run_benchmark(scenario: BenchmarkScenario) -> Dict[str, Any]:
+    """
+    Run the pipeline once over the scenario's dataset and measure it.
+    Peak RSS is this process's; transform worker processes only count towards CPU.
+    """
+    rows = list(generate_rows(scenario.organizations, scenario.seed, scenario.max_vehicles))
+    documents = sum(len(json.loads(child_data)) for _, child_data in rows)
+    result_csv = to_athena_csv(rows)
+    del rows
+
+    root = logging.getLogger()
+    root_handlers, root_level = list(root.handlers), root.level
+    recorder = LatencyRecorder(('sink_write_seconds',))
+    telemetry = Telemetry([recorder])
+
+    with tempfile.TemporaryDirectory(prefix='etl-benchmark-') as workdir:
+        logging_session = configure_logging(LoggingConfig(
+            mode=scenario.log_mode,
+            level=scenario.log_level,
+            file=scenario.log_file or os.path.join(workdir, 'benchmark.log'),
+            payload_sample_rate=scenario.log_payload_sample_rate
+        ))
+        try:
+            pipeline, faults = build_pipeline(scenario, result_csv, telemetry, workdir)
+            rss_before_mb = _peak_rss_mb()
+            process_cpu_before = _process_cpu()
+            sampler = StageCpuSampler(processes=scenario.transform_workers > 0)
+            sampler.start()
+            try:
+                results = pipeline.execute(get_athena_source_query())
+            finally:
+                stage_cpu = sampler.stop()
+            process_cpu_after = _process_cpu()
+        finally:
+            logging_session.stop()
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+                handler.close()
+            for handler in root_handlers:
+                root.addHandler(handler)
+            root.setLevel(root_level)
+
+    elapsed = results['elapsed_seconds']
+    # The sampler's own CPU is measurement overhead, not pipeline work
+    process_cpu = process_cpu_after - process_cpu_before - stage_cpu.pop('sampler', 0.0)
+    workers_cpu = stage_cpu.pop('transform_workers', 0.0)
+    cpu = {stage: round(seconds, 3) for stage, seconds in sorted(stage_cpu.items())}
+    if stage_cpu:
+        cpu['unattributed'] = round(max(0.0, process_cpu - sum(stage_cpu.values())), 3)
+    cpu['transform_workers'] = round(workers_cpu, 3)
+    cpu['total'] = round(process_cpu + workers_cpu, 3)
+
+    wall = {
+        'fetch': telemetry.histogram('pipeline_fetch_seconds'),
+        'transform': telemetry.histogram('pipeline_transform_seconds')
+    }
+    return {
+        'scenario': scenario.model_dump(),
+        'records': scenario.organizations,
+        'documents': documents,
+        'input_bytes': len(result_csv),
+        'elapsed_seconds': elapsed,
+        'records_per_second': round(scenario.organizations / elapsed, 1) if elapsed else 0.0,
+        'documents_per_second': round(documents / elapsed, 1) if elapsed else 0.0,
+        'batch_latency_seconds': {
+            sink_name: recorder.summary('sink_write_seconds', sink=sink_name) for sink_name in results['sinks']
+        },
+        'stage_wall_seconds': {stage: round(histogram.sum, 3) if histogram else 0.0 for stage, histogram in wall.items()},
+        'cpu_seconds': cpu,
+        'peak_rss_mb': _peak_rss_mb(),
+        'peak_rss_before_run_mb': rss_before_mb,
+        'sinks': {
+            sink_name: {key: summary[key] for key in ('successful_records', 'failed_records', 'bytes_written', 'mb_per_second')}
+            for sink_name, summary in results['sinks'].items()
+        },
+        'faults': faults()
+    }
+
+# Headline figures compared against a baseline run, and whether higher is better
+COMPARED = (
+    (('records_per_second',), True),
+    (('elapsed_seconds',), False),
+    (('cpu_seconds', 'total'), False),
+    (('peak_rss_mb',), False)
+)
+
+def _lookup(report: Dict[str, Any], path: Tuple[str, ...]) -> Optional[float]:
+    for key in path:
+        if not isinstance(report, dict) or key not in report:
+            return None
+        report = report[key]
+    return report
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """One line per headline figure: baseline, this run and the relative change"""
+    paths = list(COMPARED)
+    for sink_name in report['batch_latency_seconds']:
+        paths.append((('batch_latency_seconds', sink_name, 'p50'), False))
+        paths.append((('batch_latency_seconds', sink_name, 'p99'), False))
+    lines = []
+    for path, higher_is_better in paths:
+        before, after = _lookup(baseline, path), _lookup(report, path)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before * 100 if before else 0.0
+        better = change > 0 if higher_is_better else change < 0
+        verdict = '' if abs(change) < 1 else (' better' if better else ' worse')
+        lines.append(f"{'.'.join(path):<45} {before:>12} -> {after:>12}  {change:+.1f}%{verdict}")
+    return lines
+
+def format_report(report: Dict[str, Any]) -> List[str]:
+    lines = [
+        f"{report['records']} records ({report['documents']} vehicles, {report['input_bytes'] / 1e6:.1f} MB) "
+        f"in {report['elapsed_seconds']:.2f}s: {report['records_per_second']:.0f} records/s, "
+        f"{report['documents_per_second']:.0f} vehicles/s"
+    ]
+    for sink_name, latency in report['batch_latency_seconds'].items():
+        sink = report['sinks'][sink_name]
+        lines.append(f"  {sink_name}: {latency['count']} batches, p50 {latency['p50'] * 1000:.1f} ms, "
+                     f"p99 {latency['p99'] * 1000:.1f} ms, {sink['mb_per_second']} MB/s, "
+                     f"{sink['failed_records']} failed records")
+    lines.append("  CPU seconds: " + ', '.join(f"{stage} {seconds}" for stage, seconds in report['cpu_seconds'].items()))
+    lines.append(f"  Peak RSS: {report['peak_rss_mb']} MB ({report['peak_rss_before_run_mb']} MB before the run)")
+    lines.append("  Faults: " + ', '.join(f"{name} {count}" for name, count in report['faults'].items()))
+    return lines
+
+def _argument_options(annotation, default) -> Dict[str, Any]:
+    if get_origin(annotation) is Literal:
+        return {'choices': get_args(annotation), 'default': default}
+    if annotation is bool:
+        return {'action': argparse.BooleanOptionalAction, 'default': default}
+    if get_origin(annotation) is not None:  # Optional[str]
+        return {'type': str, 'default': default}
+    return {'type': annotation, 'default': default}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DataPipeline end to end against in-process AWS fakes")
+    for name, field in BenchmarkScenario.model_fields.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", help=field.description,
+                            **_argument_options(field.annotation, field.default))
+    parser.add_argument('--output', help="Write the report as JSON to this file")
+    parser.add_argument('--baseline', help="Compare with the JSON report of an earlier run")
+    args = vars(parser.parse_args())
+    output, baseline = args.pop('output'), args.pop('baseline')
+
+    report = run_benchmark(BenchmarkScenario(**args))
+    print('\n'.join(format_report(report)))
+    if baseline:
+        with open(baseline, encoding='utf-8') as f:
+            print(f"Compared with {baseline}:")
+            print('\n'.join(compare(report, json.load(f))))
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# async_adapters.py
+import queue
+import asyncio
+import threading
+from typing import AsyncIterator, Iterator, List, Dict, Any, TypeVar, Callable
+from etl_athena_to_es_dynamodb.interfaces import DataSource, DataSink, BatchProcessor
+from etl_athena_to_es_dynamodb.async_interfaces import AsyncDataSource, AsyncDataSink, AsyncBatchProcessor
+from etl_athena_to_es_dynamodb.models import DataRecord, BatchResult
+
+T = TypeVar('T')
+
+_EXHAUSTED = object()
+
+async def iterate_in_thread(iterator: Iterator[T]) -> AsyncIterator[T]:
+    """Advance a blocking iterator in worker threads, one item per hop"""
+    while True:
+        item = await asyncio.to_thread(next, iterator, _EXHAUSTED)
+        if item is _EXHAUSTED:
+            return
+        yield item
+
+def chunk_records(records: Iterator[DataRecord], batch_size: int) -> Iterator[List[DataRecord]]:
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= batch_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+class SyncDataSourceAdapter(AsyncDataSource):
+    """Runs a blocking DataSource in worker threads (Adapter)"""
+    
+    def __init__(self, source: DataSource):
+        self.source = source
+    
+    def fetch_batches(self, query: str, batch_size: int) -> AsyncIterator[List[DataRecord]]:
+        if self.source.produces_batches:
+            return iterate_in_thread(self.source.fetch_batches(query))
+        return iterate_in_thread(chunk_records(self.source.fetch_data(query), batch_size))
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        return self.source.get_statistics()
+    
+    async def close(self) -> None:
+        await asyncio.to_thread(self.source.close)
+
+class SyncDataSinkAdapter(AsyncDataSink):
+    """Runs a blocking DataSink in worker threads (Adapter)"""
+    
+    def __init__(self, sink: DataSink):
+        self.sink = sink
+    
+    @property
+    def name(self) -> str:
+        return self.sink.__class__.__name__
+    
+    async def upsert_batch(self, records: List[DataRecord]) -> BatchResult:
+        return await asyncio.to_thread(self.sink.upsert_batch, records)
+    
+    async def prepare(self) -> None:
+        await asyncio.to_thread(self.sink.prepare)
+    
+    async def finalize(self, succeeded: bool) -> None:
+        await asyncio.to_thread(self.sink.finalize, succeeded)
+    
+    async def close(self) -> None:
+        await asyncio.to_thread(self.sink.close)
+
+class SyncBatchProcessorAdapter(AsyncBatchProcessor):
+    """
+    Runs a blocking BatchProcessor in a worker thread (Adapter).
+    All source batches reach one process_record_batches call through a queue-backed iterator,
+    so a processor that reads ahead, like the transform pool, keeps several batches in flight.
+    Batches are filtered and split but never merged across source batch boundaries.
+    """
+    
+    QUEUE_DEPTH = 2  # Processed batches waiting for the pipeline
+    
+    def __init__(self, processor: BatchProcessor):
+        self.processor = processor
+    
+    @staticmethod
+    def _put(channel: queue.Queue, item: Any, stop: threading.Event) -> bool:
+        while not stop.is_set():
+            try:
+                channel.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    async def _feed(self, batches: AsyncIterator[List[DataRecord]], inbox: queue.Queue, stop: threading.Event) -> None:
+        """Hand source batches to the worker; the end marker follows even if the source fails"""
+        try:
+            async for batch in batches:
+                if not await asyncio.to_thread(self._put, inbox, batch, stop):
+                    return
+        finally:
+            await asyncio.to_thread(self._put, inbox, _EXHAUSTED, stop)
+    
+    def _transform(self, inbox: queue.Queue, emit: Callable[[Any], bool], batch_size: int,
+                   stop: threading.Event) -> None:
+        """Worker thread: run the processor over the queued batches and emit its output"""
+        def queued_batches() -> Iterator[List[DataRecord]]:
+            while not stop.is_set():
+                try:
+                    batch = inbox.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if batch is _EXHAUSTED:
+                    return
+                yield batch
+        
+        try:
+            for processed in self.processor.process_record_batches(queued_batches(), batch_size):
+                if not emit(processed):
+                    return
+            emit(_EXHAUSTED)
+        except Exception as e:
+            emit(e)
+    
+    async def process_batches(self, batches: AsyncIterator[List[DataRecord]],
+                              batch_size: int) -> AsyncIterator[List[DataRecord]]:
+        loop = asyncio.get_running_loop()
+        inbox: queue.Queue = queue.Queue(maxsize=1)
+        outbox: asyncio.Queue = asyncio.Queue()
+        slots = threading.Semaphore(self.QUEUE_DEPTH)
+        stop = threading.Event()
+        
+        def emit(item: Any) -> bool:
+            while not stop.is_set():
+                if slots.acquire(timeout=0.5):
+                    loop.call_soon_threadsafe(outbox.put_nowait, item)
+                    return True
+            return False
+        
+        feeder = asyncio.create_task(self._feed(batches, inbox, stop))
+        worker = asyncio.create_task(asyncio.to_thread(self._transform, inbox, emit, batch_size, stop))
+        try:
+            while True:
+                item = await outbox.get()
+                slots.release()
+                if item is _EXHAUSTED:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+            await feeder  # Surfaces a source failure
+        finally:
+            stop.set()
+            feeder.cancel()
+            await asyncio.gather(feeder, worker, return_exceptions=True)
+    
+    async def on_batch_completed(self, batch: List[DataRecord], sink_results: Dict[str, BatchResult]) -> None:
+        await asyncio.to_thread(self.processor.on_batch_completed, batch, sink_results)
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        return self.processor.get_statistics()
+    
+    async def close(self) -> None:
+        await asyncio.to_thread(self.processor.close)
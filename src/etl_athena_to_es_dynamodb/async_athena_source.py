@@ -0,0 +1,53 @@
+# async_athena_source.py
+import asyncio
+import logging
+from typing import AsyncIterator, List, Dict, Any
+from etl_athena_to_es_dynamodb.athena_source import AthenaDataSource
+from etl_athena_to_es_dynamodb.async_adapters import SyncDataSourceAdapter, iterate_in_thread, chunk_records
+from etl_athena_to_es_dynamodb.async_interfaces import AsyncDataSource
+from etl_athena_to_es_dynamodb.exceptions import DataSourceError
+from etl_athena_to_es_dynamodb.models import DataRecord
+
+logger = logging.getLogger(__name__)
+
+class AsyncAthenaDataSource(AsyncDataSource):
+    """
+    Athena source for the async engine (SRP).
+    The query is awaited with asyncio sleeps between polls instead of parking a thread;
+    result pages are read in worker threads. UNLOAD runs use the blocking source as a whole.
+    """
+    
+    def __init__(self, athena_source: AthenaDataSource):
+        self.athena_source = athena_source
+    
+    def fetch_batches(self, query: str, batch_size: int) -> AsyncIterator[List[DataRecord]]:
+        if self.athena_source.produces_batches:
+            return SyncDataSourceAdapter(self.athena_source).fetch_batches(query, batch_size)
+        return self._fetch_batches(query, batch_size)
+    
+    async def _fetch_batches(self, query: str, batch_size: int) -> AsyncIterator[List[DataRecord]]:
+        try:
+            source = self.athena_source
+            _ = source.athena_client  # Initialize on the loop thread, not in a worker
+            _ = source.s3_client
+            run = await asyncio.to_thread(source.begin_execution, query)
+            query_execution = run.query_execution
+            if query_execution is None:
+                with source.telemetry.span('athena_query_wait'):
+                    query_execution = await source.wait_for_query_completion_async(run.query_execution_id)
+                query_execution, _ = await asyncio.to_thread(source.finish_execution, run, query_execution)
+            
+            records = source.read_query_results(query_execution)
+            async for batch in iterate_in_thread(chunk_records(records, batch_size)):
+                yield batch
+        except DataSourceError:
+            raise
+        except Exception as e:
+            logger.error(f"Error fetching data from Athena: {str(e)}")
+            raise DataSourceError(f"Failed to fetch data from Athena: {str(e)}")
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        return self.athena_source.get_statistics()
+    
+    async def close(self) -> None:
+        await asyncio.to_thread(self.athena_source.close)
@@ -0,0 +1,130 @@
+# async_dynamodb_sink.py
+import random
+import asyncio
+import logging
+import traceback
+from contextlib import AsyncExitStack
+from typing import List, Optional
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import BotoCoreError, ClientError
+from etl_athena_to_es_dynamodb.async_interfaces import AsyncDataSink
+from etl_athena_to_es_dynamodb.dynamodb_sink import DynamoDBDataSink
+from etl_athena_to_es_dynamodb.exceptions import ConfigurationError
+from etl_athena_to_es_dynamodb.models import DataRecord, BatchResult, FailedRecord, AWSConfig, DynamoDBConfig, DocumentConfig
+from etl_athena_to_es_dynamodb.telemetry import Telemetry
+
+logger = logging.getLogger(__name__)
+
+class AsyncDynamoDBDataSink(AsyncDataSink):
+    """
+    DynamoDB UpdateItem sink on an aiobotocore client (SRP).
+    Needs the [async] extra. BatchWriteItem mode and adaptive throttling stay with the
+    blocking DynamoDBDataSink.
+    """
+    
+    @staticmethod
+    def is_supported(dynamodb_config: DynamoDBConfig) -> bool:
+        """Whether the config only uses what this sink implements"""
+        batch_write = dynamodb_config.write_mode == 'batch_write' or \
+            (dynamodb_config.write_mode == 'auto' and bool(dynamodb_config.overwrite_by_pkeys))
+        return not batch_write and not dynamodb_config.adaptive_throttling
+    
+    def __init__(self, aws_config: AWSConfig, dynamodb_config: DynamoDBConfig, document_config: DocumentConfig,
+                 telemetry: Optional[Telemetry] = None):
+        if not self.is_supported(dynamodb_config):
+            raise ConfigurationError("AsyncDynamoDBDataSink only supports UpdateItem writes without adaptive throttling; "
+                                     "wrap DynamoDBDataSink in SyncDataSinkAdapter instead")
+        self.aws_config = aws_config
+        self.dynamodb_config = dynamodb_config
+        self.document_config = document_config
+        self.telemetry = telemetry or Telemetry()
+        self._serializer = TypeSerializer()
+        self._exit_stack = AsyncExitStack()
+        self._client = None
+        self._client_lock = None
+        logger.info("AsyncDynamoDBDataSink initialized successfully")
+    
+    async def get_client(self):
+        """Lazy initialization of the aiobotocore client, entered once per sink"""
+        if self._client_lock is None:
+            self._client_lock = asyncio.Lock()
+        async with self._client_lock:
+            if self._client is None:
+                try:
+                    from aiobotocore.session import get_session
+                except ImportError:
+                    raise ConfigurationError("AsyncDynamoDBDataSink needs the 'async' extra (aiobotocore)")
+                self._client = await self._exit_stack.enter_async_context(get_session().create_client(
+                    'dynamodb',
+                    region_name=self.aws_config.region,
+                    aws_access_key_id=self.aws_config.access_key_id,
+                    aws_secret_access_key=self.aws_config.secret_access_key
+                ))
+                logger.debug("Async DynamoDB client initialized")
+        return self._client
+    
+    def _backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff"""
+        ceiling = min(self.dynamodb_config.batch_write_max_delay,
+                      self.dynamodb_config.batch_write_base_delay * (2 ** attempt))
+        return random.uniform(0, ceiling)
+    
+    async def _try_update_record(self, client, semaphore: asyncio.Semaphore, record: DataRecord) -> Optional[str]:
+        """UpdateItem one record, retrying throttles; returns an error message on AWS failure"""
+        request = DynamoDBDataSink.update_item_request(self.dynamodb_config.table_name, record, self._serializer)
+        attempt = 0
+        while True:
+            try:
+                async with semaphore:
+                    with self.telemetry.span('dynamodb_request', operation='UpdateItem'):
+                        await client.update_item(**request)
+                return None
+            except (BotoCoreError, ClientError) as e:
+                throttled = isinstance(e, ClientError) and \
+                    e.response.get('Error', {}).get('Code') in DynamoDBDataSink.THROTTLE_ERROR_CODES
+                if throttled:
+                    self.telemetry.increment('dynamodb_throttled_requests', operation='UpdateItem')
+                if throttled and attempt < self.dynamodb_config.throttle_max_retries:
+                    await asyncio.sleep(self._backoff_delay(attempt))
+                    attempt += 1
+                    continue
+                logger.warning(f"Failed to upsert record into DynamoDB: {str(e)}")
+                return f"Failed to upsert record: {str(e)}"
+    
+    async def upsert_batch(self, records: List[DataRecord]) -> BatchResult:
+        """Upsert batch of records into DynamoDB"""
+        if not records:
+            return BatchResult(total_records=0, successful_records=0, failed_records=0)
+        
+        try:
+            client = await self.get_client()
+            # write_concurrency applies per batch; BatchConfig.async_batches_in_flight batches run at once
+            semaphore = asyncio.Semaphore(self.dynamodb_config.write_concurrency)
+            outcomes = await asyncio.gather(*(self._try_update_record(client, semaphore, record) for record in records))
+            errors = [error for error in outcomes if error is not None]
+            logger.debug("DynamoDB batch upsert completed: %s success, %s failed", len(records) - len(errors), len(errors))
+            return BatchResult(
+                total_records=len(records),
+                successful_records=len(records) - len(errors),
+                failed_records=len(errors),
+                errors=errors,
+                failures=[FailedRecord.of(record, error) for record, error in zip(records, outcomes) if error is not None],
+                bytes_written=sum(DynamoDBDataSink.item_size(record.to_dict())
+                                  for record, error in zip(records, outcomes) if error is None)
+            )
+        
+        except Exception as e:
+            logger.error(f"Error upserting batch into DynamoDB. Traceback: {traceback.format_exc()}")
+            return BatchResult(
+                total_records=len(records),
+                successful_records=0,
+                failed_records=len(records),
+                errors=[str(e)],
+                failures=[FailedRecord.of(record, str(e)) for record in records]
+            )
+    
+    async def close(self) -> None:
+        """Close DynamoDB connection"""
+        await self._exit_stack.aclose()
+        self._client = None
+        logger.info("DynamoDB connection closed")
@@ -0,0 +1,68 @@
+# async_interfaces.py
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, List, Dict, Any
+from etl_athena_to_es_dynamodb.models import DataRecord, BatchResult
+
+class AsyncDataSource(ABC):
+    """Abstract interface for asyncio data sources (ISP)"""
+    
+    @abstractmethod
+    def fetch_batches(self, query: str, batch_size: int) -> AsyncIterator[List[DataRecord]]:
+        """Fetch data as batches of about batch_size records"""
+        pass
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Source-specific statistics reported with the pipeline results"""
+        return {}
+    
+    @abstractmethod
+    async def close(self) -> None:
+        """Close connection to the source"""
+        pass
+
+class AsyncDataSink(ABC):
+    """Abstract interface for asyncio data sinks (ISP)"""
+    
+    @property
+    def name(self) -> str:
+        """Key of this sink in the pipeline results"""
+        return self.__class__.__name__
+    
+    @abstractmethod
+    async def upsert_batch(self, records: List[DataRecord]) -> BatchResult:
+        """Upsert a batch of records"""
+        pass
+    
+    async def prepare(self) -> None:
+        """Called once before the first batch"""
+        pass
+    
+    async def finalize(self, succeeded: bool) -> None:
+        """Called once after the last batch, also when the run failed"""
+        pass
+    
+    @abstractmethod
+    async def close(self) -> None:
+        """Close connection to the sink"""
+        pass
+
+class AsyncBatchProcessor(ABC):
+    """Abstract interface for asyncio batch processing (ISP)"""
+    
+    @abstractmethod
+    def process_batches(self, batches: AsyncIterator[List[DataRecord]],
+                        batch_size: int) -> AsyncIterator[List[DataRecord]]:
+        """Process batches on their way to the sinks"""
+        pass
+    
+    async def on_batch_completed(self, batch: List[DataRecord], sink_results: Dict[str, BatchResult]) -> None:
+        """Called once every sink has processed a batch"""
+        pass
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Processor-specific statistics reported with the pipeline results"""
+        return {}
+    
+    async def close(self) -> None:
+        """Release processor resources"""
+        pass
@@ -0,0 +1,184 @@
+# async_opensearch_sink.py
+import random
+import asyncio
+import logging
+import traceback
+from typing import Iterator, List, Tuple, Dict, Optional
+import boto3
+from etl_athena_to_es_dynamodb.async_interfaces import AsyncDataSink
+from etl_athena_to_es_dynamodb.bulk_chunker import BulkChunk, BulkChunker, BulkStats, send_chunk_async
+from etl_athena_to_es_dynamodb.opensearch_actions import OpenSearchActionBuilder
+from etl_athena_to_es_dynamodb.exceptions import DataSinkError, ConfigurationError
+from etl_athena_to_es_dynamodb.models import DataRecord, BatchResult, FailedRecord, OpenSearchConfig, DocumentConfig
+from etl_athena_to_es_dynamodb.telemetry import Telemetry
+
+logger = logging.getLogger(__name__)
+
+class AsyncOpenSearchDataSink(AsyncDataSink):
+    """
+    OpenSearch sink on AsyncOpenSearch (SRP).
+    Needs the [async] extra. Index lifecycle features (bulk-load mode, blue/green loads,
+    stale-child cleanup, adaptive bulk sizing) stay with the blocking OpenSearchDataSink.
+    """
+    
+    @staticmethod
+    def unsupported_features(config: OpenSearchConfig, document_config: DocumentConfig) -> List[str]:
+        """Enabled settings only the blocking sink implements"""
+        unsupported = [name for name in ('bulk_load_mode', 'blue_green_load', 'adaptive_bulk') if getattr(config, name)]
+        if document_config.delete_stale_children:
+            unsupported.append('delete_stale_children')
+        return unsupported
+    
+    def __init__(self, config: OpenSearchConfig, document_config: DocumentConfig,
+                 telemetry: Optional[Telemetry] = None):
+        unsupported = self.unsupported_features(config, document_config)
+        if unsupported:
+            raise ConfigurationError(f"AsyncOpenSearchDataSink does not support {', '.join(unsupported)}; "
+                                     f"wrap OpenSearchDataSink in SyncDataSinkAdapter instead")
+        self.config = config
+        self.document_config = document_config
+        self.telemetry = telemetry or Telemetry()
+        self.action_builder = OpenSearchActionBuilder(document_config)
+        self.bulk_stats = BulkStats()
+        self._client = None
+        self._semaphore = None
+        logger.info("AsyncOpenSearchDataSink initialized successfully")
+    
+    @property
+    def client(self):
+        """Lazy initialization of the AsyncOpenSearch client"""
+        if self._client is None:
+            try:
+                from opensearchpy import AsyncOpenSearch, AsyncHttpConnection, AWSV4SignerAsyncAuth
+            except ImportError:
+                raise ConfigurationError("AsyncOpenSearchDataSink needs the 'async' extra (opensearch-py[async])")
+            credentials = boto3.Session().get_credentials()
+            self._client = AsyncOpenSearch(
+                hosts=[{'host': self.config.endpoint, 'port': self.config.port}],
+                http_auth=AWSV4SignerAsyncAuth(credentials, self.config.region, 'es'),
+                use_ssl=True,
+                verify_certs=True,
+                connection_class=AsyncHttpConnection,
+                pool_maxsize=max(10, self.config.bulk_concurrency),
+                timeout=30
+            )
+            logger.debug("AsyncOpenSearch client initialized")
+        return self._client
+    
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        """Caps built and in-flight _bulk requests across all concurrent batches"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.config.bulk_concurrency)
+        return self._semaphore
+    
+    def _backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff"""
+        ceiling = min(self.config.bulk_retry_max_delay, self.config.bulk_retry_base_delay * (2 ** attempt))
+        return random.uniform(0, ceiling)
+    
+    async def _send(self, chunk: BulkChunk) -> Tuple[int, List[dict]]:
+        """Send one chunk, resending only rejected actions with backoff"""
+        success_count = 0
+        failed_items = []
+        attempt = 0
+        while True:
+            with self.telemetry.span('opensearch_bulk_request'):
+                outcome = await send_chunk_async(self.client, chunk, self.config.bulk_request_timeout, self.bulk_stats)
+            self.telemetry.observe('opensearch_bulk_request_bytes', chunk.size_bytes)
+            self.telemetry.observe('opensearch_bulk_request_actions', len(chunk.actions))
+            success_count += outcome.success_count
+            failed_items.extend(outcome.failed_items)
+            if not outcome.rejected:
+                return success_count, failed_items
+            if attempt >= self.config.bulk_max_retries:
+                logger.warning(f"{len(outcome.rejected)} bulk actions still rejected after {attempt} retries")
+                failed_items.extend(item for _, item in outcome.rejected)
+                return success_count, failed_items
+            
+            self.bulk_stats.record_retry(len(outcome.rejected))
+            self.telemetry.increment('opensearch_bulk_rejected_actions', len(outcome.rejected))
+            await asyncio.sleep(self._backoff_delay(attempt))
+            chunk = chunk.subset([index for index, _ in outcome.rejected])
+            attempt += 1
+    
+    async def _send_chunks(self, chunks: Iterator[BulkChunk]) -> List[Tuple[int, List[dict]]]:
+        """
+        Send chunks concurrently, building the next one only once a request slot is free, so at most
+        bulk_concurrency chunks exist at a time. A slot is held through its chunk's retries.
+        """
+        async def send(chunk: BulkChunk) -> Tuple[int, List[dict]]:
+            try:
+                return await self._send(chunk)
+            finally:
+                self.semaphore.release()
+        
+        tasks = []
+        try:
+            while True:
+                await self.semaphore.acquire()
+                chunk = None
+                try:
+                    chunk = next(chunks, None)
+                finally:
+                    if chunk is None:
+                        self.semaphore.release()
+                if chunk is None:
+                    break
+                tasks.append(asyncio.create_task(send(chunk)))
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+    
+    async def upsert_batch(self, records: List[DataRecord]) -> BatchResult:
+        """Insert batch of records into OpenSearch"""
+        if not records:
+            return BatchResult(total_records=0, successful_records=0, failed_records=0)
+        if not self.document_config.child_relation_type:
+            raise DataSinkError("Child relation type must be specified for child documents")
+        
+        try:
+            written_children: Dict[str, List[str]] = {}
+            chunker = BulkChunker(
+                self.client.transport.serializer,
+                max_actions=self.config.bulk_max_actions,
+                max_bytes=self.config.bulk_max_bytes
+            )
+            actions = self.action_builder.iter_actions(records, self.config.index_name, written_children)
+            outcomes = await self._send_chunks(chunker.chunks(actions))
+            
+            success_count = sum(success for success, _ in outcomes)
+            failed_items = [item for _, failed in outcomes for item in failed]
+            logger.debug("OpenSearch batch insert completed: %s success, %s failed", success_count, len(failed_items))
+            return BatchResult(
+                total_records=len(records),
+                successful_records=success_count,
+                failed_records=len(failed_items),
+                errors=[str(item) for item in failed_items],
+                failures=self.action_builder.failed_records(records, failed_items) if failed_items else [],
+                bytes_written=chunker.chunked_bytes,
+                metrics=self.bulk_stats.snapshot()
+            )
+        
+        except Exception as e:
+            logger.error(f"Error inserting batch into OpenSearch. Traceback: {traceback.format_exc()}")
+            return BatchResult(
+                total_records=len(records),
+                successful_records=0,
+                failed_records=len(records),
+                errors=[str(e)],
+                failures=[FailedRecord.of(record, str(e)) for record in records]
+            )
+    
+    async def close(self) -> None:
+        """Close OpenSearch connection"""
+        if self._client is not None:
+            try:
+                await self._client.close()
+            except Exception as e:
+                logger.warning(f"Error closing OpenSearch connection: {str(e)}")
+        self._client = None
+        logger.info("OpenSearch connection closed")
@@ -0,0 +1,177 @@
+# async_pipeline.py
+import time
+import asyncio
+import logging
+from typing import List, Dict, Tuple, Optional, Any
+from etl_athena_to_es_dynamodb.async_interfaces import AsyncDataSource, AsyncDataSink, AsyncBatchProcessor
+from etl_athena_to_es_dynamodb.models import BatchConfig, BatchResult, DataRecord, FailedRecord
+from etl_athena_to_es_dynamodb.dead_letter import DeadLetterSpool
+from etl_athena_to_es_dynamodb.telemetry import Telemetry
+from etl_athena_to_es_dynamodb.exceptions import DataPipelineError
+from etl_athena_to_es_dynamodb.pipeline import aggregate_results
+
+logger = logging.getLogger(__name__)
+
+_STAGE_DONE = object()
+
+class AsyncDataPipeline:
+    """
+    Asyncio counterpart of DataPipeline (SRP, DIP).
+    Each sink drains its own bounded queue with async_batches_in_flight concurrent writers,
+    so one event loop can keep many requests in flight without a thread per request.
+    """
+    
+    def __init__(self,
+                 data_source: AsyncDataSource,
+                 data_sinks: List[AsyncDataSink],
+                 batch_processor: AsyncBatchProcessor,
+                 batch_config: BatchConfig,
+                 dead_letters: Optional[DeadLetterSpool] = None,
+                 telemetry: Optional[Telemetry] = None):
+        self.data_source = data_source
+        self.data_sinks = data_sinks
+        self.batch_processor = batch_processor
+        self.batch_config = batch_config
+        self.dead_letters = dead_letters
+        self.telemetry = telemetry or Telemetry()
+        self._pending: Dict[int, Tuple[List[DataRecord], Dict[str, BatchResult]]] = {}
+        self._failure: Optional[Exception] = None
+        logger.info(f"AsyncDataPipeline initialized with {len(data_sinks)} sinks")
+    
+    def run(self, query: str) -> Dict[str, Any]:
+        """Run execute on a fresh event loop, for synchronous callers"""
+        return asyncio.run(self.execute(query))
+    
+    async def execute(self, query: str) -> Dict[str, Any]:
+        """Execute the data pipeline"""
+        succeeded = False
+        try:
+            logger.info("Starting async data pipeline execution")
+            for sink in self.data_sinks:
+                await sink.prepare()
+            
+            pipeline_results = await self._run_stages(query)
+            
+            logger.info("Async data pipeline execution completed successfully")
+            succeeded = True
+            return pipeline_results
+        
+        except Exception as e:
+            logger.error(f"Pipeline execution failed: {str(e)}")
+            raise DataPipelineError(f"Pipeline execution failed: {str(e)}")
+        finally:
+            await self._cleanup_resources(succeeded)
+    
+    async def _complete(self, batch: List[DataRecord], sink_name: str, result: BatchResult,
+                        sink_results: Dict[str, List[BatchResult]]) -> None:
+        """Record one sink's result; report the batch once every sink has written it"""
+        sink_results[sink_name].append(result)
+        _, batch_results = self._pending[id(batch)]
+        batch_results[sink_name] = result
+        if len(batch_results) == len(self.data_sinks):
+            del self._pending[id(batch)]
+            await self.batch_processor.on_batch_completed(batch, batch_results)
+    
+    async def _consume(self, sink: AsyncDataSink, sink_queue: asyncio.Queue,
+                       sink_results: Dict[str, List[BatchResult]], stop: asyncio.Event) -> None:
+        """Sink stage: write batches until the end marker"""
+        while True:
+            batch = await sink_queue.get()
+            if batch is _STAGE_DONE:
+                return
+            if stop.is_set():
+                continue  # Run is failing; drain without writing
+            try:
+                with self.telemetry.span('sink_write', sink=sink.name):
+                    result = await sink.upsert_batch(batch)
+                logger.info(f"Batch completed for {sink.name}: {result.success_rate:.1f}% success rate")
+            except Exception as e:
+                logger.error(f"Error in sink {sink.name}: {str(e)}")
+                result = BatchResult(
+                    total_records=len(batch),
+                    successful_records=0,
+                    failed_records=len(batch),
+                    errors=[str(e)],
+                    failures=[FailedRecord.of(record, str(e)) for record in batch]
+                )
+            self.telemetry.increment('sink_records', result.successful_records, sink=sink.name, outcome='success')
+            self.telemetry.increment('sink_records', result.failed_records, sink=sink.name, outcome='failed')
+            self.telemetry.increment('sink_bytes', result.bytes_written, sink=sink.name)
+            if result.failures:
+                if self.dead_letters:
+                    try:
+                        self.dead_letters.write(sink.name, result.failures)
+                    except Exception as e:
+                        logger.error(f"Could not spool {len(result.failures)} failed records of {sink.name}: {str(e)}")
+                result = result.model_copy(update={'failures': []})
+            try:
+                await self._complete(batch, sink.name, result, sink_results)
+            except Exception as e:
+                # Keep draining so the producer never blocks on a queue nobody reads
+                logger.error(f"Error completing batch for {sink.name}: {str(e)}")
+                self._failure = self._failure or e
+                stop.set()
+    
+    async def _run_stages(self, query: str) -> Dict[str, Any]:
+        """Fan source batches out to per-sink queues and aggregate the results"""
+        depth = self.batch_config.queue_depth
+        writers = self.batch_config.async_batches_in_flight
+        sink_queues = {sink.name: asyncio.Queue(maxsize=depth) for sink in self.data_sinks}
+        sink_results: Dict[str, List[BatchResult]] = {name: [] for name in sink_queues}
+        stop = asyncio.Event()
+        self._failure = None
+        consumers = [
+            asyncio.create_task(self._consume(sink, sink_queues[sink.name], sink_results, stop))
+            for sink in self.data_sinks for _ in range(writers)
+        ]
+        
+        total_processed_batches = 0
+        start = time.perf_counter()
+        try:
+            batches = self.batch_processor.process_batches(
+                self.data_source.fetch_batches(query, self.batch_config.batch_size),
+                self.batch_config.batch_size
+            )
+            async for batch in batches:
+                if stop.is_set():
+                    break
+                total_processed_batches += 1
+                logger.debug("==> Processing batch %s with %s records", total_processed_batches, len(batch))
+                self._pending[id(batch)] = (batch, {})
+                for sink_queue in sink_queues.values():
+                    await sink_queue.put(batch)
+            
+            for sink_queue in sink_queues.values():
+                for _ in range(writers):
+                    await sink_queue.put(_STAGE_DONE)
+            await asyncio.gather(*consumers)
+        except BaseException:
+            for consumer in consumers:
+                consumer.cancel()
+            await asyncio.gather(*consumers, return_exceptions=True)
+            raise
+        
+        if self._failure is not None:
+            raise self._failure
+        return aggregate_results(sink_results, total_processed_batches,
+                                 self.data_source.get_statistics(), self.batch_processor.get_statistics(),
+                                 self.dead_letters.statistics() if self.dead_letters else None,
+                                 time.perf_counter() - start)
+    
+    async def _cleanup_resources(self, succeeded: bool) -> None:
+        """Cleanup all resources"""
+        logger.info("Cleaning up resources")
+        for sink in self.data_sinks:
+            try:
+                await sink.finalize(succeeded)
+            except Exception as e:
+                logger.error(f"Error finalizing sink {sink.name}: {str(e)}")
+        for closeable in [self.data_source, self.batch_processor, *self.data_sinks]:
+            try:
+                await closeable.close()
+            except Exception as e:
+                logger.warning(f"Error during resource cleanup: {str(e)}")
+        if self.dead_letters:
+            self.dead_letters.close()
+        self.telemetry.close()
+        logger.info("Resource cleanup completed")
@@ -1,24 +1,60 @@
 # athena_source.py
+import uuid
 import boto3
 import time
+import asyncio
+import threading
+from botocore.config import Config as BotoConfig
 import logging
-from typing import Iterator, Dict, Any
+from typing import Iterator, Dict, Any, List, Optional, Tuple, Callable
+from botocore.exceptions import BotoCoreError, ClientError
 from pydantic import ValidationError
 from etl_athena_to_es_dynamodb.interfaces import DataSource
-from etl_athena_to_es_dynamodb.models import DataRecord, AWSConfig, AthenaConfig
+from etl_athena_to_es_dynamodb.models import DataRecord, Record, AWSConfig, AthenaConfig
+from etl_athena_to_es_dynamodb.parquet_result_reader import ParquetResultReader
+from etl_athena_to_es_dynamodb.query_cache import QueryResultCache
+from etl_athena_to_es_dynamodb.s3_result_reader import S3ResultReader, ParallelS3ResultReader
+from etl_athena_to_es_dynamodb.telemetry import Telemetry
 from etl_athena_to_es_dynamodb.exceptions import DataSourceError, ConfigurationError
 
 logger = logging.getLogger(__name__)
 
+class QueryRun:
+    """A query run begun by AthenaDataSource.begin_execution: already answered, or started in Athena"""
+    __slots__ = ('unload', 'query_execution_id', 'query_execution', 'location', 'cache_key')
+    
+    def __init__(self, unload: bool, query_execution_id: Optional[str] = None,
+                 query_execution: Optional[Dict[str, Any]] = None, location: Optional[str] = None,
+                 cache_key: Optional[str] = None):
+        self.unload = unload
+        self.query_execution_id = query_execution_id
+        self.query_execution = query_execution  # Set when no query had to run
+        self.location = location
+        self.cache_key = cache_key
+
 class AthenaDataSource(DataSource):
     """Athena data source implementation (SRP)"""
     
-    def __init__(self, aws_config: AWSConfig, athena_config: AthenaConfig):
+    def __init__(self, aws_config: AWSConfig, athena_config: AthenaConfig, telemetry: Optional[Telemetry] = None):
         try:
             self.aws_config = aws_config
             self.athena_config = athena_config
+            self.telemetry = telemetry or Telemetry()
             self._athena_client = None
             self._s3_client = None
+            self.result_cache = None
+            if athena_config.result_cache_path:
+                self.result_cache = QueryResultCache(
+                    athena_config.result_cache_path,
+                    ttl_seconds=athena_config.result_cache_ttl_seconds,
+                    max_entries=athena_config.result_cache_max_entries
+                )
+            self._stats_lock = threading.Lock()
+            self._cache_stats = {'hits': 0, 'misses': 0, 'athena_reused': 0}
+            self._execution: Optional[Dict[str, Any]] = None  # The execution being read, for checkpoints
+            self._resume_execution: Optional[Dict[str, Any]] = None
+            # Validate rows only in strict mode; the lightweight Record skips pydantic on the hot path
+            self.make_record = DataRecord.from_dict if athena_config.strict_records else Record.from_dict
             logger.info("AthenaDataSource initialized successfully")
         except ValidationError as e:
             raise ConfigurationError(f"Invalid configuration: {str(e)}")
@@ -45,31 +81,170 @@ class AthenaDataSource(DataSource):
                 aws_secret_access_key=self.aws_config.secret_access_key,
                 region_name=self.aws_config.region
             )
-            self._s3_client = session.client('s3')
+            self._s3_client = session.client(
+                's3',
+                config=BotoConfig(max_pool_connections=max(10, self.athena_config.s3_read_concurrency))
+            )
             logger.debug("S3 client initialized")
         return self._s3_client
     
-    def fetch_data(self, query: str) -> Iterator[DataRecord]:
+    @property
+    def produces_batches(self) -> bool:
+        """UNLOAD mode reads Parquet row groups as whole batches"""
+        return self.athena_config.unload_to_parquet
+    
+    def _start_query(self, query: str, allow_reuse: bool = True) -> str:
+        """Start query execution and return its ID"""
+        params = {}
+        if allow_reuse and self.athena_config.result_reuse_max_age_minutes:
+            params['ResultReuseConfiguration'] = {
+                'ResultReuseByAgeConfiguration': {
+                    'Enabled': True,
+                    'MaxAgeInMinutes': self.athena_config.result_reuse_max_age_minutes
+                }
+            }
+        
+        response = self.athena_client.start_query_execution(
+            QueryString=query,
+            # QueryExecutionContext={'Database': self.athena_config.database},
+            ResultConfiguration={'OutputLocation': self.athena_config.s3_output_location},
+            # WorkGroup=self.athena_config.work_group
+            **params
+        )
+        
+        query_execution_id = response['QueryExecutionId']
+        logger.info(f"Query execution started with ID: {query_execution_id}")
+        return query_execution_id
+    
+    def _count(self, stat: str) -> None:
+        with self._stats_lock:
+            self._cache_stats[stat] += 1
+        self.telemetry.increment('athena_result_cache', outcome=stat)
+    
+    def _reuse_execution(self, query_execution_id: str, result_location: str) -> Optional[Tuple[Dict[str, Any], str]]:
+        """(QueryExecution, result location) of an earlier execution if Athena still reports it as succeeded"""
+        try:
+            response = self.athena_client.get_query_execution(QueryExecutionId=query_execution_id)
+            if response['QueryExecution']['Status']['State'] == 'SUCCEEDED':
+                return response['QueryExecution'], result_location
+        except (BotoCoreError, ClientError) as e:
+            logger.warning(f"Query execution {query_execution_id} is unusable: {str(e)}")
+        return None
+    
+    def _get_cached_execution(self, cache_key: str) -> Optional[Tuple[Dict[str, Any], str]]:
+        """Cached (QueryExecution, result location) if Athena still reports it as succeeded"""
+        entry = self.result_cache.get(cache_key)
+        if entry is None:
+            return None
+        reused = self._reuse_execution(entry['query_execution_id'], entry['result_location'])
+        if reused:
+            logger.info(f"Result cache hit: reusing query execution {entry['query_execution_id']}")
+            return reused
+        self.result_cache.delete(cache_key)
+        return None
+    
+    def _get_resumed_execution(self, unload: bool) -> Tuple[Dict[str, Any], str]:
+        """The checkpointed execution; a new one would not return rows in the same order"""
+        state, self._resume_execution = self._resume_execution, None
+        if state.get('unload', False) != unload:
+            raise DataSourceError("Checkpoint was taken in a different result mode (UNLOAD vs CSV); run without resume")
+        reused = self._reuse_execution(state['query_execution_id'], state['result_location'])
+        if reused is None:
+            raise DataSourceError(f"Checkpointed query execution {state['query_execution_id']} is no longer readable; run without resume")
+        logger.info(f"Resuming from checkpointed query execution {state['query_execution_id']}")
+        return reused
+    
+    def checkpoint_state(self) -> Optional[Dict[str, Any]]:
+        """The execution being read; unordered S3 reads cannot be resumed by offset"""
+        if not self.athena_config.s3_preserve_order and not self.produces_batches:
+            return None
+        return self._execution
+    
+    def restore_checkpoint_state(self, state: Dict[str, Any]) -> None:
+        self._resume_execution = state
+    
+    def begin_execution(self, query: str, unload: bool = False) -> 'QueryRun':
+        """
+        First step of a query run: reuse a resumed or locally cached execution, or start the query
+        (wrapped in UNLOAD if requested). A started run is waited for and passed to finish_execution.
+        """
+        if self._resume_execution is not None:
+            query_execution, location = self._get_resumed_execution(unload)
+            self._remember_execution(query_execution, location, unload)
+            return QueryRun(unload, query_execution=query_execution, location=location)
+        
+        cache_key = None
+        if self.result_cache is not None:
+            cache_key = QueryResultCache.fingerprint(query, 'parquet' if unload else 'csv')
+            cached = self._get_cached_execution(cache_key)
+            if cached:
+                self._count('hits')
+                self._remember_execution(*cached, unload)
+                return QueryRun(unload, query_execution=cached[0], location=cached[1])
+            self._count('misses')
+        
+        if unload:
+            location = self._unload_location()
+            logger.info(f"Starting Athena UNLOAD to {location}")
+            # Athena only reuses results of SELECT statements
+            query_execution_id = self._start_query(self.build_unload_query(query, location), allow_reuse=False)
+            return QueryRun(unload, query_execution_id=query_execution_id, location=location, cache_key=cache_key)
+        return QueryRun(unload, query_execution_id=self._start_query(query), cache_key=cache_key)
+    
+    def finish_execution(self, run: 'QueryRun', query_execution: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+        """Account for a started run whose query succeeded; returns its QueryExecution and result location"""
+        location = run.location if run.unload else query_execution.get('ResultConfiguration', {}).get('OutputLocation')
+        
+        self.telemetry.increment('athena_data_scanned_bytes',
+                                 query_execution.get('Statistics', {}).get('DataScannedInBytes', 0))
+        reuse_info = query_execution.get('Statistics', {}).get('ResultReuseInformation', {})
+        if reuse_info.get('ReusedPreviousResult'):
+            logger.info(f"Athena reused a previous result for query {run.query_execution_id}")
+            self._count('athena_reused')
+        
+        if run.cache_key and location:
+            self.result_cache.put(run.cache_key, run.query_execution_id, location)
+        self._remember_execution(query_execution, location, run.unload)
+        return query_execution, location
+    
+    def _execute_query(self, query: str, unload: bool = False, stop: Optional[threading.Event] = None,
+                       on_query_started: Optional[Callable[[str], None]] = None) -> Tuple[Dict[str, Any], str]:
+        """
+        Run the query and return its QueryExecution and result location. on_query_started gets the
+        ID of a started query; setting stop abandons the wait for it.
+        """
+        run = self.begin_execution(query, unload)
+        if run.query_execution is not None:
+            return run.query_execution, run.location
+        if on_query_started:
+            on_query_started(run.query_execution_id)
+        with self.telemetry.span('athena_query_wait'):
+            query_execution = self._wait_for_query_completion(run.query_execution_id, stop)
+        return self.finish_execution(run, query_execution)
+    
+    def _remember_execution(self, query_execution: Dict[str, Any], location: str, unload: bool) -> None:
+        self._execution = {
+            'query_execution_id': query_execution['QueryExecutionId'],
+            'result_location': location,
+            'unload': unload
+        }
+    
+    def fetch_data(self, query: str, stop: Optional[threading.Event] = None,
+                   on_query_started: Optional[Callable[[str], None]] = None) -> Iterator[DataRecord]:
         """Fetch data from Athena table"""
+        if self.produces_batches:
+            for batch in self.fetch_batches(query, stop, on_query_started):
+                yield from batch
+            return
+        
         try:
             logger.info(f"Starting Athena query execution")
 
-            # Start query execution
-            response = self.athena_client.start_query_execution(
-                QueryString=query,
-                # QueryExecutionContext={'Database': self.athena_config.database},
-                ResultConfiguration={'OutputLocation': self.athena_config.s3_output_location},
-                # WorkGroup=self.athena_config.work_group
-            )
-            
-            query_execution_id = response['QueryExecutionId']
-            logger.info(f"Query execution started with ID: {query_execution_id}")
-            
-            # Wait for query completion
-            self._wait_for_query_completion(query_execution_id)
+            # Start query execution and wait for completion
+            query_execution, _ = self._execute_query(query, stop=stop, on_query_started=on_query_started)
             
             # Fetch and yield results
-            yield from self._fetch_query_results(query_execution_id)
+            yield from self.read_query_results(query_execution)
             
             logger.info("Data fetching completed successfully")
             
@@ -77,32 +252,195 @@ class AthenaDataSource(DataSource):
             logger.error(f"Error fetching data from Athena: {str(e)}")
             raise DataSourceError(f"Failed to fetch data from Athena: {str(e)}")
     
-    def _wait_for_query_completion(self, query_execution_id: str) -> None:
-        """Wait for Athena query to complete"""
-        max_wait_time = 300  # 5 minutes
-        wait_interval = 2
-        total_wait = 0
+    def _unload_location(self) -> str:
+        """UNLOAD needs an empty target prefix, so default to a fresh one per run"""
+        if self.athena_config.unload_location:
+            return self.athena_config.unload_location.rstrip('/') + '/'
+        return f"{self.athena_config.s3_output_location.rstrip('/')}/unload/{uuid.uuid4()}/"
+    
+    @staticmethod
+    def build_unload_query(query: str, location: str) -> str:
+        """Wrap a SELECT in UNLOAD ... WITH (format='PARQUET')"""
+        return f"UNLOAD ({query.strip().rstrip(';')})\nTO '{location}'\nWITH (format = 'PARQUET', compression = 'SNAPPY')"
+    
+    def fetch_batches(self, query: str, stop: Optional[threading.Event] = None,
+                      on_query_started: Optional[Callable[[str], None]] = None) -> Iterator[List[DataRecord]]:
+        """UNLOAD the query to Parquet and yield one batch per row group"""
+        try:
+            _, location = self._execute_query(query, unload=True, stop=stop, on_query_started=on_query_started)
+            
+            reader = ParquetResultReader(self.s3_client, location)
+            record_count = 0
+            for rows in reader.iter_row_groups():
+                yield [self.make_record(row) for row in rows]
+                record_count += len(rows)
+            
+            logger.info(f"Fetched {record_count} records from Athena UNLOAD")
+            
+        except Exception as e:
+            logger.error(f"Error fetching data from Athena: {str(e)}")
+            raise DataSourceError(f"Failed to fetch data from Athena: {str(e)}")
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Result cache hits/misses and Athena result reuse counts"""
+        if self.result_cache is None and not self.athena_config.result_reuse_max_age_minutes:
+            return {}
+        with self._stats_lock:
+            return {'result_cache': dict(self._cache_stats)}
+    
+    def _poll_intervals(self) -> Iterator[float]:
+        """Poll fast at first, then back off exponentially up to the configured cap"""
+        interval = self.athena_config.poll_initial_interval
+        while True:
+            yield interval
+            interval = min(interval * self.athena_config.poll_backoff_multiplier,
+                           self.athena_config.poll_max_interval)
+    
+    @staticmethod
+    def _check_query_execution(response: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return the QueryExecution once it succeeded, None while it is still running"""
+        query_execution = response['QueryExecution']
+        status = query_execution['Status']['State']
+        statistics = query_execution.get('Statistics', {})
+        logger.info(
+            f"Query {query_execution.get('QueryExecutionId')} is {status}: "
+            f"{statistics.get('DataScannedInBytes', 0)} bytes scanned, "
+            f"{statistics.get('EngineExecutionTimeInMillis', 0)} ms engine time, "
+            f"{statistics.get('QueryQueueTimeInMillis', 0)} ms queued"
+        )
+        
+        if status == 'SUCCEEDED':
+            logger.info("Query completed successfully")
+            return query_execution
+        elif status in ['FAILED', 'CANCELLED']:
+            reason = query_execution['Status'].get('StateChangeReason', 'Unknown error')
+            raise DataSourceError(f"Query {status.lower()}: {reason}")
+        return None
+    
+    def _wait_for_query_completion(self, query_execution_id: str,
+                                   stop: Optional[threading.Event] = None) -> Dict[str, Any]:
+        """Wait for Athena query to complete and return its QueryExecution; setting stop abandons the wait"""
+        max_wait_time = self.athena_config.query_timeout_seconds
+        deadline = time.monotonic() + max_wait_time
         
         logger.info("Waiting for query completion...")
         
-        while total_wait < max_wait_time:
+        for wait_interval in self._poll_intervals():
             response = self.athena_client.get_query_execution(QueryExecutionId=query_execution_id)
-            status = response['QueryExecution']['Status']['State']
+            query_execution = self._check_query_execution(response)
+            if query_execution is not None:
+                return query_execution
             
-            if status == 'SUCCEEDED':
-                logger.info("Query completed successfully")
-                return
-            elif status in ['FAILED', 'CANCELLED']:
-                reason = response['QueryExecution']['Status'].get('StateChangeReason', 'Unknown error')
-                raise DataSourceError(f"Query {status.lower()}: {reason}")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if stop is None:
+                time.sleep(min(wait_interval, remaining))
+            elif stop.wait(min(wait_interval, remaining)):
+                raise DataSourceError(f"Stopped waiting for query {query_execution_id}")
+        
+        raise DataSourceError(f"Query timeout after {max_wait_time} seconds")
+    
+    def stop_query(self, query_execution_id: str) -> None:
+        """Cancel a query so it stops scanning (and billing); a finished query is left as it is"""
+        try:
+            self.athena_client.stop_query_execution(QueryExecutionId=query_execution_id)
+            logger.info(f"Stopped query execution {query_execution_id}")
+        except (BotoCoreError, ClientError) as e:
+            logger.warning(f"Could not stop query execution {query_execution_id}: {str(e)}")
+    
+    async def wait_for_query_completion_async(self, query_execution_id: str) -> Dict[str, Any]:
+        """
+        Asyncio variant of _wait_for_query_completion.
+        Only the GetQueryExecution call itself runs in a worker thread; the waits between
+        polls are asyncio sleeps, so many queries can be awaited on one event loop.
+        """
+        client = self.athena_client  # Initialize on the loop thread, not in a worker
+        max_wait_time = self.athena_config.query_timeout_seconds
+        deadline = time.monotonic() + max_wait_time
+        
+        for wait_interval in self._poll_intervals():
+            response = await asyncio.to_thread(client.get_query_execution, QueryExecutionId=query_execution_id)
+            query_execution = self._check_query_execution(response)
+            if query_execution is not None:
+                return query_execution
             
-            time.sleep(wait_interval)
-            total_wait += wait_interval
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(wait_interval, remaining))
         
         raise DataSourceError(f"Query timeout after {max_wait_time} seconds")
     
+    async def wait_for_queries_async(self, query_execution_ids: List[str]) -> List[Dict[str, Any]]:
+        """Await several queries concurrently; results follow the order of the IDs"""
+        return await asyncio.gather(
+            *(self.wait_for_query_completion_async(qid) for qid in query_execution_ids)
+        )
+    
+    def read_query_results(self, query_execution: Dict[str, Any]) -> Iterator[DataRecord]:
+        """Read results via the configured reader, falling back to GetQueryResults"""
+        query_execution_id = query_execution['QueryExecutionId']
+        reader_mode = self.athena_config.result_reader
+        output_location = query_execution.get('ResultConfiguration', {}).get('OutputLocation')
+        
+        if reader_mode != 'api' and output_location:
+            reader = self._create_s3_reader(output_location)
+            try:
+                _ = reader.content_length  # Probe the object before committing to the S3 path
+            except (BotoCoreError, ClientError) as e:
+                if reader_mode == 's3':
+                    raise
+                logger.warning(f"Cannot read result object {output_location}, falling back to GetQueryResults: {str(e)}")
+            else:
+                yield from self._fetch_s3_results(reader)
+                return
+        elif reader_mode == 's3':
+            raise DataSourceError(f"Query {query_execution_id} has no S3 output location")
+        
+        yield from self._fetch_query_results(query_execution_id)
+    
+    def _create_s3_reader(self, output_location: str) -> S3ResultReader:
+        """Sequential reader for concurrency 1, parallel ranged reader otherwise"""
+        config = self.athena_config
+        if config.s3_read_concurrency > 1:
+            return ParallelS3ResultReader(
+                self.s3_client,
+                output_location,
+                config.s3_read_chunk_size,
+                concurrency=config.s3_read_concurrency,
+                max_inflight_ranges=config.s3_max_inflight_ranges,
+                preserve_order=config.s3_preserve_order
+            )
+        return S3ResultReader(self.s3_client, output_location, config.s3_read_chunk_size)
+    
+    def _fetch_s3_results(self, reader: S3ResultReader) -> Iterator[DataRecord]:
+        """Stream results from the query's result CSV in S3"""
+        rows = reader.iter_rows()
+        headers = next(rows, None)
+        if headers is None:
+            logger.info("Fetched 0 records from Athena result object")
+            return
+        logger.info(f"Query returned {len(headers)} columns: {headers}")
+        
+        record_count = 0
+        for row in rows:
+            try:
+                yield self.make_record(self._row_to_dict(headers, row))
+                record_count += 1
+            except Exception as e:
+                logger.warning(f"Error processing row: {str(e)}")
+                continue
+        
+        logger.info(f"Fetched {record_count} records from Athena result object")
+    
+    @staticmethod
+    def _row_to_dict(headers: List[str], values: List[str]) -> Dict[str, Any]:
+        """Map positional row values onto the header names"""
+        return dict(zip(headers, values))
+    
     def _fetch_query_results(self, query_execution_id: str) -> Iterator[DataRecord]:
-        """Fetch results from completed Athena query"""
+        """Fetch results from completed Athena query via GetQueryResults"""
         paginator = self.athena_client.get_paginator('get_query_results')
         
         headers = []
@@ -127,7 +465,7 @@ class AthenaDataSource(DataSource):
                         if i < len(headers):
                             data[headers[i]] = value
                     
-                    yield DataRecord.from_dict(data)
+                    yield self.make_record(data)
                     record_count += 1
                     
                 except Exception as e:
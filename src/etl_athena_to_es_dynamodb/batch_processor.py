@@ -1,8 +1,9 @@
 # batch_processor.py
 import logging
-from typing import Iterator, List
+from typing import Iterator, List, Optional
 from etl_athena_to_es_dynamodb.interfaces import BatchProcessor
 from etl_athena_to_es_dynamodb.models import DataRecord
+from etl_athena_to_es_dynamodb.telemetry import Telemetry
 from etl_athena_to_es_dynamodb.exceptions import BatchProcessingError
 
 logger = logging.getLogger(__name__)
@@ -10,6 +11,14 @@ logger = logging.getLogger(__name__)
 class SimpleBatchProcessor(BatchProcessor):
     """Simple batch processor implementation (SRP)"""
     
+    def __init__(self, telemetry: Optional[Telemetry] = None):
+        self.telemetry = telemetry
+    
+    def _emit(self, batch: List[DataRecord]) -> List[DataRecord]:
+        if self.telemetry is not None:
+            self.telemetry.observe('batch_records', len(batch))
+        return batch
+    
     def process_batches(self, data_iterator: Iterator[DataRecord], 
                        batch_size: int) -> Iterator[List[DataRecord]]:
         """Process data records in batches"""
@@ -22,14 +31,35 @@ class SimpleBatchProcessor(BatchProcessor):
                 record_count += 1
                 
                 if len(batch) >= batch_size:
-                    logger.debug(f"Yielding batch of {len(batch)} records")
-                    yield batch
+                    logger.debug("Yielding batch of %s records", len(batch))
+                    yield self._emit(batch)
                     batch = []
             
             # Yield remaining records
             if batch:
-                logger.debug(f"Yielding final batch of {len(batch)} records")
-                yield batch
+                logger.debug("Yielding final batch of %s records", len(batch))
+                yield self._emit(batch)
+            
+            logger.info(f"Batch processing completed. Total records: {record_count}")
+                
+        except Exception as e:
+            logger.error(f"Error during batch processing: {str(e)}")
+            raise BatchProcessingError(f"Batch processing failed: {str(e)}")
+    
+    def process_record_batches(self, batch_iterator: Iterator[List[DataRecord]],
+                               batch_size: int) -> Iterator[List[DataRecord]]:
+        """Pass source batches through, only slicing the ones larger than batch_size"""
+        try:
+            record_count = 0
+            
+            for batch in batch_iterator:
+                record_count += len(batch)
+                if len(batch) <= batch_size:
+                    if batch:
+                        yield self._emit(batch)
+                    continue
+                for start in range(0, len(batch), batch_size):
+                    yield self._emit(batch[start:start + batch_size])
             
             logger.info(f"Batch processing completed. Total records: {record_count}")
                 
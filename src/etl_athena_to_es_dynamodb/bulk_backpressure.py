@@ -0,0 +1,70 @@
+# bulk_backpressure.py
+import time
+import threading
+from typing import Callable, Dict, Any
+
+class BulkBackpressureController:
+    """
+    AIMD control of OpenSearch bulk request size and concurrency (SRP).
+    Rejections halve the request size and drop one concurrent request; requests slower than
+    the target latency shrink the size gently; clean responses grow both back towards their caps.
+    """
+
+    GROW_CONCURRENCY_AFTER = 10  # Consecutive clean responses before adding a concurrent request
+
+    def __init__(self, max_actions: int, min_actions: int, max_concurrency: int,
+                 target_latency: float, decrease_factor: float = 0.5,
+                 latency_decrease_factor: float = 0.8, decrease_cooldown: float = 1.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_actions = max_actions
+        self.min_actions = min(min_actions, max_actions)
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self.latency_decrease_factor = latency_decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self.size_step = max(1, max_actions // 10)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.bulk_size = max_actions
+        self.concurrency = max_concurrency
+        self._clean_streak = 0
+        self._last_decrease = float('-inf')
+        self.sent_items = 0
+        self.rejected_items = 0
+
+    def _decrease(self, factor: float, drop_concurrency: bool) -> None:
+        now = self._clock()
+        if now - self._last_decrease < self.decrease_cooldown:
+            return
+        self.bulk_size = max(self.min_actions, int(self.bulk_size * factor))
+        if drop_concurrency:
+            self.concurrency = max(1, self.concurrency - 1)
+        self._last_decrease = now
+
+    def on_response(self, actions: int, rejected: int, seconds: float) -> None:
+        """Feed back one _bulk response"""
+        with self._lock:
+            self.sent_items += actions
+            self.rejected_items += rejected
+            if rejected:
+                self._clean_streak = 0
+                self._decrease(self.decrease_factor, drop_concurrency=True)
+            elif seconds > self.target_latency:
+                self._clean_streak = 0
+                self._decrease(self.latency_decrease_factor, drop_concurrency=False)
+            else:
+                self._clean_streak += 1
+                self.bulk_size = min(self.max_actions, self.bulk_size + self.size_step)
+                if self._clean_streak >= self.GROW_CONCURRENCY_AFTER:
+                    self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+                    self._clean_streak = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current controller state for batch results"""
+        with self._lock:
+            return {
+                'bulk_size': self.bulk_size,
+                'bulk_concurrency': self.concurrency,
+                'rejection_rate': round(self.rejected_items / self.sent_items, 4) if self.sent_items else 0.0
+            }
@@ -0,0 +1,191 @@
+# bulk_chunker.py
+import time
+import logging
+import threading
+from typing import Iterable, Iterator, List, Tuple, Optional, Dict, Any
+from opensearchpy.exceptions import TransportError
+from opensearchpy.helpers import expand_action
+from etl_athena_to_es_dynamodb.bulk_backpressure import BulkBackpressureController
+
+logger = logging.getLogger(__name__)
+
+class BulkChunk:
+    """One _bulk request: the source actions and their serialized NDJSON lines"""
+    __slots__ = ('actions', 'action_lines', 'size_bytes')
+
+    def __init__(self):
+        self.actions: List[dict] = []
+        self.action_lines: List[List[bytes]] = []
+        self.size_bytes = 0
+
+    def add(self, action: dict, lines: List[bytes], size: int) -> None:
+        self.actions.append(action)
+        self.action_lines.append(lines)
+        self.size_bytes += size
+
+    def subset(self, indices: List[int]) -> 'BulkChunk':
+        """A chunk of just the given actions, reusing their serialized lines"""
+        chunk = BulkChunk()
+        for index in indices:
+            lines = self.action_lines[index]
+            chunk.add(self.actions[index], lines, sum(len(line) + 1 for line in lines))
+        return chunk
+
+    @property
+    def body(self) -> bytes:
+        return b''.join(line + b'\n' for lines in self.action_lines for line in lines)
+
+class BulkChunker:
+    """Packs bulk actions, in order, into requests capped by action count and serialized bytes (SRP)"""
+
+    def __init__(self, serializer, max_actions: int, max_bytes: int, controller: Optional[BulkBackpressureController] = None):
+        self.serializer = serializer
+        self.max_actions = max_actions
+        self.max_bytes = max_bytes
+        self.controller = controller
+        self.chunked_bytes = 0  # Serialized size of every chunk yielded so far
+
+    def _action_limit(self) -> int:
+        if self.controller is None:
+            return self.max_actions
+        return min(self.max_actions, self.controller.bulk_size)
+
+    def _serialize(self, action: dict) -> Tuple[List[bytes], int]:
+        header, body = expand_action(action)
+        lines = [self.serializer.dumps(header).encode('utf-8')]
+        if body is not None:
+            lines.append(self.serializer.dumps(body).encode('utf-8'))
+        return lines, sum(len(line) + 1 for line in lines)
+
+    def chunks(self, actions: Iterable[dict]) -> Iterator[BulkChunk]:
+        """Greedily fill each request until the next action would cross a limit"""
+        chunk = BulkChunk()
+        for action in actions:
+            lines, size = self._serialize(action)
+            if chunk.actions and (len(chunk.actions) >= self._action_limit() or chunk.size_bytes + size > self.max_bytes):
+                self.chunked_bytes += chunk.size_bytes
+                yield chunk
+                chunk = BulkChunk()
+            if size > self.max_bytes:
+                logger.warning(f"Single bulk action of {size} bytes exceeds max_bytes={self.max_bytes}; sending it alone")
+            chunk.add(action, lines, size)
+        if chunk.actions:
+            self.chunked_bytes += chunk.size_bytes
+            yield chunk
+
+class BulkStats:
+    """Cumulative per-request size and latency figures for a sink"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.actions = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.max_request_bytes = 0
+        self.max_request_seconds = 0.0
+        self.rejected_items = 0
+        self.retries = 0
+        self.stale_children_deleted = 0
+        self.stale_delete_failures = 0
+
+    def record_stale_deleted(self, count: int) -> None:
+        with self._lock:
+            self.stale_children_deleted += count
+
+    def record_stale_delete_failure(self) -> None:
+        with self._lock:
+            self.stale_delete_failures += 1
+
+    def record_retry(self, rejected_items: int) -> None:
+        with self._lock:
+            self.retries += 1
+            self.rejected_items += rejected_items
+
+    def record(self, actions: int, size_bytes: int, seconds: float) -> None:
+        with self._lock:
+            self.requests += 1
+            self.actions += actions
+            self.bytes += size_bytes
+            self.seconds += seconds
+            self.max_request_bytes = max(self.max_request_bytes, size_bytes)
+            self.max_request_seconds = max(self.max_request_seconds, seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'bulk_requests': self.requests,
+                'bulk_actions': self.actions,
+                'bulk_bytes': self.bytes,
+                'bulk_seconds': round(self.seconds, 3),
+                'max_bulk_request_bytes': self.max_request_bytes,
+                'max_bulk_request_seconds': round(self.max_request_seconds, 3),
+                'avg_bulk_request_seconds': round(self.seconds / self.requests, 3) if self.requests else 0.0,
+                'bulk_retries': self.retries,
+                'bulk_rejected_items': self.rejected_items,
+                'stale_children_deleted': self.stale_children_deleted,
+                'stale_delete_failures': self.stale_delete_failures
+            }
+
+REJECTION_ERROR_TYPES = ('es_rejected_execution_exception', 'rejected_execution_exception')
+
+def is_rejection(info: Dict[str, Any]) -> bool:
+    """Item was refused by a full write queue rather than failing on its own content"""
+    error = info.get('error')
+    error_type = error.get('type') if isinstance(error, dict) else None
+    return info.get('status') == 429 or error_type in REJECTION_ERROR_TYPES
+
+class BulkOutcome:
+    """Per-request result: successes, failed items, and the chunk indices of rejected actions"""
+    __slots__ = ('success_count', 'failed_items', 'rejected', 'seconds')
+
+    def __init__(self, seconds: float):
+        self.success_count = 0
+        self.failed_items: List[dict] = []
+        self.rejected: List[Tuple[int, dict]] = []  # (chunk index, response item)
+        self.seconds = seconds
+
+def _whole_request_rejection(chunk: BulkChunk, error: TransportError) -> Dict[str, Any]:
+    """A 429 for the whole request reads as every action rejected; other errors propagate"""
+    if error.status_code != 429:
+        raise error
+    # Shaped like real items so failures still map back to their records by _id
+    return {'items': [
+        {action.get('_op_type', 'index'): {'_index': action.get('_index'), '_id': action.get('_id'),
+                                           'status': 429, 'error': str(error)}}
+        for action in chunk.actions
+    ]}
+
+def parse_bulk_response(chunk: BulkChunk, response: Dict[str, Any], elapsed: float, stats: BulkStats) -> BulkOutcome:
+    """Record the request and split its items into successes, failures and rejections"""
+    stats.record(len(chunk.actions), chunk.size_bytes, elapsed)
+    logger.debug("Bulk request: %s actions, %s bytes, %.3fs", len(chunk.actions), chunk.size_bytes, elapsed)
+
+    outcome = BulkOutcome(elapsed)
+    for index, item in enumerate(response.get('items', [])):
+        info = next(iter(item.values()))
+        if 200 <= info.get('status', 500) < 300:
+            outcome.success_count += 1
+        elif is_rejection(info):
+            outcome.rejected.append((index, item))
+        else:
+            outcome.failed_items.append(item)
+    return outcome
+
+def send_chunk(client, chunk: BulkChunk, request_timeout: int, stats: BulkStats) -> BulkOutcome:
+    """Send one _bulk request; a whole-request 429 marks every action as rejected"""
+    start = time.perf_counter()
+    try:
+        response = client.bulk(body=chunk.body, request_timeout=request_timeout)
+    except TransportError as e:
+        response = _whole_request_rejection(chunk, e)
+    return parse_bulk_response(chunk, response, time.perf_counter() - start, stats)
+
+async def send_chunk_async(client, chunk: BulkChunk, request_timeout: int, stats: BulkStats) -> BulkOutcome:
+    """send_chunk for AsyncOpenSearch clients"""
+    start = time.perf_counter()
+    try:
+        response = await client.bulk(body=chunk.body, request_timeout=request_timeout)
+    except TransportError as e:
+        response = _whole_request_rejection(chunk, e)
+    return parse_bulk_response(chunk, response, time.perf_counter() - start, stats)
@@ -0,0 +1,153 @@
+# change_detector.py
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Iterator, List, Dict, Tuple, Any
+from etl_athena_to_es_dynamodb.interfaces import BatchProcessor
+from etl_athena_to_es_dynamodb.models import DataRecord, BatchResult, ChangeDetectionConfig
+from etl_athena_to_es_dynamodb.exceptions import BatchProcessingError
+
+logger = logging.getLogger(__name__)
+
+class DigestStore:
+    """SQLite table of the last written content digest per (namespace, key) (SRP)"""
+
+    QUERY_CHUNK = 500  # Stay well below SQLite's bound-parameter limit
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS digests ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, digest TEXT NOT NULL, updated_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self._conn.commit()
+
+    def get_many(self, namespace: str, keys: List[str]) -> Dict[str, str]:
+        """Stored digests for the given keys"""
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), self.QUERY_CHUNK):
+                chunk = keys[start:start + self.QUERY_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, digest FROM digests WHERE namespace = ? AND key IN ({placeholders})",
+                    [namespace, *chunk]
+                )
+                found.update(rows)
+        return found
+
+    def put_many(self, namespace: str, digests: List[Tuple[str, str]]) -> None:
+        """Upsert (key, digest) pairs"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO digests (namespace, key, digest, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(namespace, key) DO UPDATE SET digest = excluded.digest, updated_at = excluded.updated_at",
+                [(namespace, key, digest, now) for key, digest in digests]
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ChangeDetectingBatchProcessor(BatchProcessor):
+    """
+    Wraps another BatchProcessor and forwards only records whose content changed
+    since they were last written (Decorator, SRP).
+    Digests are committed only after every sink wrote the batch without failures,
+    so records from a failed batch are retried on the next run.
+    """
+
+    def __init__(self, inner: BatchProcessor, config: ChangeDetectionConfig, namespace: str):
+        self.inner = inner
+        self.config = config
+        self.namespace = namespace
+        self.store = DigestStore(config.digest_store_path)
+        self._pending: Dict[int, List[Tuple[str, str]]] = {}
+        self._lock = threading.Lock()
+        self._stats = {'checked_records': 0, 'changed_records': 0, 'skipped_records': 0, 'committed_records': 0}
+        logger.info(f"Change detection enabled for namespace: {namespace}")
+
+    @property
+    def preserves_order(self) -> bool:
+        return self.inner.preserves_order
+    
+    @staticmethod
+    def digest(record: DataRecord) -> str:
+        """Hash of the record's canonical to_dict() form"""
+        canonical = json.dumps(record.to_dict(), sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()
+
+    def _filter(self, batch: List[DataRecord]) -> List[DataRecord]:
+        keyed = [(str(record.data.get(self.config.key_field)), self.digest(record), record) for record in batch]
+        stored = self.store.get_many(self.namespace, [key for key, _, _ in keyed])
+        changed = [(key, digest, record) for key, digest, record in keyed if stored.get(key) != digest]
+
+        with self._lock:
+            self._stats['checked_records'] += len(batch)
+            self._stats['changed_records'] += len(changed)
+            self._stats['skipped_records'] += len(batch) - len(changed)
+
+        filtered = [record for _, _, record in changed]
+        if filtered:
+            with self._lock:
+                self._pending[id(filtered)] = [(key, digest) for key, digest, _ in changed]
+        logger.debug("Change detection: %s of %s records changed", len(filtered), len(batch))
+        return filtered
+
+    def _filtered(self, batches: Iterator[List[DataRecord]]) -> Iterator[List[DataRecord]]:
+        try:
+            for batch in batches:
+                filtered = self._filter(batch)
+                if filtered:
+                    yield filtered
+        except BatchProcessingError:
+            raise
+        except Exception as e:
+            logger.error(f"Error during change detection: {str(e)}")
+            raise BatchProcessingError(f"Change detection failed: {str(e)}")
+
+    def process_batches(self, data_iterator: Iterator[DataRecord],
+                        batch_size: int) -> Iterator[List[DataRecord]]:
+        """Batch with the inner processor, then drop unchanged records"""
+        return self._filtered(self.inner.process_batches(data_iterator, batch_size))
+
+    def process_record_batches(self, batch_iterator: Iterator[List[DataRecord]],
+                               batch_size: int) -> Iterator[List[DataRecord]]:
+        return self._filtered(self.inner.process_record_batches(batch_iterator, batch_size))
+
+    def on_batch_completed(self, batch: List[DataRecord], sink_results: Dict[str, BatchResult]) -> None:
+        """Commit the batch's digests if every sink wrote it without failures"""
+        self.inner.on_batch_completed(batch, sink_results)
+        with self._lock:
+            digests = self._pending.pop(id(batch), None)
+        if not digests:
+            return
+        if any(result.failed_records for result in sink_results.values()):
+            logger.info(f"Not committing {len(digests)} digests: batch had sink failures")
+            return
+        self.store.put_many(self.namespace, digests)
+        with self._lock:
+            self._stats['committed_records'] += len(digests)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        statistics = self.inner.get_statistics()
+        with self._lock:
+            return {**statistics, 'change_detection': dict(self._stats)}
+
+    def close(self) -> None:
+        try:
+            self.inner.close()
+        finally:
+            self.store.close()
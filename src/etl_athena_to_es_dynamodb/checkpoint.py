@@ -0,0 +1,192 @@
+# checkpoint.py
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from typing import Iterator, List, Dict, Tuple, Optional, Any
+from etl_athena_to_es_dynamodb.interfaces import CheckpointStore, DataSource
+from etl_athena_to_es_dynamodb.models import DataRecord, RunCheckpoint
+from etl_athena_to_es_dynamodb.query_cache import QueryResultCache
+
+logger = logging.getLogger(__name__)
+
+class FileCheckpointStore(CheckpointStore):
+    """Checkpoints of unfinished runs in one local JSON file, keyed by run (SRP)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable checkpoint file {self.path}: {str(e)}")
+            return {}
+
+    def _write(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        """Write atomically and durably; a checkpoint that is lost on a crash is no checkpoint"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def load(self, run_key: str) -> Optional[RunCheckpoint]:
+        with self._lock:
+            entry = self._read().get(run_key)
+        return RunCheckpoint(**entry) if entry else None
+
+    def save(self, checkpoint: RunCheckpoint) -> None:
+        with self._lock:
+            entries = self._read()
+            entries[checkpoint.run_key] = checkpoint.model_dump()
+            self._write(entries)
+
+    def delete(self, run_key: str) -> None:
+        with self._lock:
+            entries = self._read()
+            if entries.pop(run_key, None) is not None:
+                self._write(entries)
+
+class RunCheckpointer:
+    """
+    Tracks how far each sink has written into the source result and persists it (SRP).
+    Records are numbered by their offset in the source result. Batch processors keep record
+    order, so a batch ends at the offset of its last record, and records a processor dropped
+    fall into the gap before the next batch. Each sink's resume point is the end of its last
+    batch in an unbroken run of acknowledged batches.
+    """
+
+    def __init__(self, store: CheckpointStore, resume: bool = False):
+        self.store = store
+        self.resume = resume
+        self._lock = threading.Lock()
+        self._checkpoint: Optional[RunCheckpoint] = None
+        self._data_source: Optional[DataSource] = None
+        self._resume_offsets: Dict[str, int] = {}
+        self._offsets: Dict[int, int] = {}  # id(record) -> source offset, for records inside the processor
+        self._in_flight: deque = deque()  # (offset, record); also keeps dropped records alive so ids stay unique
+        self._batch_ends: Dict[int, int] = {}
+        self._emitted = 0
+        self._acknowledged: Dict[str, int] = {}
+        self._early_acks: Dict[str, set] = {}
+        self._warned_unresumable = False
+
+    @staticmethod
+    def run_key(query: str) -> str:
+        return QueryResultCache.fingerprint(query, 'run')
+
+    def begin(self, query: str, data_source: DataSource, sink_names: List[str]) -> int:
+        """Load or start the run's checkpoint; returns the number of leading source records to skip"""
+        run_key = self.run_key(query)
+        self._data_source = data_source
+        self._acknowledged = {name: 0 for name in sink_names}
+        self._early_acks = {name: set() for name in sink_names}
+
+        checkpoint = self.store.load(run_key)
+        if checkpoint is not None and not self.resume:
+            logger.warning("Discarding the checkpoint of an unfinished run of this query; pass --resume to continue it")
+            self.store.delete(run_key)
+            checkpoint = None
+        if self.resume and checkpoint is None:
+            logger.info("No checkpoint for this query; starting from the beginning")
+
+        if checkpoint is None:
+            self._checkpoint = RunCheckpoint(run_key=run_key)
+            return 0
+
+        data_source.restore_checkpoint_state(checkpoint.source_state)
+        self._checkpoint = checkpoint
+        self._resume_offsets = {name: checkpoint.sink_offsets.get(name, 0) for name in sink_names}
+        skip = min(self._resume_offsets.values())
+        logger.info(f"Resuming run at source offset {skip}; per-sink offsets: {self._resume_offsets}")
+        return skip
+
+    def track(self, chunks: Iterator[List[DataRecord]], start_offset: int) -> Iterator[List[DataRecord]]:
+        """Number the records of the reader's chunks by their source offset"""
+        offset = start_offset
+        for chunk in chunks:
+            for record in chunk:
+                self._offsets[id(record)] = offset
+                self._in_flight.append((offset, record))
+                offset += 1
+            yield chunk
+
+    def emitted(self, batch: List[DataRecord]) -> Tuple[int, Dict[str, List[DataRecord]]]:
+        """Number a processed batch and pick, per sink, the records it has not written yet"""
+        end = self._offsets[id(batch[-1])] + 1
+        records = {}
+        for name in self._acknowledged:
+            written = self._resume_offsets.get(name, 0)
+            if end <= written:
+                records[name] = []
+            elif self._offsets[id(batch[0])] >= written:
+                records[name] = batch
+            else:
+                records[name] = [record for record in batch if self._offsets[id(record)] >= written]
+
+        while self._in_flight and self._in_flight[0][0] < end:
+            _, record = self._in_flight.popleft()
+            del self._offsets[id(record)]
+
+        with self._lock:
+            self._emitted += 1
+            number = self._emitted
+            self._batch_ends[number] = end
+        if number == 1:
+            self._save()  # Record the source result as soon as it is known
+        return number, records
+
+    def acknowledge(self, sink_name: str, number: int) -> None:
+        """A sink wrote batch number; persist if its resume point moved"""
+        with self._lock:
+            self._early_acks[sink_name].add(number)
+            advanced = False
+            while self._acknowledged[sink_name] + 1 in self._early_acks[sink_name]:
+                self._acknowledged[sink_name] += 1
+                self._early_acks[sink_name].remove(self._acknowledged[sink_name])
+                end = self._batch_ends[self._acknowledged[sink_name]]
+                offsets = self._checkpoint.sink_offsets
+                offsets[sink_name] = max(offsets.get(sink_name, 0), end)
+                self._checkpoint.sink_batches[sink_name] = self._checkpoint.sink_batches.get(sink_name, 0) + 1
+                advanced = True
+            if not advanced:
+                return
+            done = min(self._acknowledged.values())
+            for old in [n for n in self._batch_ends if n <= done]:
+                del self._batch_ends[old]
+        self._save()
+
+    def _save(self) -> None:
+        state = self._data_source.checkpoint_state()
+        if state is None:
+            if not self._warned_unresumable:
+                logger.warning(f"{self._data_source.__class__.__name__} cannot be resumed in order; not checkpointing")
+                self._warned_unresumable = True
+            return
+        with self._lock:
+            self._checkpoint.source_state = state
+            self._checkpoint.updated_at = time.time()
+            snapshot = self._checkpoint.model_copy(deep=True)
+        self.store.save(snapshot)
+
+    def finish(self, succeeded: bool) -> None:
+        """Forget the run once every sink acknowledged every batch; otherwise keep it for --resume"""
+        if self._checkpoint is None or self._warned_unresumable:
+            return
+        with self._lock:
+            complete = succeeded and all(count == self._emitted for count in self._acknowledged.values())
+        if complete:
+            self.store.delete(self._checkpoint.run_key)
+            logger.info("Run completed; checkpoint removed")
+        else:
+            logger.info(f"Run checkpoint kept for --resume; per-sink offsets: {self._checkpoint.sink_offsets}")
@@ -0,0 +1,208 @@
+# dead_letter.py
+import os
+import gzip
+import json
+import time
+import zlib
+import logging
+import threading
+from typing import Iterator, List, Dict, Any
+from etl_athena_to_es_dynamodb.interfaces import DataSink
+from etl_athena_to_es_dynamodb.models import FailedRecord, Record, BatchResult
+
+logger = logging.getLogger(__name__)
+
+class DeadLetterSpool:
+    """
+    Per-sink spool of failed records as gzip-compressed NDJSON segments (SRP).
+    Every write is flushed, so a crash loses at most the line being written.
+    """
+
+    SEGMENT_SUFFIX = '.ndjson.gz'
+    CLAIMED_SUFFIX = '.replaying'  # Appended to segments a replay has taken over
+
+    def __init__(self, directory: str, segment_max_bytes: int = 64 * 1024 * 1024):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self._lock = threading.Lock()
+        self._open: Dict[str, Any] = {}  # sink name -> (raw file, gzip file)
+        self._counts: Dict[str, int] = {}
+
+    def _sink_directory(self, sink_name: str) -> str:
+        return os.path.join(self.directory, sink_name)
+
+    def _segment(self, sink_name: str):
+        """The sink's open segment, rotated once it reaches segment_max_bytes"""
+        current = self._open.get(sink_name)
+        if current is not None and current[0].tell() < self.segment_max_bytes:
+            return current[1]
+        if current is not None:
+            current[1].close()
+            current[0].close()
+        directory = self._sink_directory(sink_name)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{time.time_ns()}-{os.getpid()}{self.SEGMENT_SUFFIX}")
+        raw = open(path, 'ab')
+        self._open[sink_name] = (raw, gzip.GzipFile(fileobj=raw, mode='ab'))
+        logger.info(f"Dead-letter segment opened for {sink_name}: {path}")
+        return self._open[sink_name][1]
+
+    def write(self, sink_name: str, failures: List[FailedRecord]) -> None:
+        """Append failed records, one JSON line each"""
+        if not failures:
+            return
+        failed_at = time.time()
+        lines = b''.join(
+            json.dumps({'data': failure.data, 'error': failure.error, 'failed_at': failed_at},
+                       default=str).encode('utf-8') + b'\n'
+            for failure in failures
+        )
+        with self._lock:
+            segment = self._segment(sink_name)
+            segment.write(lines)
+            segment.flush()
+            self._counts[sink_name] = self._counts.get(sink_name, 0) + len(failures)
+
+    def segments(self, sink_name: str) -> List[str]:
+        """Closed and open segments of a sink, oldest first"""
+        directory = self._sink_directory(sink_name)
+        if not os.path.isdir(directory):
+            return []
+        names = sorted(name for name in os.listdir(directory) if name.endswith(self.SEGMENT_SUFFIX))
+        return [os.path.join(directory, name) for name in names]
+
+    def claimed(self, sink_name: str) -> List[str]:
+        """Segments of a sink claimed by a replay, oldest first"""
+        directory = self._sink_directory(sink_name)
+        if not os.path.isdir(directory):
+            return []
+        suffix = self.SEGMENT_SUFFIX + self.CLAIMED_SUFFIX
+        return [os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.endswith(suffix)]
+
+    def claim(self, sink_name: str) -> List[str]:
+        """
+        Take a sink's segments over for a replay by renaming them, so failures spooled during the
+        replay never mix with them. Segments still claimed by a replay that crashed are included.
+        """
+        for path in self.segments(sink_name):
+            os.replace(path, path + self.CLAIMED_SUFFIX)
+        return self.claimed(sink_name)
+
+    def sink_names(self) -> List[str]:
+        """Sinks with spooled or claimed segments"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory) if self.segments(name) or self.claimed(name))
+
+    @staticmethod
+    def _decompressed(path: str) -> Iterator[bytes]:
+        """Decompress gzip members in turn; stops at the tail a crash left unfinished"""
+        with open(path, 'rb') as f:
+            decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+            for data in iter(lambda: f.read(64 * 1024), b''):
+                while data:
+                    before = decompressor.copy()
+                    try:
+                        yield decompressor.decompress(data)
+                    except zlib.error:
+                        # The failed call returns nothing; redo it a byte at a time to keep what precedes the damage
+                        logger.warning(f"Dead-letter segment {path} has a corrupt tail; reading what precedes it")
+                        try:
+                            for index in range(len(data)):
+                                yield before.decompress(data[index:index + 1])
+                        except zlib.error:
+                            pass
+                        return
+                    data = b''
+                    if decompressor.eof:
+                        data = decompressor.unused_data
+                        decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+
+    @classmethod
+    def read(cls, path: str) -> Iterator[FailedRecord]:
+        """Failed records of one segment; a torn last line from a crash is skipped"""
+        pending = b''
+        for data in cls._decompressed(path):
+            lines = (pending + data).split(b'\n')
+            pending = lines.pop()
+            for line in lines:
+                entry = json.loads(line)
+                yield FailedRecord.model_construct(data=entry['data'], error=entry['error'])
+        if pending:
+            logger.warning(f"Skipping torn dead-letter line at the end of {path}")
+
+    def statistics(self) -> Dict[str, int]:
+        """Records spooled per sink by this spool"""
+        with self._lock:
+            return dict(self._counts)
+
+    def close(self) -> None:
+        with self._lock:
+            for raw, segment in self._open.values():
+                segment.close()
+                raw.close()
+            self._open = {}
+
+class DeadLetterReplayer:
+    """
+    Re-drives spooled records through their sinks; records that fail again go to a new segment (SRP).
+    Segments are claimed before and deleted after their replay. A replay that crashes leaves them
+    claimed for the next one, which may then write records twice; sink writes are upserts.
+    """
+
+    def __init__(self, spool: DeadLetterSpool, sinks: Dict[str, DataSink], batch_size: int):
+        self.spool = spool
+        self.sinks = sinks  # spool (sink) name -> sink that replays it
+        self.batch_size = batch_size
+
+    def _batches(self, segments: List[str]) -> Iterator[List[Record]]:
+        batch = []
+        for path in segments:
+            for failure in self.spool.read(path):
+                batch.append(Record(failure.data))
+                if len(batch) >= self.batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def _replay_spool(self, spool_name: str, sink: DataSink, results: Dict[str, List[BatchResult]]) -> None:
+        segments = self.spool.claim(spool_name)
+        sink_name = sink.__class__.__name__
+        logger.info(f"Replaying {len(segments)} dead-letter segments of {spool_name} through {sink_name}")
+        for batch in self._batches(segments):
+            result = sink.upsert_batch(batch)
+            self.spool.write(sink_name, result.failures)
+            results.setdefault(sink_name, []).append(result.model_copy(update={'failures': []}))
+        for path in segments:
+            os.remove(path)
+
+    def replay(self) -> Dict[str, List[BatchResult]]:
+        """Replay every spooled sink that has a replay target, within the sink's prepare/finalize"""
+        results: Dict[str, List[BatchResult]] = {}
+        self.spool.close()  # Failures of this replay must not go into a segment being replayed
+        routes: Dict[int, List[str]] = {}
+        for spool_name in self.spool.sink_names():
+            sink = self.sinks.get(spool_name)
+            if sink is None:
+                logger.warning(f"No sink to replay dead letters of {spool_name}; leaving them spooled")
+                continue
+            routes.setdefault(id(sink), []).append(spool_name)
+
+        for spool_names in routes.values():
+            sink = self.sinks[spool_names[0]]
+            sink.prepare()
+            succeeded = False
+            try:
+                for spool_name in spool_names:
+                    self._replay_spool(spool_name, sink, results)
+                succeeded = True
+            finally:
+                sink.finalize(succeeded)
+        return results
+
+    def close(self) -> None:
+        """Close the spool and every distinct replay sink"""
+        self.spool.close()
+        for sink in {id(sink): sink for sink in self.sinks.values()}.values():
+            sink.close()
@@ -1,44 +1,173 @@
 # dynamodb_sink.py
+import time
 import boto3
+import random
 import logging
+import threading
 import traceback
-from typing import List
-from botocore.exceptions import BotoCoreError, ClientError
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import List, Dict, Tuple, Optional, Any
+from boto3.dynamodb.types import TypeSerializer
+from botocore.config import Config as BotoConfig
+from botocore.exceptions import BotoCoreError, ClientError, HTTPClientError, ConnectionError as BotoConnectionError
 from pydantic import ValidationError
 from etl_athena_to_es_dynamodb.interfaces import DataSink
-from etl_athena_to_es_dynamodb.models import DataRecord, BatchResult, AWSConfig, DynamoDBConfig, DocumentConfig
+from etl_athena_to_es_dynamodb.rate_limiter import AdaptiveRateLimiter
+from etl_athena_to_es_dynamodb.telemetry import Telemetry
+from etl_athena_to_es_dynamodb.models import DataRecord, BatchResult, FailedRecord, AWSConfig, DynamoDBConfig, DocumentConfig
 from etl_athena_to_es_dynamodb.exceptions import DataSinkError, ConfigurationError
 
 logger = logging.getLogger(__name__)
 
+def _attribute_size(value: Any) -> int:
+    """Approximate DynamoDB size of an attribute value"""
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float, Decimal)):
+        return len(str(value)) // 2 + 1  # Numbers are stored as about one byte per two digits
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return 3 + sum(len(str(key).encode('utf-8')) + 1 + _attribute_size(v) for key, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return 3 + sum(1 + _attribute_size(v) for v in value)
+    return len(str(value).encode('utf-8'))
+
 class DynamoDBDataSink(DataSink):
     """DynamoDB data sink implementation (SRP)"""
     
-    def __init__(self, aws_config: AWSConfig, dynamodb_config: DynamoDBConfig, document_config: DocumentConfig):
+    BATCH_WRITE_LIMIT = 25  # Max items per BatchWriteItem request
+    THROTTLE_ERROR_CODES = {'ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded'}
+    TRANSIENT_MAX_RETRIES = 2  # As botocore's standard mode: three attempts in all
+    
+    def __init__(self, aws_config: AWSConfig, dynamodb_config: DynamoDBConfig, document_config: DocumentConfig,
+                 telemetry: Optional[Telemetry] = None):
         try:
             self.aws_config = aws_config
             self.dynamodb_config = dynamodb_config
             self.document_config = document_config
+            self.telemetry = telemetry or Telemetry()
             self._resource = None
             self._table = None
+            self._client = None
+            self._executor = None
+            self._serializer = TypeSerializer()
+            self._init_lock = threading.Lock()  # Lazy properties may be first touched from worker threads
+            self.rate_limiter = None
+            if dynamodb_config.adaptive_throttling:
+                self.rate_limiter = AdaptiveRateLimiter(
+                    initial_rate=dynamodb_config.initial_write_rate,
+                    min_rate=dynamodb_config.min_write_rate,
+                    max_rate=dynamodb_config.max_write_rate
+                )
             logger.info("DynamoDBDataSink initialized successfully")
         except ValidationError as e:
             raise ConfigurationError(f"Invalid DynamoDB configuration: {str(e)}")
     
+    def _session(self):
+        return boto3.Session(
+            aws_access_key_id=self.aws_config.access_key_id,
+            aws_secret_access_key=self.aws_config.secret_access_key,
+            region_name=self.aws_config.region
+        )
+    
+    def _boto_config(self, pool_size: int) -> BotoConfig:
+        """
+        With adaptive throttling, throttles must reach the rate limiter instead of botocore's retries;
+        the write loops then retry other transient errors themselves
+        """
+        if self.rate_limiter:
+            return BotoConfig(max_pool_connections=pool_size, retries={'mode': 'standard', 'max_attempts': 1})
+        return BotoConfig(max_pool_connections=pool_size)
+    
+    def _is_throttle(self, error: Exception) -> bool:
+        return isinstance(error, ClientError) and error.response.get('Error', {}).get('Code') in self.THROTTLE_ERROR_CODES
+    
+    @staticmethod
+    def _is_transient(error: Exception) -> bool:
+        """5xx responses and connection failures, which botocore's retries would otherwise absorb"""
+        if isinstance(error, ClientError):
+            return error.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0) >= 500
+        return isinstance(error, (BotoConnectionError, HTTPClientError))
+    
+    def _retry_transient(self, error: Exception, attempt: int) -> bool:
+        """Back off before retrying a transient error while botocore's own retries are off"""
+        if not self.rate_limiter or not self._is_transient(error) or attempt >= self.TRANSIENT_MAX_RETRIES:
+            return False
+        logger.info(f"Transient DynamoDB error, retrying: {str(error)}")
+        time.sleep(self._backoff_delay(attempt))
+        return True
+    
+    @staticmethod
+    def item_size(item: dict) -> int:
+        """Approximate DynamoDB item size: attribute names plus values"""
+        return sum(len(name.encode('utf-8')) + _attribute_size(value) for name, value in item.items())
+    
+    @staticmethod
+    def _consumed_units(response: dict) -> float:
+        """Total CapacityUnits from a ReturnConsumedCapacity='TOTAL' response"""
+        consumed = response.get('ConsumedCapacity') or []
+        if isinstance(consumed, dict):
+            consumed = [consumed]
+        return float(sum(c.get('CapacityUnits', 0) for c in consumed))
+    
+    @property
+    def client(self):
+        """Lazy initialization of the shared, thread-safe low-level DynamoDB client"""
+        if self._client is None:
+            with self._init_lock:
+                if self._client is None:
+                    pool_size = max(10, self.dynamodb_config.write_concurrency)
+                    self._client = self._session().client(
+                        'dynamodb',
+                        config=self._boto_config(pool_size)
+                    )
+                    logger.debug("DynamoDB client initialized with %s pooled connections", pool_size)
+        return self._client
+    
+    @property
+    def resource(self):
+        """Lazy initialization of DynamoDB service resource"""
+        if self._resource is None:
+            with self._init_lock:
+                if self._resource is None:
+                    self._resource = self._session().resource('dynamodb', config=self._boto_config(10))
+                    logger.debug("DynamoDB resource initialized")
+        return self._resource
+    
     @property
     def table(self):
         """Lazy initialization of DynamoDB table resource"""
         if self._table is None:
-            session = boto3.Session(
-                aws_access_key_id=self.aws_config.access_key_id,
-                aws_secret_access_key=self.aws_config.secret_access_key,
-                region_name=self.aws_config.region
-            )
-            self._resource = session.resource('dynamodb')
-            self._table = self._resource.Table(self.dynamodb_config.table_name)
-            logger.debug("DynamoDB table resource initialized")
+            resource = self.resource
+            with self._init_lock:
+                if self._table is None:
+                    self._table = resource.Table(self.dynamodb_config.table_name)
+                    logger.debug("DynamoDB table resource initialized")
         return self._table
     
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Lazy initialization of the UpdateItem writer pool"""
+        if self._executor is None:
+            with self._init_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.dynamodb_config.write_concurrency,
+                        thread_name_prefix='dynamodb-writer'
+                    )
+        return self._executor
+    
+    @property
+    def use_batch_write(self) -> bool:
+        """Whole-item overwrite via BatchWriteItem instead of per-item UpdateItem"""
+        if self.dynamodb_config.write_mode == 'auto':
+            return bool(self.dynamodb_config.overwrite_by_pkeys)
+        return self.dynamodb_config.write_mode == 'batch_write'
+    
     @staticmethod
     def __generate_key_from_orgno(orgno):
         key = {
@@ -60,43 +189,97 @@ class DynamoDBDataSink(DataSink):
         
         return attribute_updates
     
+    @classmethod
+    def update_item_request(cls, table_name: str, record: DataRecord, serializer: TypeSerializer) -> dict:
+        """Low-level UpdateItem arguments for one record"""
+        item = record.to_dict()
+        key = cls.__generate_key_from_orgno(orgno=item.get('orgno'))
+        attribute_updates = cls.__get_attribute_updates(item=item)
+        return {
+            'TableName': table_name,
+            'Key': {name: serializer.serialize(value) for name, value in key.items()},
+            'AttributeUpdates': {
+                name: {"Value": serializer.serialize(update["Value"])}
+                for name, update in attribute_updates.items()
+            }
+        }
+    
+    def _try_update_record(self, record: DataRecord) -> Optional[str]:
+        """UpdateItem one record through the shared client; returns an error message on AWS failure"""
+        request = self.update_item_request(self.dynamodb_config.table_name, record, self._serializer)
+        if self.rate_limiter:
+            request['ReturnConsumedCapacity'] = 'TOTAL'
+        
+        attempt = 0
+        transient_attempt = 0
+        while True:
+            if self.rate_limiter:
+                self.rate_limiter.acquire(1)
+            try:
+                with self.telemetry.span('dynamodb_request', operation='UpdateItem'):
+                    response = self.client.update_item(**request)
+                if self.rate_limiter:
+                    consumed = self._consumed_units(response) or 1.0
+                    self.rate_limiter.settle(1, consumed)
+                    self.rate_limiter.on_success(consumed)
+                return None
+            except (BotoCoreError, ClientError) as e:
+                if self._is_throttle(e):
+                    self.telemetry.increment('dynamodb_throttled_requests', operation='UpdateItem')
+                if self.rate_limiter and self._is_throttle(e) and attempt < self.dynamodb_config.throttle_max_retries:
+                    self.rate_limiter.on_throttle()
+                    attempt += 1
+                    continue
+                if self._retry_transient(e, transient_attempt):
+                    transient_attempt += 1
+                    continue
+                logger.warning(f"Failed to upsert record into DynamoDB: {str(e)}")
+                return f"Failed to upsert record: {str(e)}"
+    
     def upsert_batch(self, records: List[DataRecord]) -> BatchResult:
         """Upsert batch of records into DynamoDB"""
         if not records:
             return BatchResult(total_records=0, successful_records=0, failed_records=0)
         
+        if self.use_batch_write:
+            return self._batch_write(records)
+        
         try:
-            logger.info(f"Upserting batch of {len(records)} records into DynamoDB")
+            logger.debug("Upserting batch of %s records into DynamoDB", len(records))
             
             successful_count = 0
             failed_count = 0
+            written_bytes = 0
             errors = []
+            failures = []
             
-            for record in records:
-                try:
-                    item = record.to_dict()
-                    attribute_updates = self.__get_attribute_updates(item=item)
-
-                    _ = self.table.update_item(
-                        Key=self.__generate_key_from_orgno(orgno=item.get('orgno')),
-                        AttributeUpdates=attribute_updates
-                    )
+            if self.dynamodb_config.write_concurrency > 1:
+                outcomes = self.executor.map(self._try_update_record, records)
+            else:
+                outcomes = map(self._try_update_record, records)
+            
+            for record, error in zip(records, outcomes):
+                if error is None:
                     successful_count += 1
+                    written_bytes += self.item_size(record.to_dict())
                     if successful_count % 500 == 0:
-                        logger.info(f"Successfully upserted {successful_count} records so far")
-                except (BotoCoreError, ClientError) as e:
+                        logger.debug("Successfully upserted %s records so far", successful_count)
+                else:
                     failed_count += 1
-                    errors.append(f"Failed to upsert record: {str(e)}")
-                    logger.warning(f"Failed to upsert record into DynamoDB: {str(e)}")
+                    errors.append(error)
+                    failures.append(FailedRecord.of(record, error))
         
             result = BatchResult(
                 total_records=len(records),
                 successful_records=successful_count,
                 failed_records=failed_count,
-                errors=errors
+                errors=errors,
+                failures=failures,
+                bytes_written=written_bytes,
+                metrics=self._metrics()
             )
             
-            logger.info(f"DynamoDB batch upsert completed: {successful_count} success, {failed_count} failed")
+            logger.debug("DynamoDB batch upsert completed: %s success, %s failed", successful_count, failed_count)
             return result
             
         except Exception as e:
@@ -105,11 +288,143 @@ class DynamoDBDataSink(DataSink):
                 total_records=len(records),
                 successful_records=0,
                 failed_records=len(records),
-                errors=[str(e)]
+                errors=[str(e)],
+                failures=[FailedRecord.of(record, str(e)) for record in records]
+            )
+
+    def _metrics(self) -> Dict[str, float]:
+        """Rate controller state reported with each batch"""
+        return self.rate_limiter.snapshot() if self.rate_limiter else {}
+    
+    def _item_key(self, item: dict) -> Tuple:
+        """Primary key values that identify an item (overwrite_by_pkeys, else orgno)"""
+        pkeys = self.dynamodb_config.overwrite_by_pkeys or ['orgno']
+        return tuple(item.get(pkey) for pkey in pkeys)
+    
+    def _backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff"""
+        ceiling = min(self.dynamodb_config.batch_write_max_delay,
+                      self.dynamodb_config.batch_write_base_delay * (2 ** attempt))
+        return random.uniform(0, ceiling)
+    
+    def _write_chunk(self, items: List[dict]) -> Tuple[List[Tuple], Optional[str]]:
+        """
+        Write up to BATCH_WRITE_LIMIT items, retrying UnprocessedItems with backoff.
+        Returns the keys of items that could not be written and an error message.
+        """
+        table_name = self.dynamodb_config.table_name
+        requests = [{'PutRequest': {'Item': item}} for item in items]
+        attempt = 0
+        transient_attempt = 0
+        
+        while requests:
+            params = {'ReturnConsumedCapacity': 'TOTAL'} if self.rate_limiter else {}
+            if self.rate_limiter:
+                self.rate_limiter.acquire(len(requests))
+            try:
+                with self.telemetry.span('dynamodb_request', operation='BatchWriteItem'):
+                    response = self.resource.batch_write_item(RequestItems={table_name: requests}, **params)
+            except (BotoCoreError, ClientError) as e:
+                if self._is_throttle(e):
+                    self.telemetry.increment('dynamodb_throttled_requests', operation='BatchWriteItem')
+                if self.rate_limiter and self._is_throttle(e) and attempt < self.dynamodb_config.throttle_max_retries:
+                    self.rate_limiter.on_throttle()
+                    attempt += 1
+                    continue
+                if self._retry_transient(e, transient_attempt):
+                    transient_attempt += 1
+                    continue
+                logger.warning(f"Failed to batch write {len(requests)} records into DynamoDB: {str(e)}")
+                return [self._item_key(r['PutRequest']['Item']) for r in requests], f"Failed to write {len(requests)} records: {str(e)}"
+            
+            unprocessed = response.get('UnprocessedItems', {}).get(table_name, [])
+            if unprocessed:
+                self.telemetry.increment('dynamodb_unprocessed_items', len(unprocessed))
+            if self.rate_limiter:
+                consumed = self._consumed_units(response) or float(len(requests) - len(unprocessed))
+                self.rate_limiter.settle(len(requests), consumed)
+                if unprocessed:
+                    self.rate_limiter.on_throttle()
+                else:
+                    self.rate_limiter.on_success(consumed)
+            requests = unprocessed
+            if not requests:
+                break
+            if attempt >= self.dynamodb_config.batch_write_max_retries:
+                message = f"{len(requests)} records still unprocessed after {attempt} retries"
+                logger.warning(f"DynamoDB batch write: {message}")
+                return [self._item_key(r['PutRequest']['Item']) for r in requests], message
+            
+            time.sleep(self._backoff_delay(attempt))
+            attempt += 1
+        
+        return [], None
+    
+    def _batch_write(self, records: List[DataRecord]) -> BatchResult:
+        """Overwrite whole items with BatchWriteItem in BATCH_WRITE_LIMIT-sized chunks"""
+        try:
+            logger.debug("Batch writing %s records into DynamoDB", len(records))
+            
+            failed_count = 0
+            written_bytes = 0
+            errors = []
+            failures = []
+            
+            # BatchWriteItem rejects duplicate keys in one request, so the last record per key wins
+            items: Dict[Tuple, dict] = {}
+            records_by_key: Dict[Tuple, List[DataRecord]] = {}
+            for record in records:
+                try:
+                    item = dict(record.to_dict())  # to_dict() is shared with the other sinks
+                    item['orgno'] = int(item.get('orgno'))
+                except (TypeError, ValueError) as e:
+                    failed_count += 1
+                    errors.append(f"Invalid record: {str(e)}")
+                    failures.append(FailedRecord.of(record, f"Invalid record: {str(e)}"))
+                    continue
+                key = self._item_key(item)
+                items[key] = item
+                records_by_key.setdefault(key, []).append(record)
+            
+            keys = list(items)
+            for start in range(0, len(keys), self.BATCH_WRITE_LIMIT):
+                chunk_keys = keys[start:start + self.BATCH_WRITE_LIMIT]
+                failed_keys, error = self._write_chunk([items[key] for key in chunk_keys])
+                written_bytes += sum(self.item_size(items[key]) for key in set(chunk_keys).difference(failed_keys))
+                for key in failed_keys:
+                    failed_count += len(records_by_key[key])
+                    failures.extend(FailedRecord.of(record, error) for record in records_by_key[key])
+                if error:
+                    errors.append(error)
+            
+            successful_count = len(records) - failed_count
+            logger.debug("DynamoDB batch write completed: %s success, %s failed", successful_count, failed_count)
+            return BatchResult(
+                total_records=len(records),
+                successful_records=successful_count,
+                failed_records=failed_count,
+                errors=errors,
+                failures=failures,
+                bytes_written=written_bytes,
+                metrics=self._metrics()
+            )
+        
+        except Exception as e:
+            logger.error(f"Error batch writing into DynamoDB. Traceback: {traceback.format_exc()}")
+            return BatchResult(
+                total_records=len(records),
+                successful_records=0,
+                failed_records=len(records),
+                errors=[str(e)],
+                failures=[FailedRecord.of(record, str(e)) for record in records]
             )
 
     def close(self) -> None:
         """Close DynamoDB connections"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self._executor = None
         self._resource = None
         self._table = None
+        self._client = None
         logger.info("DynamoDB connections closed")
\ No newline at end of file
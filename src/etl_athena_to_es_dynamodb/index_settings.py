@@ -0,0 +1,93 @@
+# index_settings.py
+import os
+import json
+import logging
+import threading
+from typing import Optional, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+class BulkLoadSettings:
+    """
+    Switches an index into an ingest profile and back (SRP).
+    The original settings are persisted to a marker file before the profile is applied,
+    so a run that dies mid-load leaves enough behind for the next run to restore them.
+    """
+
+    TUNED_SETTINGS = ('index.refresh_interval', 'index.number_of_replicas', 'index.translog.flush_threshold_size')
+
+    _file_lock = threading.Lock()  # Sinks of one process may share a marker file
+
+    def __init__(self, client, marker_path: str):
+        self.client = client
+        self.marker_path = marker_path
+
+    def _read_marker(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.marker_path):
+            return {}
+        with open(self.marker_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_marker(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        """Write atomically; remove the file once nothing is pending"""
+        if not entries:
+            if os.path.exists(self.marker_path):
+                os.remove(self.marker_path)
+            return
+        directory = os.path.dirname(os.path.abspath(self.marker_path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.marker_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.marker_path)
+
+    def pending_original(self, index: str) -> Optional[Dict[str, Any]]:
+        """Settings saved by a bulk load of index that was never restored"""
+        with self._file_lock:
+            return self._read_marker().get(index)
+
+    def _current_settings(self, index: str) -> Dict[str, Any]:
+        response = self.client.indices.get_settings(index=index, flat_settings=True)
+        settings = next(iter(response.values()))['settings'] if response else {}
+        # Unset values are stored as None and restored by resetting them to the cluster default
+        return {name: settings.get(name) for name in self.TUNED_SETTINGS}
+
+    def apply(self, index: str, replicas: int, translog_flush_threshold: str) -> None:
+        """Save the current settings (unless an unrestored load already saved them) and apply the ingest profile"""
+        with self._file_lock:
+            entries = self._read_marker()
+            if index in entries:
+                logger.warning(f"Index {index} still has bulk-load settings from an earlier run; keeping its saved originals")
+            else:
+                entries[index] = self._current_settings(index)
+                self._write_marker(entries)
+
+        self.client.indices.put_settings(index=index, body={
+            'index.refresh_interval': '-1',
+            'index.number_of_replicas': replicas,
+            'index.translog.flush_threshold_size': translog_flush_threshold
+        })
+        logger.info(f"Applied bulk-load settings to index {index}: refresh off, {replicas} replicas, "
+                    f"translog flush threshold {translog_flush_threshold}")
+
+    def restore(self, index: str, force_merge_segments: Optional[int] = None) -> bool:
+        """Put back the saved settings, refresh, optionally force-merge, then clear the marker entry"""
+        original = self.pending_original(index)
+        if original is None:
+            return False
+
+        self.client.indices.put_settings(index=index, body=original)
+        self.client.indices.refresh(index=index)
+        if force_merge_segments:
+            logger.info(f"Force-merging index {index} to {force_merge_segments} segments")
+            self.client.indices.forcemerge(index=index, max_num_segments=force_merge_segments,
+                                           request_timeout=3600)
+
+        with self._file_lock:
+            entries = self._read_marker()
+            entries.pop(index, None)
+            self._write_marker(entries)
+        logger.info(f"Restored original settings of index {index}: {original}")
+        return True
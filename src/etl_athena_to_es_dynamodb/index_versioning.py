@@ -0,0 +1,114 @@
+# index_versioning.py
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List
+from opensearchpy.exceptions import NotFoundError
+from etl_athena_to_es_dynamodb.exceptions import ConfigurationError, DataSinkError
+
+logger = logging.getLogger(__name__)
+
+class BlueGreenIndexManager:
+    """
+    Builds each full load into a new versioned index behind an alias (SRP).
+    A generation is created with ingest settings, promoted by one atomic alias update once
+    the load succeeded, and older generations beyond the retention count are deleted.
+    """
+
+    INGEST_SETTINGS = ('index.refresh_interval', 'index.number_of_replicas', 'index.translog.flush_threshold_size')
+
+    def __init__(self, client, alias: str, mapping_path: Optional[str], retain_generations: int,
+                 ingest_replicas: int, ingest_translog_flush_threshold: str):
+        self.client = client
+        self.alias = alias
+        self.mapping_path = mapping_path
+        self.retain_generations = retain_generations
+        self.ingest_replicas = ingest_replicas
+        self.ingest_translog_flush_threshold = ingest_translog_flush_threshold
+
+    @property
+    def generation_pattern(self) -> str:
+        return f"{self.alias}_v*"
+
+    def _index_body(self) -> Dict[str, Any]:
+        """Mapping file content: a full create-index body, or just the mappings object"""
+        if not self.mapping_path:
+            return {}
+        try:
+            with open(self.mapping_path, 'r', encoding='utf-8') as f:
+                body = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ConfigurationError(f"Cannot read index mapping file {self.mapping_path}: {str(e)}")
+        if 'mappings' in body or 'settings' in body:
+            return body
+        return {'mappings': body}
+
+    @staticmethod
+    def _flat(settings: Dict[str, Any], prefix: str = '') -> Dict[str, Any]:
+        flat = {}
+        for key, value in settings.items():
+            name = f"{prefix}{key}"
+            if isinstance(value, dict):
+                flat.update(BlueGreenIndexManager._flat(value, f"{name}."))
+            else:
+                flat[name] = value
+        return flat
+
+    def _final_settings(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Values the tuned settings take once the generation goes live; None resets to the default"""
+        settings = self._flat(body.get('settings', {}))
+        normalized = {name if name.startswith('index.') else f"index.{name}": value for name, value in settings.items()}
+        return {name: normalized.get(name) for name in self.INGEST_SETTINGS}
+
+    def create_generation(self) -> str:
+        """Create a new, empty generation with ingest-optimized settings"""
+        name = f"{self.alias}_v{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S%f')}"
+        body = self._index_body()
+        settings = self._flat(body.get('settings', {}))
+        settings.update({
+            'index.refresh_interval': '-1',
+            'index.number_of_replicas': self.ingest_replicas,
+            'index.translog.flush_threshold_size': self.ingest_translog_flush_threshold
+        })
+        self.client.indices.create(index=name, body={**body, 'settings': settings})
+        logger.info(f"Created index generation {name} for alias {self.alias}")
+        return name
+
+    def live_indices(self) -> List[str]:
+        """Indices the alias currently points at"""
+        try:
+            return sorted(self.client.indices.get_alias(name=self.alias).keys())
+        except NotFoundError:
+            return []
+
+    def check_alias(self) -> None:
+        """Fail before a load if the alias name is taken by a concrete index, which promote could not move"""
+        if self.client.indices.exists(index=self.alias) and not self.client.indices.exists_alias(name=self.alias):
+            raise DataSinkError(f"{self.alias} is a concrete index; blue/green loads need it to be an alias")
+
+    def promote(self, generation: str) -> None:
+        """Apply the generation's final settings, refresh it, and move the alias onto it in one update"""
+        self.check_alias()
+        self.client.indices.put_settings(index=generation, body=self._final_settings(self._index_body()))
+        self.client.indices.refresh(index=generation)
+
+        actions = [{'remove': {'index': index, 'alias': self.alias}} for index in self.live_indices()]
+        actions.append({'add': {'index': generation, 'alias': self.alias}})
+        self.client.indices.update_aliases(body={'actions': actions})
+        logger.info(f"Alias {self.alias} now points at {generation}")
+
+    def discard(self, generation: str) -> None:
+        """Delete a generation whose load did not succeed"""
+        self.client.indices.delete(index=generation, ignore_unavailable=True)
+        logger.info(f"Deleted unpromoted index generation {generation}")
+
+    def prune(self) -> List[str]:
+        """Delete the oldest generations not behind the alias, keeping retain_generations of them"""
+        live = set(self.live_indices())
+        generations = sorted(self.client.indices.get(index=self.generation_pattern).keys())
+        old = [index for index in generations if index not in live]
+        expired = old[:max(0, len(old) - self.retain_generations)]
+        for index in expired:
+            self.client.indices.delete(index=index)
+            logger.info(f"Pruned index generation {index}")
+        return expired
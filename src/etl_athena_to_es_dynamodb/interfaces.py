@@ -1,7 +1,8 @@
 # interfaces.py
 from abc import ABC, abstractmethod
-from typing import Iterator, List
-from etl_athena_to_es_dynamodb.models import DataRecord, BatchResult
+from contextlib import nullcontext
+from typing import Iterator, List, Dict, Optional, Any, ContextManager
+from etl_athena_to_es_dynamodb.models import DataRecord, BatchResult, RunCheckpoint
 
 class DataSource(ABC):
     """Abstract interface for data sources (ISP)"""
@@ -11,6 +12,27 @@ class DataSource(ABC):
         """Fetch data from the source"""
         pass
     
+    @property
+    def produces_batches(self) -> bool:
+        """Whether fetch_batches is the native way to read this source"""
+        return False
+    
+    def fetch_batches(self, query: str) -> Iterator[List[DataRecord]]:
+        """Fetch data as batches already built by the source"""
+        raise NotImplementedError(f"{self.__class__.__name__} does not produce batches")
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Source-specific statistics reported with the pipeline results"""
+        return {}
+    
+    def checkpoint_state(self) -> Optional[Dict[str, Any]]:
+        """State that lets a later run re-read the same result in the same order; None if not resumable"""
+        return None
+    
+    def restore_checkpoint_state(self, state: Dict[str, Any]) -> None:
+        """Re-read the result described by a checkpoint_state() instead of running the query again"""
+        raise NotImplementedError(f"{self.__class__.__name__} cannot resume from a checkpoint")
+    
     @abstractmethod
     def close(self) -> None:
         """Close connection to the source"""
@@ -24,6 +46,14 @@ class DataSink(ABC):
         """Upsert a batch of records"""
         pass
     
+    def prepare(self) -> None:
+        """Called once before the first batch"""
+        pass
+    
+    def finalize(self, succeeded: bool) -> None:
+        """Called once after the last batch, also when the run failed"""
+        pass
+    
     @abstractmethod
     def close(self) -> None:
         """Close connection to the sink"""
@@ -36,4 +66,69 @@ class BatchProcessor(ABC):
     def process_batches(self, data_iterator: Iterator[DataRecord], 
                        batch_size: int) -> Iterator[List[DataRecord]]:
         """Process data in batches"""
-        pass
\ No newline at end of file
+        pass
+    
+    def process_record_batches(self, batch_iterator: Iterator[List[DataRecord]],
+                               batch_size: int) -> Iterator[List[DataRecord]]:
+        """Process data that already arrives in batches (re-chunks by default)"""
+        return self.process_batches((record for batch in batch_iterator for record in batch), batch_size)
+    
+    @property
+    def preserves_order(self) -> bool:
+        """Whether batches keep the input order and the input record objects"""
+        return True
+    
+    def on_batch_completed(self, batch: List[DataRecord], sink_results: Dict[str, BatchResult]) -> None:
+        """Called once every sink has processed a batch"""
+        pass
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Processor-specific statistics reported with the pipeline results"""
+        return {}
+    
+    def close(self) -> None:
+        """Release processor resources"""
+        pass
+
+class CheckpointStore(ABC):
+    """Abstract interface for run checkpoint storage (ISP)"""
+    
+    @abstractmethod
+    def load(self, run_key: str) -> Optional[RunCheckpoint]:
+        """Checkpoint of the unfinished run with this key, if any"""
+        pass
+    
+    @abstractmethod
+    def save(self, checkpoint: RunCheckpoint) -> None:
+        """Persist a checkpoint, replacing the previous one for its run"""
+        pass
+    
+    @abstractmethod
+    def delete(self, run_key: str) -> None:
+        """Forget a run once it has finished"""
+        pass
+
+class TelemetryExporter(ABC):
+    """Abstract interface for publishing pipeline metrics and traces (ISP)"""
+    
+    @abstractmethod
+    def export(self, snapshot: Dict[str, Any]) -> None:
+        """Publish a snapshot of every counter and histogram"""
+        pass
+    
+    @property
+    def receives_measurements(self) -> bool:
+        """Whether record() should get each measurement as it is taken"""
+        return False
+    
+    def record(self, kind: str, name: str, value: float, labels: Dict[str, str]) -> None:
+        """One counter increment or histogram observation"""
+        pass
+    
+    def span(self, name: str, attributes: Dict[str, Any]) -> ContextManager:
+        """Context manager tracing one operation"""
+        return nullcontext()
+    
+    def close(self) -> None:
+        """Release exporter resources"""
+        pass
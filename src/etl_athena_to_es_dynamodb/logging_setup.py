@@ -0,0 +1,103 @@
+# logging_setup.py
+import sys
+import json
+import queue
+import random
+import logging
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+from etl_athena_to_es_dynamodb.models import LoggingConfig
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_payload_sample_rate = 0.0
+
+def payload_sampled(logger: logging.Logger) -> bool:
+    """
+    Whether to log the payload of the record at hand: only at DEBUG, and only for the
+    configured fraction of records. Call sites pass the payload as a logging argument so
+    it is formatted only when this returns True.
+    """
+    return _payload_sample_rate > 0 and logger.isEnabledFor(logging.DEBUG) and random.random() < _payload_sample_rate
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for CloudWatch Logs Insights and similar (SRP)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Hands records to a QueueListener thread without blocking the caller (SRP).
+    Unlike QueueHandler it leaves message formatting to the listener thread, and a full
+    queue drops the record instead of blocking the pipeline or raising.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class LoggingSession:
+    """Logging set up by configure_logging; stop() flushes what is still queued"""
+
+    def __init__(self, handler: Optional[DroppingQueueHandler] = None, listener: Optional[QueueListener] = None):
+        self.handler = handler
+        self.listener = listener
+
+    def stop(self) -> None:
+        if self.listener is None:
+            return
+        self.listener.stop()
+        if self.handler.dropped:
+            for target in self.listener.handlers:
+                target.handle(logging.makeLogRecord({
+                    'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                    'msg': f"Dropped {self.handler.dropped} log records because the log queue was full"
+                }))
+        self.listener = None
+
+def configure_logging(config: LoggingConfig) -> LoggingSession:
+    """
+    Development: plain text written by the calling thread.
+    Production: JSON lines written by a background thread behind a bounded queue.
+    Either way, records go to one destination: LOG_FILE if set, else stderr.
+    """
+    global _payload_sample_rate
+    _payload_sample_rate = config.payload_sample_rate
+
+    target = logging.FileHandler(config.file) if config.file else logging.StreamHandler(sys.stderr)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(config.level)
+
+    if config.mode == 'development':
+        target.setFormatter(logging.Formatter(TEXT_FORMAT))
+        root.addHandler(target)
+        return LoggingSession()
+
+    target.setFormatter(JsonFormatter())
+    handler = DroppingQueueHandler(queue.Queue(maxsize=config.queue_size))
+    root.addHandler(handler)
+    listener = QueueListener(handler.queue, target, respect_handler_level=True)
+    listener.start()
+    return LoggingSession(handler, listener)
@@ -1,28 +1,37 @@
 # main.py
 import os
 import logging
+import argparse
 from dotenv import load_dotenv
 from etl_athena_to_es_dynamodb.utils import get_athena_source_query
 from etl_athena_to_es_dynamodb.models import (AWSConfig, AthenaConfig, OpenSearchConfig, 
-                   DocumentConfig, DynamoDBConfig, BatchConfig)
+                   DocumentConfig, DynamoDBConfig, BatchConfig, ShardConfig,
+                   ChangeDetectionConfig, CheckpointConfig, DeadLetterConfig, TelemetryConfig,
+                   LoggingConfig)
+from etl_athena_to_es_dynamodb.logging_setup import configure_logging
 from etl_athena_to_es_dynamodb.pipeline_factory import PipelineFactory
+from etl_athena_to_es_dynamodb.pipeline import aggregate_results
 from etl_athena_to_es_dynamodb.exceptions import DataPipelineError, ConfigurationError
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('pipeline.log'),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
-def load_configuration():
+def load_logging_config() -> LoggingConfig:
+    """Logging configuration from environment variables; loaded first so configuration errors get logged"""
+    try:
+        return LoggingConfig(
+            mode=os.getenv('LOG_MODE', 'development').lower(),
+            level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+            file=os.getenv('LOG_FILE') or None,
+            queue_size=int(os.getenv('LOG_QUEUE_SIZE', '10000')),
+            payload_sample_rate=float(os.getenv('LOG_PAYLOAD_SAMPLE_RATE', '0'))
+        )
+    except Exception as e:
+        raise ConfigurationError(f"Invalid logging configuration: {str(e)}")
+
+def load_configuration(resume: bool = False):
     """Load configuration from environment variables"""
     try:
         aws_config = AWSConfig(
@@ -35,14 +44,30 @@ def load_configuration():
             database=os.getenv('ATHENA_DATABASE'),
             table=os.getenv('ATHENA_TABLE'),
             s3_output_location=os.getenv('ATHENA_S3_OUTPUT_LOCATION'),
-            work_group=os.getenv('ATHENA_WORK_GROUP', 'primary')
+            work_group=os.getenv('ATHENA_WORK_GROUP', 'primary'),
+            result_reader=os.getenv('ATHENA_RESULT_READER', 'auto'),
+            s3_read_chunk_size=int(os.getenv('ATHENA_S3_READ_CHUNK_SIZE', str(8 * 1024 * 1024))),
+            s3_read_concurrency=int(os.getenv('ATHENA_S3_READ_CONCURRENCY', '4')),
+            s3_max_inflight_ranges=int(os.getenv('ATHENA_S3_MAX_INFLIGHT_RANGES', '8')),
+            s3_preserve_order=os.getenv('ATHENA_S3_PRESERVE_ORDER', 'true').lower() == 'true',
+            unload_to_parquet=os.getenv('ATHENA_UNLOAD_TO_PARQUET', 'false').lower() == 'true',
+            unload_location=os.getenv('ATHENA_UNLOAD_LOCATION') or None,
+            query_timeout_seconds=float(os.getenv('ATHENA_QUERY_TIMEOUT_SECONDS', '1800')),
+            poll_initial_interval=float(os.getenv('ATHENA_POLL_INITIAL_INTERVAL', '0.2')),
+            poll_max_interval=float(os.getenv('ATHENA_POLL_MAX_INTERVAL', '5')),
+            result_reuse_max_age_minutes=int(os.getenv('ATHENA_RESULT_REUSE_MAX_AGE_MINUTES', '0')) or None,
+            result_cache_path=os.getenv('ATHENA_RESULT_CACHE_PATH') or None,
+            result_cache_ttl_seconds=int(os.getenv('ATHENA_RESULT_CACHE_TTL_SECONDS', str(24 * 3600))),
+            strict_records=os.getenv('ATHENA_STRICT_RECORDS', 'false').lower() == 'true'
         )
         
         document_config = None # relation type - parent/child
         if os.getenv('OPENSEARCH_DOCUMENT_TYPE', 'parent'):
             document_config = DocumentConfig(
                 document_type=os.getenv('OPENSEARCH_DOCUMENT_TYPE', 'parent'),
-                child_relation_type=os.getenv('OPENSEARCH_CHILD_RELATION_TYPE')
+                child_relation_type=os.getenv('OPENSEARCH_CHILD_RELATION_TYPE'),
+                child_id_fields=[f.strip() for f in os.getenv('OPENSEARCH_CHILD_ID_FIELDS', '').split(',') if f.strip()],
+                delete_stale_children=os.getenv('OPENSEARCH_DELETE_STALE_CHILDREN', 'false').lower() == 'true'
             )
         
         opensearch_config = None
@@ -51,6 +76,21 @@ def load_configuration():
                 endpoint=os.getenv('OPENSEARCH_ENDPOINT'),
                 index_name=os.getenv('OPENSEARCH_INDEX', 'data'),
                 region=os.getenv('AWS_REGION', 'us-east-1'),
+                bulk_max_actions=int(os.getenv('OPENSEARCH_BULK_MAX_ACTIONS', '500')),
+                bulk_max_bytes=int(os.getenv('OPENSEARCH_BULK_MAX_BYTES', str(10 * 1024 * 1024))),
+                bulk_concurrency=int(os.getenv('OPENSEARCH_BULK_CONCURRENCY', '1')),
+                bulk_max_retries=int(os.getenv('OPENSEARCH_BULK_MAX_RETRIES', '5')),
+                adaptive_bulk=os.getenv('OPENSEARCH_ADAPTIVE_BULK', 'false').lower() == 'true',
+                bulk_min_actions=int(os.getenv('OPENSEARCH_BULK_MIN_ACTIONS', '50')),
+                bulk_target_latency_seconds=float(os.getenv('OPENSEARCH_BULK_TARGET_LATENCY_SECONDS', '5.0')),
+                bulk_load_mode=os.getenv('OPENSEARCH_BULK_LOAD_MODE', 'false').lower() == 'true',
+                bulk_load_replicas=int(os.getenv('OPENSEARCH_BULK_LOAD_REPLICAS', '0')),
+                bulk_load_translog_flush_threshold=os.getenv('OPENSEARCH_BULK_LOAD_TRANSLOG_FLUSH_THRESHOLD', '1gb'),
+                bulk_load_force_merge_segments=int(os.getenv('OPENSEARCH_BULK_LOAD_FORCE_MERGE_SEGMENTS') or '0') or None,
+                bulk_load_marker_path=os.getenv('OPENSEARCH_BULK_LOAD_MARKER_PATH', '.cache/opensearch_bulk_load.json'),
+                blue_green_load=os.getenv('OPENSEARCH_BLUE_GREEN_LOAD', 'false').lower() == 'true',
+                index_mapping_path=os.getenv('OPENSEARCH_INDEX_MAPPING_PATH') or None,
+                index_retain_generations=int(os.getenv('OPENSEARCH_INDEX_RETAIN_GENERATIONS', '1')),
                 # username=os.getenv('OPENSEARCH_USERNAME'),
                 # password=os.getenv('OPENSEARCH_PASSWORD')
             )
@@ -59,58 +99,163 @@ def load_configuration():
         if os.getenv('DYNAMODB_TABLE_NAME'):
             dynamodb_config = DynamoDBConfig(
                 table_name=os.getenv('DYNAMODB_TABLE_NAME'),
-                overwrite_by_pkeys=os.getenv('DYNAMODB_OVERWRITE_BY_PKEYS', '').split(',') # convert to list
+                overwrite_by_pkeys=[k for k in os.getenv('DYNAMODB_OVERWRITE_BY_PKEYS', '').split(',') if k], # convert to list
+                write_mode=os.getenv('DYNAMODB_WRITE_MODE', 'auto'),
+                write_concurrency=int(os.getenv('DYNAMODB_WRITE_CONCURRENCY', '1')),
+                adaptive_throttling=os.getenv('DYNAMODB_ADAPTIVE_THROTTLING', 'false').lower() == 'true',
+                initial_write_rate=float(os.getenv('DYNAMODB_INITIAL_WRITE_RATE', '100'))
             )
         
         batch_config = BatchConfig(
             batch_size=int(os.getenv('BATCH_SIZE', '1000')),
-            max_workers=int(os.getenv('MAX_WORKERS', '4'))
+            max_workers=int(os.getenv('MAX_WORKERS', '4')),
+            queue_depth=int(os.getenv('PIPELINE_QUEUE_DEPTH', '4')),
+            async_batches_in_flight=int(os.getenv('ASYNC_BATCHES_IN_FLIGHT', '8')),
+            transform_workers=int(os.getenv('TRANSFORM_WORKERS', '0')),
+            transform_ordered=os.getenv('TRANSFORM_ORDERED', 'true').lower() == 'true'
         )
         
-        return aws_config, athena_config, document_config, opensearch_config, dynamodb_config, batch_config
+        shard_config = None
+        if os.getenv('SHARD_STRATEGY'):
+            shard_config = ShardConfig(
+                strategy=os.getenv('SHARD_STRATEGY'),
+                shard_count=int(os.getenv('SHARD_COUNT', '4')),
+                shard_key=os.getenv('SHARD_KEY', 'Orgnr'),
+                shard_values=[v for v in os.getenv('SHARD_VALUES', '').split(',') if v], # convert to list
+                max_concurrent_queries=int(os.getenv('SHARD_MAX_CONCURRENT_QUERIES', '4'))
+            )
+        
+        change_detection_config = None
+        if os.getenv('CHANGE_DETECTION_DB_PATH'):
+            change_detection_config = ChangeDetectionConfig(
+                digest_store_path=os.getenv('CHANGE_DETECTION_DB_PATH')
+            )
+        
+        checkpoint_config = None
+        if os.getenv('CHECKPOINT_PATH'):
+            checkpoint_config = CheckpointConfig(path=os.getenv('CHECKPOINT_PATH'), resume=resume)
+        elif resume:
+            raise ConfigurationError("--resume needs CHECKPOINT_PATH")
+        
+        dead_letter_config = None
+        if os.getenv('DEAD_LETTER_DIR'):
+            dead_letter_config = DeadLetterConfig(directory=os.getenv('DEAD_LETTER_DIR'))
+        
+        telemetry_config = None
+        if os.getenv('METRICS_EXPORTERS'):
+            telemetry_config = TelemetryConfig(
+                exporters=[e.strip() for e in os.getenv('METRICS_EXPORTERS').split(',') if e.strip()], # convert to list
+                prometheus_path=os.getenv('METRICS_PROMETHEUS_PATH', '.cache/metrics/etl.prom'),
+                emf_namespace=os.getenv('METRICS_EMF_NAMESPACE', 'EtlAthenaToEsDynamoDB'),
+                service_name=os.getenv('OTEL_SERVICE_NAME', 'etl-athena-to-es-dynamodb')
+            )
+        
+        return (aws_config, athena_config, document_config, opensearch_config, dynamodb_config,
+                batch_config, shard_config, change_detection_config, checkpoint_config, dead_letter_config,
+                telemetry_config)
         
     except Exception as e:
         raise ConfigurationError(f"Failed to load configuration: {str(e)}")
 
+def log_results(results):
+    """Log the run summary"""
+    logger.info("=== Pipeline Execution Results ===")
+    logger.info(f"Total processed # batches: {results['total_processed_batches']}")
+    if 'elapsed_seconds' in results:
+        logger.info(f"Elapsed: {results['elapsed_seconds']}s")
+    if 'source' in results:
+        logger.info(f"Source statistics: {results['source']}")
+    if 'batch_processor' in results:
+        logger.info(f"Batch processor statistics: {results['batch_processor']}")
+    
+    for sink_name, sink_results in results['sinks'].items():
+        logger.info(f"\n{sink_name} Results:")
+        logger.info(f"  Total records: {sink_results['total_records']}")
+        logger.info(f"  Successful: {sink_results['successful_records']}")
+        logger.info(f"  Failed: {sink_results['failed_records']}")
+        logger.info(f"  Success rate: {sink_results['success_rate']}%")
+        logger.info(f"  Errors: {sink_results['error_count']}")
+        if 'records_per_second' in sink_results:
+            logger.info(f"  Throughput: {sink_results['records_per_second']} records/s, "
+                        f"{sink_results['mb_per_second']} MB/s")
+        if 'dead_lettered_records' in sink_results:
+            logger.info(f"  Dead-lettered: {sink_results['dead_lettered_records']}")
+        if 'metrics' in sink_results:
+            logger.info(f"  Metrics: {sink_results['metrics']}")
+
+def replay_dead_letters(aws_config, document_config, opensearch_config, dynamodb_config,
+                        batch_config, dead_letter_config):
+    """Re-drive spooled failed records through their sinks instead of running the query"""
+    if dead_letter_config is None:
+        raise ConfigurationError("--replay-dead-letters needs DEAD_LETTER_DIR")
+    replayer = PipelineFactory.create_dead_letter_replayer(
+        aws_config=aws_config,
+        document_config=document_config,
+        dead_letter_config=dead_letter_config,
+        opensearch_config=opensearch_config,
+        dynamodb_config=dynamodb_config,
+        batch_config=batch_config
+    )
+    try:
+        sink_results = replayer.replay()
+        log_results(aggregate_results(sink_results, sum(len(r) for r in sink_results.values()), {}, {},
+                                      replayer.spool.statistics()))
+    finally:
+        replayer.close()
+    logger.info("Dead-letter replay completed")
+
 def main():
     """Main function to execute the data pipeline"""
+    parser = argparse.ArgumentParser(description="Load Athena query results into OpenSearch and DynamoDB")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue the unfinished run of the same query from its checkpoint")
+    parser.add_argument('--replay-dead-letters', action='store_true',
+                        help="Re-drive the records spooled under DEAD_LETTER_DIR instead of running the query")
+    args = parser.parse_args()
+    logging_session = configure_logging(load_logging_config())
+    
     try:
         logger.info("Starting AWS Data Pipeline")
         
         # Load configuration
-        aws_config, athena_config, document_config, opensearch_config, dynamodb_config, batch_config = load_configuration()
+        (aws_config, athena_config, document_config, opensearch_config, dynamodb_config,
+         batch_config, shard_config, change_detection_config, checkpoint_config,
+         dead_letter_config, telemetry_config) = load_configuration(args.resume)
+        
+        if args.replay_dead_letters:
+            replay_dead_letters(aws_config, document_config, opensearch_config, dynamodb_config,
+                                batch_config, dead_letter_config)
+            return
         
         # Create pipeline
-        pipeline = PipelineFactory.create_pipeline(
+        use_async = os.getenv('PIPELINE_ENGINE', 'sync').lower() == 'async'
+        create_pipeline = PipelineFactory.create_async_pipeline if use_async else PipelineFactory.create_pipeline
+        pipeline = create_pipeline(
             aws_config=aws_config,
             athena_config=athena_config,
             document_config=document_config,
             opensearch_config=opensearch_config,
             # dynamodb_config=dynamodb_config,
-            batch_config=batch_config
+            batch_config=batch_config,
+            shard_config=shard_config,
+            change_detection_config=change_detection_config,
+            checkpoint_config=checkpoint_config,
+            dead_letter_config=dead_letter_config,
+            telemetry_config=telemetry_config
         )
         
         # Define query
-        query = get_athena_source_query()
+        query = get_athena_source_query(native_types=athena_config.unload_to_parquet)
         if os.getenv('QUERY_LIMIT', None):
             query += f" LIMIT {os.getenv('QUERY_LIMIT', '1000')}"
         
         logger.info(f"Executing query: {query}")
         
         # Execute pipeline
-        results = pipeline.execute(query)
+        results = pipeline.run(query) if use_async else pipeline.execute(query)
         
         # Log results
-        logger.info("=== Pipeline Execution Results ===")
-        logger.info(f"Total processed # batches: {results['total_processed_batches']}")
-        
-        for sink_name, sink_results in results['sinks'].items():
-            logger.info(f"\n{sink_name} Results:")
-            logger.info(f"  Total records: {sink_results['total_records']}")
-            logger.info(f"  Successful: {sink_results['successful_records']}")
-            logger.info(f"  Failed: {sink_results['failed_records']}")
-            logger.info(f"  Success rate: {sink_results['success_rate']}%")
-            logger.info(f"  Errors: {sink_results['error_count']}")
+        log_results(results)
         
         logger.info("Pipeline execution completed successfully")
         
@@ -120,6 +265,8 @@ def main():
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
         raise DataPipelineError(f"Unexpected pipeline failure: {str(e)}")
+    finally:
+        logging_session.stop()
 
 if __name__ == "__main__":
     main()
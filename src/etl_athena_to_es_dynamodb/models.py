@@ -2,8 +2,8 @@
 import ast
 import os
 import json
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, Dict, Any, List
+from pydantic import BaseModel, Field, ConfigDict, PrivateAttr
+from typing import Optional, Dict, Any, List, Literal
 from datetime import datetime
 
 class AWSConfig(BaseModel):
@@ -22,6 +22,33 @@ class AthenaConfig(BaseModel):
     table: str = Field(..., description="Athena table name")
     s3_output_location: str = Field(..., description="S3 location for query results")
     work_group: str = Field(default="primary", description="Athena work group")
+    result_reader: Literal['auto', 's3', 'api'] = Field(default='auto', description="How results are read: 's3' streams the result CSV, 'api' pages GetQueryResults, 'auto' prefers S3 and falls back to the API")
+    s3_read_chunk_size: int = Field(default=8 * 1024 * 1024, ge=64 * 1024, description="Byte range size of each S3 GET when streaming results")
+    s3_read_concurrency: int = Field(default=4, ge=1, le=64, description="Number of ranges downloaded in parallel; 1 reads sequentially")
+    s3_max_inflight_ranges: int = Field(default=8, ge=1, description="Upper bound on ranges downloaded but not yet parsed (bounds memory)")
+    s3_preserve_order: bool = Field(default=True, description="Yield rows in result order; disable when sinks don't depend on ordering")
+    unload_to_parquet: bool = Field(default=False, description="Wrap the query in UNLOAD ... WITH (format='PARQUET') and read results as row-group batches")
+    unload_location: Optional[str] = Field(None, description="S3 prefix for UNLOAD output; defaults to a fresh prefix under s3_output_location")
+    query_timeout_seconds: float = Field(default=1800, gt=0, description="Give up waiting for a query after this many seconds")
+    poll_initial_interval: float = Field(default=0.2, gt=0, description="First delay between GetQueryExecution polls, in seconds")
+    poll_max_interval: float = Field(default=5.0, gt=0, description="Cap on the delay between polls, in seconds")
+    poll_backoff_multiplier: float = Field(default=1.5, ge=1, description="Factor applied to the poll delay after each poll")
+    result_reuse_max_age_minutes: Optional[int] = Field(None, ge=1, le=10080, description="Let Athena reuse results of an identical query up to this age; None disables")
+    result_cache_path: Optional[str] = Field(None, description="Local JSON file mapping query fingerprints to finished executions; None disables")
+    result_cache_ttl_seconds: int = Field(default=24 * 3600, ge=1, description="How long a cached execution may be reused")
+    result_cache_max_entries: int = Field(default=256, ge=1, description="Least recently used entries beyond this are evicted")
+    strict_records: bool = Field(default=False, description="Validate each row into a pydantic DataRecord instead of a lightweight Record")
+
+class ShardConfig(BaseModel):
+    """Sharded (fan-out) Athena extraction configuration model"""
+    model_config = ConfigDict(frozen=True)
+    
+    strategy: Literal['mod', 'values'] = Field(default='mod', description="'mod' splits by mod(shard_key, shard_count); 'values' gives each entry of shard_values its own shard")
+    shard_count: int = Field(default=4, ge=1, le=64, description="Number of shards for the 'mod' strategy")
+    shard_key: str = Field(default="Orgnr", description="Column the shard predicate filters on, as named where the shard filter placeholder sits")
+    shard_values: List[str] = Field(default_factory=list, description="Values or inclusive 'low..high' ranges for the 'values' strategy")
+    max_concurrent_queries: int = Field(default=4, ge=1, le=25, description="Shard queries running in Athena at the same time")
+    queue_size: int = Field(default=8, ge=1, description="Merged batches buffered between shard readers and the pipeline")
 
 class DocumentConfig(BaseModel):
     """Document configuration model: parent or child"""
@@ -29,6 +56,8 @@ class DocumentConfig(BaseModel):
     
     document_type: str = Field(..., description="OpenSearch docuemnt type: parent or child")
     child_relation_type: str = Field(..., description="Child relation type if document_type is child")
+    child_id_fields: List[str] = Field(default_factory=list, description="Child fields that identify a child within its parent; empty hashes the whole child document")
+    delete_stale_children: bool = Field(default=False, description="Delete children of each written parent that were not part of this write")
 
 class OpenSearchConfig(BaseModel):
     """OpenSearch configuration model"""
@@ -38,6 +67,24 @@ class OpenSearchConfig(BaseModel):
     index_name: str = Field(..., description="OpenSearch index name")
     region: Optional[str] = Field(None, description="AWS region for OpenSearch")
     port: Optional[int] = Field(443, ge=1, le=65535, description="OpenSearch port number")
+    bulk_max_actions: int = Field(default=500, ge=1, description="Maximum actions per _bulk request")
+    bulk_max_bytes: int = Field(default=10 * 1024 * 1024, ge=1024, description="Maximum serialized size of a _bulk request body in bytes")
+    bulk_request_timeout: int = Field(default=120, ge=1, description="Timeout of one _bulk request in seconds")
+    bulk_concurrency: int = Field(default=1, ge=1, le=64, description="Maximum _bulk requests in flight at once")
+    bulk_max_retries: int = Field(default=5, ge=0, description="Resends of actions rejected by a full write queue before they count as failed")
+    bulk_retry_base_delay: float = Field(default=0.5, gt=0, description="Base delay in seconds for jittered exponential backoff of rejected actions")
+    bulk_retry_max_delay: float = Field(default=30.0, gt=0, description="Cap in seconds on a single backoff delay")
+    adaptive_bulk: bool = Field(default=False, description="Shrink and grow bulk size and concurrency from observed rejections and latency")
+    bulk_min_actions: int = Field(default=50, ge=1, description="Smallest bulk size the adaptive controller shrinks to")
+    bulk_target_latency_seconds: float = Field(default=5.0, gt=0, description="Bulk requests slower than this shrink the adaptive bulk size")
+    bulk_load_mode: bool = Field(default=False, description="Switch the index to an ingest profile for the run and restore it afterwards")
+    bulk_load_replicas: int = Field(default=0, ge=0, description="Replica count while bulk loading")
+    bulk_load_translog_flush_threshold: str = Field(default='1gb', description="Translog flush threshold size while bulk loading")
+    bulk_load_force_merge_segments: Optional[int] = Field(None, ge=1, description="Force-merge to this many segments after a bulk load; None skips it")
+    bulk_load_marker_path: str = Field(default='.cache/opensearch_bulk_load.json', description="File holding original settings of indices not yet restored")
+    blue_green_load: bool = Field(default=False, description="Write a full load into a new versioned index and move the index_name alias onto it on success")
+    index_mapping_path: Optional[str] = Field(None, description="JSON file with the create-index body or mappings for new index generations")
+    index_retain_generations: int = Field(default=1, ge=0, description="Previous index generations kept after an alias swap")
     # username: Optional[str] = Field(None, description="OpenSearch username")
     # password: Optional[str] = Field(None, description="OpenSearch password")
 
@@ -47,26 +94,90 @@ class DynamoDBConfig(BaseModel):
     
     table_name: str = Field(..., description="DynamoDB table name")
     overwrite_by_pkeys: List[str] = Field(default_factory=list, description="List of primary keys to overwrite existing records")
+    write_mode: Literal['auto', 'update', 'batch_write'] = Field(default='auto', description="'update' merges attributes with UpdateItem, 'batch_write' overwrites whole items with BatchWriteItem, 'auto' picks batch_write when overwrite_by_pkeys is set")
+    batch_write_max_retries: int = Field(default=8, ge=0, description="Retries of UnprocessedItems before the records count as failed")
+    batch_write_base_delay: float = Field(default=0.05, gt=0, description="Base delay in seconds for jittered exponential backoff")
+    batch_write_max_delay: float = Field(default=5.0, gt=0, description="Cap in seconds on a single backoff delay")
+    write_concurrency: int = Field(default=1, ge=1, le=64, description="Concurrent UpdateItem calls per batch, independent of BatchConfig.max_workers")
+    adaptive_throttling: bool = Field(default=False, description="Pace writes with an AIMD token bucket driven by consumed capacity and throttling errors")
+    initial_write_rate: float = Field(default=100.0, gt=0, description="Starting write rate in capacity units per second")
+    min_write_rate: float = Field(default=1.0, gt=0, description="Lowest write rate the controller backs off to")
+    max_write_rate: float = Field(default=40000.0, gt=0, description="Highest write rate the controller ramps up to")
+    throttle_max_retries: int = Field(default=10, ge=0, description="Retries of a throttled request before its records count as failed")
+
+class ChangeDetectionConfig(BaseModel):
+    """Change detection (skip unchanged records) configuration model"""
+    model_config = ConfigDict(frozen=True)
+    
+    digest_store_path: str = Field(..., description="SQLite file holding the last written digest per record key")
+    key_field: str = Field(default="orgno", description="Record field that identifies a record across runs")
+
+class CheckpointConfig(BaseModel):
+    """Checkpointing (resumable runs) configuration model"""
+    model_config = ConfigDict(frozen=True)
+    
+    path: str = Field(..., description="Local JSON file holding the checkpoint of each unfinished run")
+    resume: bool = Field(default=False, description="Continue the unfinished run of the same query instead of starting over")
+
+class RunCheckpoint(BaseModel):
+    """Progress of an unfinished run: the source result it reads and how far each sink has written into it"""
+    run_key: str = Field(..., description="Fingerprint of the query the run executes")
+    source_state: Dict[str, Any] = Field(default_factory=dict, description="Source state for re-reading the same result, e.g. the Athena QueryExecutionId")
+    sink_offsets: Dict[str, int] = Field(default_factory=dict, description="Per sink, the number of leading source records it has written")
+    sink_batches: Dict[str, int] = Field(default_factory=dict, description="Per sink, the number of batches it has acknowledged across attempts")
+    updated_at: float = Field(default=0.0, description="Unix time of the last save")
+
+class DeadLetterConfig(BaseModel):
+    """Dead-letter spool configuration model"""
+    model_config = ConfigDict(frozen=True)
+    
+    directory: str = Field(..., description="Directory holding one subdirectory of gzip NDJSON segments per sink")
+    segment_max_bytes: int = Field(default=64 * 1024 * 1024, ge=1024, description="Start a new segment once the current one holds this many compressed bytes")
+
+class TelemetryConfig(BaseModel):
+    """Metrics and tracing export configuration model"""
+    model_config = ConfigDict(frozen=True)
+    
+    exporters: List[Literal['prometheus', 'emf', 'otel']] = Field(..., min_length=1, description="Where to publish metrics: Prometheus text file, CloudWatch EMF on stdout, OpenTelemetry")
+    prometheus_path: str = Field(default=".cache/metrics/etl.prom", description="File for the Prometheus textfile collector")
+    emf_namespace: str = Field(default="EtlAthenaToEsDynamoDB", description="CloudWatch namespace of the EMF metrics")
+    service_name: str = Field(default="etl-athena-to-es-dynamodb", description="OpenTelemetry tracer and meter name")
+
+class LoggingConfig(BaseModel):
+    """Logging configuration model"""
+    model_config = ConfigDict(frozen=True)
+    
+    mode: Literal['development', 'production'] = Field(default='development', description="development: plain text from the logging thread; production: JSON lines from a background thread")
+    level: Literal['DEBUG', 'INFO', 'WARNING', 'ERROR'] = Field(default='INFO', description="Root log level")
+    file: Optional[str] = Field(None, description="Log file; stderr when unset")
+    queue_size: int = Field(default=10000, ge=1, description="Records buffered for the production writer thread before new ones are dropped")
+    payload_sample_rate: float = Field(default=0.0, ge=0.0, le=1.0, description="Fraction of records whose payload is logged at DEBUG; 0 never logs payloads")
 
 class BatchConfig(BaseModel):
     """Batch processing configuration model"""
     model_config = ConfigDict(frozen=True)
     
     batch_size: int = Field(default=1000, ge=1, le=10000, description="Batch size for processing")
-    max_workers: int = Field(default=4, ge=1, le=10, description="Maximum worker threads")
+    max_workers: int = Field(default=4, ge=1, le=10, description="Maximum sink worker threads, shared evenly between the sinks")
+    queue_depth: int = Field(default=4, ge=1, le=100, description="Batches buffered between pipeline stages and per sink")
+    async_batches_in_flight: int = Field(default=8, ge=1, le=256, description="Batches each sink writes concurrently in the async engine")
+    transform_workers: int = Field(default=0, ge=0, le=64, description="Worker processes converting records before the sinks; 0 converts in the sinks")
+    transform_ordered: bool = Field(default=True, description="Emit transformed batches in source order rather than as they finish")
 
 class DataRecord(BaseModel):
-    """Generic data record model"""
+    """Generic data record model, validated on creation (strict mode)"""
     model_config = ConfigDict(extra='allow')
     
     data: Dict[str, Any] = Field(..., description="Record data")
+    _parsed: Optional[Dict[str, Any]] = PrivateAttr(default=None)
     
     @classmethod
     def from_dict(cls, record_dict: Dict[str, Any]) -> 'DataRecord':
         """Create DataRecord from dictionary"""
         return cls(data=record_dict)
 
-    def convert_object_to_dict(self, obj: dict) -> Dict[str, Any]:
+    @staticmethod
+    def convert_object_to_dict(obj: dict) -> Dict[str, Any]:
         """
         Convert an object to Python dictionary with proper type casting.
         Fields with string values that look like arrays '[{...}]' are converted to actual arrays.
@@ -97,8 +208,77 @@ class DataRecord(BaseModel):
         return result
     
     def to_dict(self) -> Dict[str, Any]:
-        """Convert to dictionary"""
-        return self.convert_object_to_dict(self.data)
+        """Convert to dictionary, parsing on first use; the result is shared, so treat it as read-only"""
+        if self._parsed is None:
+            self._parsed = self.convert_object_to_dict(self.data)
+        return self._parsed
+    
+    def cache_parsed(self, parsed: Dict[str, Any]) -> None:
+        """Seed the parsed form, e.g. with a row already converted in a worker process"""
+        self._parsed = parsed
+    
+    def __eq__(self, other) -> bool:
+        """Equal by content; the parsed cache doesn't count"""
+        if isinstance(other, Record):
+            return not self.model_extra and self.data == other.data
+        if isinstance(other, DataRecord):
+            return self.data == other.data and self.model_extra == other.model_extra
+        return NotImplemented
+
+class Record:
+    """
+    Lightweight hot-path record with the DataRecord interface but no validation.
+    The parsed form is cached, so each row is decoded once however many sinks read it.
+    """
+    __slots__ = ('data', '_parsed')
+    
+    def __init__(self, data: Dict[str, Any], parsed: Optional[Dict[str, Any]] = None):
+        self.data = data
+        self._parsed = parsed
+    
+    @classmethod
+    def from_dict(cls, record_dict: Dict[str, Any]) -> 'Record':
+        """Create Record from dictionary"""
+        return cls(record_dict)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary, parsing on first use; the result is shared, so treat it as read-only"""
+        if self._parsed is None:
+            self._parsed = DataRecord.convert_object_to_dict(self.data)
+        return self._parsed
+    
+    def cache_parsed(self, parsed: Dict[str, Any]) -> None:
+        """Seed the parsed form, e.g. with a row already converted in a worker process"""
+        self._parsed = parsed
+    
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Record):
+            return self.data == other.data
+        if isinstance(other, DataRecord):
+            return other == self
+        return NotImplemented
+    
+    def __repr__(self) -> str:
+        return f"Record(data={self.data!r})"
+
+class ShardProgress(BaseModel):
+    """Progress of one shard of a sharded extraction"""
+    shard_index: int = Field(..., description="Shard number")
+    predicate: str = Field(..., description="SQL predicate selecting this shard")
+    state: str = Field(default="pending", description="pending, running, completed or failed")
+    records: int = Field(default=0, description="Records read from this shard so far")
+    query_execution_id: Optional[str] = Field(None, description="Athena query execution of this shard once started")
+    error: Optional[str] = Field(None, description="Error message if the shard failed")
+
+class FailedRecord(BaseModel):
+    """A record a sink could not write, with the reason"""
+    data: Dict[str, Any] = Field(..., description="The record's source row")
+    error: str = Field(..., description="Why the sink failed to write it")
+    
+    @classmethod
+    def of(cls, record: DataRecord, error: str) -> 'FailedRecord':
+        """From a DataRecord or Record; the row came from our own source, so skip validation"""
+        return cls.model_construct(data=record.data, error=error)
 
 class BatchResult(BaseModel):
     """Batch processing result model"""
@@ -106,6 +286,9 @@ class BatchResult(BaseModel):
     successful_records: int = Field(..., description="Number of successfully processed records")
     failed_records: int = Field(..., description="Number of failed records")
     errors: List[str] = Field(default_factory=list, description="List of error messages")
+    failures: List[FailedRecord] = Field(default_factory=list, description="The failed records themselves, for the dead-letter spool")
+    bytes_written: int = Field(default=0, description="Payload bytes the sink sent for the batch")
+    metrics: Dict[str, Any] = Field(default_factory=dict, description="Sink-specific metrics snapshot, cumulative over the run")
     
     @property
     def success_rate(self) -> float:
@@ -0,0 +1,92 @@
+# opensearch_actions.py
+import json
+import hashlib
+import logging
+from typing import Iterable, Iterator, List, Dict
+import etl_athena_to_es_dynamodb.utils as utils
+from etl_athena_to_es_dynamodb.models import DataRecord, DocumentConfig, FailedRecord
+from etl_athena_to_es_dynamodb.logging_setup import payload_sampled
+
+logger = logging.getLogger(__name__)
+
+class OpenSearchActionBuilder:
+    """Turns records into bulk update actions for parent or child documents (SRP)"""
+
+    def __init__(self, document_config: DocumentConfig):
+        self.document_config = document_config
+
+    def child_id(self, orgno: str, child_doc: dict) -> str:
+        """Stable id of a child: parent orgno plus a hash of its child_id_fields, or of the whole child"""
+        id_fields = self.document_config.child_id_fields
+        identity = {field: child_doc.get(field) for field in id_fields} if id_fields else child_doc
+        canonical = json.dumps(identity, sort_keys=True, separators=(',', ':'), default=str)
+        return f"{orgno}:{hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()}"
+
+    def failed_records(self, records: List[DataRecord], failed_items: List[dict]) -> List[FailedRecord]:
+        """Records with a failed action, with its error; a failed child fails its whole parent record"""
+        is_child = self.document_config.document_type.lower().strip() == "child"
+        errors: Dict[str, str] = {}
+        for item in failed_items:
+            info = next(iter(item.values()))
+            doc_id = str(info.get('_id', ''))
+            orgno = doc_id.rsplit(':', 1)[0] if is_child else doc_id
+            errors.setdefault(orgno, str(info.get('error', item)))
+        failures = []
+        for record in records:
+            orgno = str(record.to_dict().get('orgno'))
+            if orgno in errors:
+                failures.append(FailedRecord.of(record, errors[orgno]))
+        return failures
+
+    def iter_actions(self, records: Iterable[DataRecord], index: str,
+                     written_children: Dict[str, List[str]], upsert_parents: bool = False) -> Iterator[dict]:
+        """
+        Yield one bulk action per parent record or per child document; child ids are collected per parent.
+        Parent updates only touch existing documents unless upsert_parents is set, as for a new, empty index.
+        """
+        document_type = self.document_config.document_type.lower().strip() # parent or child
+        child_relation_type = self.document_config.child_relation_type
+        for record in records:
+            item = record.to_dict()
+            if payload_sampled(logger):
+                logger.debug("Record to insert: %s", item)
+            
+            if document_type == "parent":
+                doc_ = {
+                    "indexed_at": utils.get_utc_time()
+                }
+                action = {
+                    "_op_type": "update",
+                    '_index': index,
+                    "_id": item['orgno'],
+                    "_routing": item['orgno'],
+                    "doc": doc_ | {k: v for k, v in item.items() if k != 'orgno' or v}
+                }
+                if upsert_parents:
+                    action["doc_as_upsert"] = True
+                yield action
+            
+            if document_type == "child":
+                doc_rel = {
+                    "relation_type": {
+                        "name": child_relation_type,
+                        "parent": item['orgno']
+                    },
+                    "indexed_at": utils.get_utc_time()
+                }
+                child_data_list = item['child_data']
+                child_ids = written_children.setdefault(item['orgno'], [])
+                for child_doc in child_data_list:
+                    child_id = self.child_id(item['orgno'], child_doc)
+                    child_ids.append(child_id)
+                    action = {
+                        "_op_type": "update",
+                        '_index': index,
+                        "_id": child_id, # Re-runs update the same document
+                        "_routing": item['orgno'],
+                        "doc": doc_rel | {k: v for k, v in child_doc.items() if v}, # Merge dictionaries
+                        "doc_as_upsert": True  # Create if doesn't exist
+                    }
+                    if payload_sampled(logger):
+                        logger.debug("Child document to insert: %s", action)
+                    yield action
@@ -1,28 +1,55 @@
 # opensearch_sink.py
-import uuid
+import time
 import boto3
+import random
 import logging
+import threading
 import traceback
-from typing import List
+from typing import Iterable, Iterator, List, Tuple, Dict, Optional, Any
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
 from pydantic import ValidationError
-from opensearchpy.helpers import bulk
 from requests_aws4auth import AWS4Auth
-import etl_athena_to_es_dynamodb.utils as utils
 from opensearchpy import OpenSearch, RequestsHttpConnection
 from etl_athena_to_es_dynamodb.interfaces import DataSink
+from etl_athena_to_es_dynamodb.bulk_backpressure import BulkBackpressureController
+from etl_athena_to_es_dynamodb.index_settings import BulkLoadSettings
+from etl_athena_to_es_dynamodb.opensearch_actions import OpenSearchActionBuilder
+from etl_athena_to_es_dynamodb.index_versioning import BlueGreenIndexManager
+from etl_athena_to_es_dynamodb.bulk_chunker import BulkChunk, BulkChunker, BulkStats, send_chunk
+from etl_athena_to_es_dynamodb.telemetry import Telemetry
 from etl_athena_to_es_dynamodb.exceptions import DataSinkError, ConfigurationError
-from etl_athena_to_es_dynamodb.models import DataRecord, BatchResult, OpenSearchConfig, DocumentConfig
+from etl_athena_to_es_dynamodb.models import DataRecord, BatchResult, FailedRecord, OpenSearchConfig, DocumentConfig
 
 logger = logging.getLogger(__name__)
 
+# Well under the default indices.query.bool.max_clause_count of 1024 parent_id clauses
+STALE_CHILDREN_PARENTS_PER_QUERY = 500
+
 class OpenSearchDataSink(DataSink):
     """OpenSearch data sink implementation (SRP)"""
     
-    def __init__(self, config: OpenSearchConfig, document_config: DocumentConfig):
+    def __init__(self, config: OpenSearchConfig, document_config: DocumentConfig,
+                 telemetry: Optional[Telemetry] = None):
         try:
             self.config = config
             self.document_config = document_config
+            self.telemetry = telemetry or Telemetry()
             self._client = None
+            self._executor = None
+            self._init_lock = threading.Lock()
+            self.bulk_stats = BulkStats()
+            self._bulk_load_applied = False
+            self._generation = None  # Index a blue/green load writes into
+            self._failed_records = 0
+            self.action_builder = OpenSearchActionBuilder(document_config)
+            self.controller = None
+            if config.adaptive_bulk:
+                self.controller = BulkBackpressureController(
+                    max_actions=config.bulk_max_actions,
+                    min_actions=config.bulk_min_actions,
+                    max_concurrency=config.bulk_concurrency,
+                    target_latency=config.bulk_target_latency_seconds
+                )
             logger.info("OpenSearchDataSink initialized successfully")
         except ValidationError as e:
             raise ConfigurationError(f"Invalid OpenSearch configuration: {str(e)}")
@@ -52,98 +79,281 @@ class OpenSearchDataSink(DataSink):
                 use_ssl=True,
                 verify_certs=True,
                 connection_class=RequestsHttpConnection,
+                pool_maxsize=max(10, self.config.bulk_concurrency),
                 timeout=30
             )
             logger.debug("OpenSearch client initialized")
         return self._client
     
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Lazy initialization of the bulk request pool"""
+        if self._executor is None:
+            with self._init_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.config.bulk_concurrency,
+                        thread_name_prefix='opensearch-bulk'
+                    )
+        return self._executor
+    
+    @property
+    def bulk_load_settings(self) -> BulkLoadSettings:
+        return BulkLoadSettings(self.client, self.config.bulk_load_marker_path)
+    
+    @property
+    def index_manager(self) -> BlueGreenIndexManager:
+        return BlueGreenIndexManager(
+            self.client,
+            alias=self.config.index_name,
+            mapping_path=self.config.index_mapping_path,
+            retain_generations=self.config.index_retain_generations,
+            ingest_replicas=self.config.bulk_load_replicas,
+            ingest_translog_flush_threshold=self.config.bulk_load_translog_flush_threshold
+        )
+    
+    @property
+    def target_index(self) -> str:
+        """Index the actions are written to: the new generation during a blue/green load"""
+        return self._generation or self.config.index_name
+    
+    def prepare(self) -> None:
+        """Restore settings left behind by a crashed bulk load, then set up a blue/green generation or the ingest profile"""
+        index = self.config.index_name
+        if not self.config.bulk_load_mode and self.bulk_load_settings.pending_original(index) is not None:
+            logger.info(f"Restoring settings of index {index} left by an interrupted bulk load")
+            self.bulk_load_settings.restore(index)
+        
+        if self.config.blue_green_load:
+            # New generations are created with the ingest profile, so bulk_load_mode has nothing left to do
+            self.index_manager.check_alias()
+            self._generation = self.index_manager.create_generation()
+        elif self.config.bulk_load_mode:
+            self.bulk_load_settings.apply(index, self.config.bulk_load_replicas,
+                                          self.config.bulk_load_translog_flush_threshold)
+            self._bulk_load_applied = True
+    
+    def finalize(self, succeeded: bool) -> None:
+        """Promote or discard a blue/green generation, or restore the index settings after a bulk load"""
+        if self._generation:
+            generation, self._generation = self._generation, None
+            if succeeded and not self._failed_records:
+                try:
+                    self.index_manager.promote(generation)
+                except Exception:
+                    # Nothing points at an unpromoted generation; don't leave it behind
+                    self.index_manager.discard(generation)
+                    raise
+                self.index_manager.prune()
+            else:
+                logger.warning(f"Load into {generation} did not fully succeed "
+                               f"({self._failed_records} failed records); keeping alias {self.config.index_name} unchanged")
+                self.index_manager.discard(generation)
+        
+        if self._bulk_load_applied:
+            self.bulk_load_settings.restore(self.config.index_name, self.config.bulk_load_force_merge_segments)
+            self._bulk_load_applied = False
+    
     def upsert_batch(self, records: List[DataRecord]) -> BatchResult:
         """Insert batch of records into OpenSearch"""
         if not records:
             return BatchResult(total_records=0, successful_records=0, failed_records=0)
 
-        document_type = self.document_config.document_type # parent or child
-        child_relation_type = self.document_config.child_relation_type
-        if not child_relation_type:
+        if not self.document_config.child_relation_type:
             raise DataSinkError("Child relation type must be specified for child documents")
         
         try:
-            logger.info(f"Inserting batch of {len(records)} records into OpenSearch")
+            logger.debug("Inserting batch of %s records into OpenSearch", len(records))
             
-            logger.info(f"OpenSearch index: {self.config.index_name}")
-            actions = []
-            for record in records:
-                item = record.to_dict()
-                logger.info(f"Record to insert: {item}")
-                
-                if document_type.lower().strip() == "parent":
-                    doc_ = {
-                        "indexed_at": utils.get_utc_time()
-                    }
-                    action = {
-                        "_op_type": "update",
-                        '_index': self.config.index_name,
-                        "_id": item['orgno'],
-                        "_routing": item['orgno'],
-                        "doc": doc_ | {k: v for k, v in item.items() if k != 'orgno' or v}
-                    }
-                    actions.append(action)
-                
-                if document_type.lower().strip() == "child":
-                    doc_rel = {
-                        "relation_type": {
-                            "name": child_relation_type,
-                            "parent": item['orgno']
-                        },
-                        "indexed_at": utils.get_utc_time()
-                    }
-                    child_data_list = item['child_data']
-                    for child_doc in child_data_list:
-                        action = {
-                            "_op_type": "update",
-                            '_index': self.config.index_name,
-                            "_id": uuid.uuid4(), # guid
-                            "_routing": item['orgno'],
-                            "doc": doc_rel | {k: v for k, v in child_doc.items() if v}, # Merge dictionaries
-                            "doc_as_upsert": True  # Create if doesn't exist
-                        }
-                        logger.info(f"\n---> Child document to insert: {action}\n")
-                        actions.append(action)
+            logger.debug("OpenSearch index: %s", self.target_index)
+            # Actions are generated lazily while earlier chunks are in flight
+            written_children: Dict[str, List[str]] = {}
+            # A blue/green generation starts empty, so parents must be created rather than updated
+            actions = self.action_builder.iter_actions(records, self.target_index, written_children,
+                                                       upsert_parents=self._generation is not None)
+
+            # Perform bulk insert, split into requests capped by action count and bytes
+            success_count, failed_items, sent_bytes = self._bulk(actions)
             
-            # Perform bulk insert
-            success_count, failed_items = bulk(
-                self.client, 
-                actions, 
-                chunk_size=len(actions),
-                request_timeout=120,
-                raise_on_error=False,  # Don't fail entire batch on single doc errors
-                raise_on_exception=True
-            )
+            if self.document_config.delete_stale_children and written_children:
+                self._delete_stale_children(written_children, failed_items)
             
             failed_count = len(failed_items) if failed_items else 0
+            self._record_failures(failed_count)
             errors = [str(item) for item in failed_items] if failed_items else []
             
             result = BatchResult(
                 total_records=len(records),
                 successful_records=success_count,
                 failed_records=failed_count,
-                errors=errors
+                errors=errors,
+                failures=self.action_builder.failed_records(records, failed_items) if failed_items else [],
+                bytes_written=sent_bytes,
+                metrics=self._metrics()
             )
             
-            logger.info(f"OpenSearch batch insert completed: {success_count} success, {failed_count} failed")
+            logger.debug("OpenSearch batch insert completed: %s success, %s failed", success_count, failed_count)
             return result
             
         except Exception as e:
             logger.error(f"Error inserting batch into OpenSearch. Traceback: {traceback.format_exc()}")
+            self._record_failures(len(records))
             return BatchResult(
                 total_records=len(records),
                 successful_records=0,
                 failed_records=len(records),
-                errors=[str(e)]
+                errors=[str(e)],
+                failures=[FailedRecord.of(record, str(e)) for record in records]
             )
     
+    def _record_failures(self, count: int) -> None:
+        if count:
+            with self._init_lock:
+                self._failed_records += count
+    
+    def _metrics(self) -> Dict[str, Any]:
+        """Cumulative bulk figures plus the backpressure controller's state"""
+        metrics = self.bulk_stats.snapshot()
+        if self.controller is not None:
+            metrics.update(self.controller.snapshot())
+        return metrics
+    
+    def child_id(self, orgno: str, child_doc: dict) -> str:
+        return self.action_builder.child_id(orgno, child_doc)
+    
+    def _delete_stale_children(self, written_children: Dict[str, List[str]], failed_items: List[dict]) -> None:
+        """
+        Delete children of the written parents that this batch did not write; parents with failed children are skipped.
+        Parents are queried in groups that stay under indices.query.bool.max_clause_count. The records are already
+        written, so a failed delete is logged and counted but never fails the batch.
+        """
+        failed_parents = set()
+        for item in failed_items:
+            failed_id = str(next(iter(item.values())).get('_id', ''))
+            failed_parents.add(failed_id.rsplit(':', 1)[0])
+        parents = [orgno for orgno in written_children if orgno not in failed_parents]
+        
+        for start in range(0, len(parents), STALE_CHILDREN_PARENTS_PER_QUERY):
+            group = parents[start:start + STALE_CHILDREN_PARENTS_PER_QUERY]
+            try:
+                deleted = self._delete_stale_children_of(group, written_children)
+            except Exception as e:
+                logger.warning(f"Could not delete stale child documents of {len(group)} parents: {str(e)}")
+                self.bulk_stats.record_stale_delete_failure()
+                self.telemetry.increment('opensearch_stale_delete_failures')
+                continue
+            self.bulk_stats.record_stale_deleted(deleted)
+            if deleted:
+                logger.info(f"Deleted {deleted} stale child documents of {len(group)} parents")
+    
+    def _delete_stale_children_of(self, parents: List[str], written_children: Dict[str, List[str]]) -> int:
+        keep_ids = [child_id for orgno in parents for child_id in written_children[orgno]]
+        query = {
+            "query": {
+                "bool": {
+                    "should": [
+                        {"parent_id": {"type": self.document_config.child_relation_type, "id": orgno}}
+                        for orgno in parents
+                    ],
+                    "minimum_should_match": 1,
+                    "must_not": [{"ids": {"values": keep_ids}}] if keep_ids else []
+                }
+            }
+        }
+        response = self.client.delete_by_query(
+            index=self.target_index,
+            body=query,
+            routing=','.join(parents),
+            conflicts='proceed',
+            request_timeout=self.config.bulk_request_timeout
+        )
+        return response.get('deleted', 0)
+    
+    def _backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff"""
+        ceiling = min(self.config.bulk_retry_max_delay, self.config.bulk_retry_base_delay * (2 ** attempt))
+        return random.uniform(0, ceiling)
+    
+    def _send(self, chunk: BulkChunk) -> Tuple[int, List[dict]]:
+        """Send one chunk, resending only rejected actions with backoff until they land or retries run out"""
+        success_count = 0
+        failed_items = []
+        attempt = 0
+        while True:
+            with self.telemetry.span('opensearch_bulk_request'):
+                outcome = send_chunk(self.client, chunk, self.config.bulk_request_timeout, self.bulk_stats)
+            self.telemetry.observe('opensearch_bulk_request_bytes', chunk.size_bytes)
+            self.telemetry.observe('opensearch_bulk_request_actions', len(chunk.actions))
+            if self.controller is not None:
+                self.controller.on_response(len(chunk.actions), len(outcome.rejected), outcome.seconds)
+            success_count += outcome.success_count
+            failed_items.extend(outcome.failed_items)
+            if not outcome.rejected:
+                return success_count, failed_items
+            if attempt >= self.config.bulk_max_retries:
+                logger.warning(f"{len(outcome.rejected)} bulk actions still rejected after {attempt} retries")
+                failed_items.extend(item for _, item in outcome.rejected)
+                return success_count, failed_items
+            
+            self.bulk_stats.record_retry(len(outcome.rejected))
+            self.telemetry.increment('opensearch_bulk_rejected_actions', len(outcome.rejected))
+            delay = self._backoff_delay(attempt)
+            logger.info(f"OpenSearch rejected {len(outcome.rejected)} of {len(chunk.actions)} bulk actions; "
+                        f"retrying them in {delay:.2f}s")
+            time.sleep(delay)
+            chunk = chunk.subset([index for index, _ in outcome.rejected])
+            attempt += 1
+    
+    def _concurrency_limit(self) -> int:
+        if self.controller is None:
+            return self.config.bulk_concurrency
+        return self.controller.concurrency
+    
+    def _send_parallel(self, chunks: Iterator[BulkChunk]) -> Iterator[Tuple[int, List[dict]]]:
+        """Keep up to bulk_concurrency requests in flight; the next chunk is built only when a slot frees up"""
+        in_flight = set()
+        try:
+            for chunk in chunks:
+                # The controller may lower the limit below the current count; drain down to it
+                while len(in_flight) >= self._concurrency_limit():
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                in_flight.add(self.executor.submit(self._send, chunk))
+            for future in as_completed(in_flight):
+                yield future.result()
+        finally:
+            # Don't leave requests running behind a failed batch
+            for future in in_flight:
+                future.cancel()
+            wait(in_flight)
+    
+    def _bulk(self, actions: Iterable[dict]) -> Tuple[int, List[dict], int]:
+        """Send actions in size- and count-capped _bulk requests; item errors don't fail the batch. Also returns the bytes sent"""
+        chunker = BulkChunker(
+            self.client.transport.serializer,
+            max_actions=self.config.bulk_max_actions,
+            max_bytes=self.config.bulk_max_bytes,
+            controller=self.controller
+        )
+        chunks = chunker.chunks(actions)
+        if self.config.bulk_concurrency > 1:
+            outcomes = self._send_parallel(chunks)
+        else:
+            outcomes = (self._send(chunk) for chunk in chunks)
+        
+        success_count = 0
+        failed_items = []
+        for chunk_success, chunk_failed in outcomes:
+            success_count += chunk_success
+            failed_items.extend(chunk_failed)
+        return success_count, failed_items, chunker.chunked_bytes
+    
     def close(self) -> None:
         """Close OpenSearch connection"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self._executor = None
         if self._client:
             try:
                 self._client.transport.close()
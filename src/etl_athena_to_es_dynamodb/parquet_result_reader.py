@@ -0,0 +1,62 @@
+# parquet_result_reader.py
+import io
+import logging
+from typing import Iterator, List, Dict, Any
+import etl_athena_to_es_dynamodb.utils as utils
+from etl_athena_to_es_dynamodb.exceptions import ConfigurationError
+
+logger = logging.getLogger(__name__)
+
+def _import_pyarrow():
+    """pyarrow is only needed for the UNLOAD source mode"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ConfigurationError("UNLOAD to Parquet mode requires pyarrow: pip install 'etl-athena-to-es-dynamodb[parquet]'")
+    return pyarrow
+
+class ParquetResultReader:
+    """Reads the Parquet files written by an Athena UNLOAD, one row group at a time (SRP)"""
+
+    def __init__(self, s3_client, location: str):
+        self.s3_client = s3_client
+        self.bucket, self.prefix = utils.parse_s3_uri(location)
+        self.pa = _import_pyarrow()
+
+    def list_files(self) -> List[str]:
+        """Keys of the data files under the UNLOAD location"""
+        keys = []
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in page.get('Contents', []):
+                if obj['Size'] > 0 and not obj['Key'].endswith('/'):
+                    keys.append(obj['Key'])
+        logger.info(f"UNLOAD wrote {len(keys)} files under s3://{self.bucket}/{self.prefix}")
+        return sorted(keys)
+
+    def _json_compatible_type(self, data_type):
+        """Same type with date/timestamp leaves turned into strings, matching Athena's JSON rendering"""
+        pa = self.pa
+        if pa.types.is_date(data_type) or pa.types.is_timestamp(data_type):
+            return pa.string()
+        if pa.types.is_list(data_type) or pa.types.is_large_list(data_type):
+            value_field = data_type.value_field
+            return pa.list_(value_field.with_type(self._json_compatible_type(value_field.type)))
+        if pa.types.is_struct(data_type):
+            return pa.struct([field.with_type(self._json_compatible_type(field.type)) for field in data_type])
+        return data_type
+
+    def iter_row_groups(self) -> Iterator[List[Dict[str, Any]]]:
+        """Yield every row group of every file as a list of row dicts"""
+        for key in self.list_files():
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=key)
+            parquet_file = self.pa.parquet.ParquetFile(io.BytesIO(response['Body'].read()))
+            schema = parquet_file.schema_arrow
+            target_schema = self.pa.schema([field.with_type(self._json_compatible_type(field.type)) for field in schema])
+
+            for index in range(parquet_file.num_row_groups):
+                table = parquet_file.read_row_group(index)
+                if target_schema != schema:
+                    table = table.cast(target_schema)
+                yield table.to_pylist()
@@ -1,13 +1,105 @@
 # pipeline.py
+import time
+import queue
 import logging
-from typing import List, Dict, Any
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+from typing import Iterator, List, Dict, Tuple, Optional, Any
 from etl_athena_to_es_dynamodb.interfaces import DataSource, DataSink, BatchProcessor
-from etl_athena_to_es_dynamodb.models import BatchConfig, BatchResult
-from etl_athena_to_es_dynamodb.exceptions import DataPipelineError
+from etl_athena_to_es_dynamodb.models import BatchConfig, BatchResult, DataRecord, FailedRecord
+from etl_athena_to_es_dynamodb.checkpoint import RunCheckpointer
+from etl_athena_to_es_dynamodb.dead_letter import DeadLetterSpool
+from etl_athena_to_es_dynamodb.telemetry import Telemetry
+from etl_athena_to_es_dynamodb.exceptions import DataPipelineError, ConfigurationError
 
 logger = logging.getLogger(__name__)
 
+_STAGE_DONE = object()
+
+class _BatchTracker:
+    """Joins each batch's per-sink results and reports the batch once every sink has written it"""
+    
+    def __init__(self, batch_processor: BatchProcessor, sink_names: List[str]):
+        self.batch_processor = batch_processor
+        self.sink_names = sink_names
+        self.sink_results: Dict[str, List[BatchResult]] = {name: [] for name in sink_names}
+        self._pending: Dict[int, Tuple[List[DataRecord], Dict[str, BatchResult]]] = {}
+        self._failure: Optional[Exception] = None
+        self._lock = threading.Lock()
+    
+    def add(self, batch: List[DataRecord]) -> None:
+        with self._lock:
+            self._pending[id(batch)] = (batch, {})
+    
+    def complete(self, batch: List[DataRecord], sink_name: str, result: BatchResult) -> None:
+        with self._lock:
+            self.sink_results[sink_name].append(result)
+            _, batch_results = self._pending[id(batch)]
+            batch_results[sink_name] = result
+            if len(batch_results) < len(self.sink_names):
+                return
+            del self._pending[id(batch)]
+        self.batch_processor.on_batch_completed(batch, batch_results)
+    
+    def fail(self, error: Exception) -> None:
+        with self._lock:
+            self._failure = self._failure or error
+    
+    def raise_failure(self) -> None:
+        if self._failure is not None:
+            raise self._failure
+
+def aggregate_results(sink_results: Dict[str, List[BatchResult]], total_processed_batches: int,
+                      source_statistics: Dict[str, Any], processor_statistics: Dict[str, Any],
+                      dead_letter_statistics: Optional[Dict[str, int]] = None,
+                      elapsed_seconds: Optional[float] = None) -> Dict[str, Any]:
+    """Aggregate per-batch results from all sinks into the run summary"""
+    aggregated = {
+        'total_processed_batches': total_processed_batches,
+        'sinks': {}
+    }
+    if elapsed_seconds is not None:
+        aggregated['elapsed_seconds'] = round(elapsed_seconds, 3)
+    
+    if source_statistics:
+        aggregated['source'] = source_statistics
+    
+    if processor_statistics:
+        aggregated['batch_processor'] = processor_statistics
+    
+    for sink_name, results in sink_results.items():
+        total_records = sum(r.total_records for r in results)
+        successful_records = sum(r.successful_records for r in results)
+        failed_records = sum(r.failed_records for r in results)
+        all_errors = []
+        for r in results:
+            all_errors.extend(r.errors)
+        
+        success_rate = (successful_records / total_records * 100) if total_records > 0 else 0
+        
+        aggregated['sinks'][sink_name] = {
+            'total_records': total_records,
+            'successful_records': successful_records,
+            'failed_records': failed_records,
+            'success_rate': round(success_rate, 2),
+            'error_count': len(all_errors)
+        }
+        if dead_letter_statistics is not None:
+            aggregated['sinks'][sink_name]['dead_lettered_records'] = dead_letter_statistics.get(sink_name, 0)
+        
+        bytes_written = sum(r.bytes_written for r in results)
+        aggregated['sinks'][sink_name]['bytes_written'] = bytes_written
+        if elapsed_seconds:
+            # Over the whole run, so sinks are comparable however long each one was busy
+            aggregated['sinks'][sink_name]['records_per_second'] = round(total_records / elapsed_seconds, 1)
+            aggregated['sinks'][sink_name]['mb_per_second'] = round(bytes_written / 1_000_000 / elapsed_seconds, 3)
+        
+        # Sink metrics are cumulative snapshots, so the latest one describes the run
+        latest_metrics = next((r.metrics for r in reversed(results) if r.metrics), None)
+        if latest_metrics:
+            aggregated['sinks'][sink_name]['metrics'] = latest_metrics
+    
+    return aggregated
+
 class DataPipeline:
     """Main data pipeline orchestrator (SRP, DIP)"""
     
@@ -15,117 +107,242 @@ class DataPipeline:
                  data_source: DataSource,
                  data_sinks: List[DataSink],
                  batch_processor: BatchProcessor,
-                 batch_config: BatchConfig):
+                 batch_config: BatchConfig,
+                 checkpointer: Optional[RunCheckpointer] = None,
+                 dead_letters: Optional[DeadLetterSpool] = None,
+                 telemetry: Optional[Telemetry] = None):
+        if checkpointer and not batch_processor.preserves_order:
+            raise ConfigurationError("Checkpointing needs a batch processor that keeps record order")
         self.data_source = data_source
         self.data_sinks = data_sinks
         self.batch_processor = batch_processor
         self.batch_config = batch_config
+        self.checkpointer = checkpointer
+        self.dead_letters = dead_letters
+        self.telemetry = telemetry or Telemetry()
         logger.info(f"DataPipeline initialized with {len(data_sinks)} sinks")
     
     def execute(self, query: str) -> Dict[str, Any]:
         """Execute the data pipeline"""
+        succeeded = False
         try:
             logger.info("Starting data pipeline execution")
             logger.info(f"self.data_source: {self.data_source}")
             
-            # Fetch data from source
-            data_iterator = self.data_source.fetch_data(query)
+            for sink in self.data_sinks:
+                sink.prepare()
             
-            # Process data in batches
-            batches = self.batch_processor.process_batches(
-                data_iterator, 
-                self.batch_config.batch_size
-            )
+            skip = 0
+            if self.checkpointer:
+                skip = self.checkpointer.begin(query, self.data_source,
+                                               [sink.__class__.__name__ for sink in self.data_sinks])
             
-            # Process batches concurrently across all sinks
-            pipeline_results = self._process_batches_concurrently(batches)
+            # Reader, transform and sink stages run concurrently, joined by bounded queues
+            pipeline_results = self._run_stages(query, skip)
             
             logger.info("Data pipeline execution completed successfully")
+            succeeded = True
             return pipeline_results
             
         except Exception as e:
             logger.error(f"Pipeline execution failed: {str(e)}")
             raise DataPipelineError(f"Pipeline execution failed: {str(e)}")
         finally:
-            self._cleanup_resources()
+            if self.checkpointer:
+                self.checkpointer.finish(succeeded)
+            self._cleanup_resources(succeeded)
     
-    def _process_batches_concurrently(self, batches) -> Dict[str, Any]:
-        """Process batches concurrently across all sinks"""
-        total_processed_batches = 0
- 
-        sink_results = {sink.__class__.__name__: [] for sink in self.data_sinks}
+    def _read_source(self, query: str, output: queue.Queue, stop: threading.Event, skip: int = 0) -> None:
+        """Reader stage: push source batches (or batch_size chunks of records) onto the queue, after skipping skip records"""
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    output.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
         
-        with ThreadPoolExecutor(max_workers=self.batch_config.max_workers) as executor:
+        try:
+            if self.data_source.produces_batches:
+                chunks = self.data_source.fetch_batches(query)
+            else:
+                chunks = self._chunk(self.data_source.fetch_data(query))
+            for chunk in self.telemetry.timed('pipeline_fetch', chunks):
+                self.telemetry.increment('source_records', len(chunk))
+                if skip:
+                    skipped = min(skip, len(chunk))
+                    chunk, skip = chunk[skipped:], skip - skipped
+                    if not chunk:
+                        continue
+                if not put(chunk):
+                    return
+            put(_STAGE_DONE)
+        except Exception as e:
+            put(e)
+    
+    def _chunk(self, records: Iterator[DataRecord]) -> Iterator[List[DataRecord]]:
+        chunk = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= self.batch_config.batch_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    
+    @staticmethod
+    def _drain(source_queue: queue.Queue) -> Iterator[List[DataRecord]]:
+        """Batches from the reader stage; re-raises the reader's error"""
+        while True:
+            item = source_queue.get()
+            if item is _STAGE_DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    
+    def _consume(self, sink: DataSink, sink_queue: queue.Queue, tracker: '_BatchTracker',
+                 stop: threading.Event) -> None:
+        """Sink stage: write batches at this sink's own pace until the end marker"""
+        sink_name = sink.__class__.__name__
+        while True:
+            item = sink_queue.get()
+            if item is _STAGE_DONE:
+                return
+            if stop.is_set():
+                continue  # Run is failing; drain without writing
+            number, batch, records = item
+            acknowledged = False
+            try:
+                if records:
+                    with self.telemetry.span('sink_write', sink=sink_name):
+                        result = sink.upsert_batch(records)
+                    logger.info(f"Batch completed for {sink_name}: {result.success_rate:.1f}% success rate")
+                else:
+                    # Written by the run this one resumes
+                    result = BatchResult(total_records=0, successful_records=0, failed_records=0)
+                acknowledged = True
+            except Exception as e:
+                logger.error(f"Error in sink {sink_name}: {str(e)}")
+                # Create failed result
+                result = BatchResult(
+                    total_records=len(records),
+                    successful_records=0,
+                    failed_records=len(records),
+                    errors=[str(e)],
+                    failures=[FailedRecord.of(record, str(e)) for record in records]
+                )
+            self._record_result(sink_name, result)
+            result = self._spool_failures(sink_name, result)
+            try:
+                tracker.complete(batch, sink_name, result)
+                if acknowledged and self.checkpointer:
+                    self.checkpointer.acknowledge(sink_name, number)
+            except Exception as e:
+                logger.error(f"Error completing batch for {sink_name}: {str(e)}")
+                tracker.fail(e)
+                stop.set()
+    
+    def _record_result(self, sink_name: str, result: BatchResult) -> None:
+        self.telemetry.increment('sink_records', result.successful_records, sink=sink_name, outcome='success')
+        self.telemetry.increment('sink_records', result.failed_records, sink=sink_name, outcome='failed')
+        self.telemetry.increment('sink_bytes', result.bytes_written, sink=sink_name)
+    
+    def _spool_failures(self, sink_name: str, result: BatchResult) -> BatchResult:
+        """Write the failed records to the dead-letter spool; results keep only the counts"""
+        if not result.failures:
+            return result
+        if self.dead_letters:
+            try:
+                self.dead_letters.write(sink_name, result.failures)
+            except Exception as e:
+                logger.error(f"Could not spool {len(result.failures)} failed records of {sink_name}: {str(e)}")
+        return result.model_copy(update={'failures': []})
+    
+    def _run_stages(self, query: str, skip: int = 0) -> Dict[str, Any]:
+        """Run the reader, transform and per-sink consumer stages and aggregate their results"""
+        depth = self.batch_config.queue_depth
+        stop = threading.Event()
+        source_queue = queue.Queue(maxsize=depth)
+        sink_queues = {sink.__class__.__name__: queue.Queue(maxsize=depth) for sink in self.data_sinks}
+        tracker = _BatchTracker(self.batch_processor, list(sink_queues))
+        workers_per_sink = max(1, self.batch_config.max_workers // max(1, len(self.data_sinks)))
+        start = time.perf_counter()
+        
+        reader = threading.Thread(target=self._read_source, args=(query, source_queue, stop, skip),
+                                  name='pipeline-reader', daemon=True)
+        consumers = [
+            threading.Thread(target=self._consume, args=(sink, sink_queues[sink.__class__.__name__], tracker, stop),
+                             name=f"pipeline-{sink.__class__.__name__}-{index}", daemon=True)
+            for sink in self.data_sinks for index in range(workers_per_sink)
+        ]
+        reader.start()
+        for consumer in consumers:
+            consumer.start()
+        
+        total_processed_batches = 0
+        try:
+            # Transform stage, on this thread: batch the reader's output and fan it out
+            source_batches = self._drain(source_queue)
+            if self.checkpointer:
+                source_batches = self.checkpointer.track(source_batches, skip)
+            batches = self.telemetry.timed(
+                'pipeline_transform',
+                self.batch_processor.process_record_batches(source_batches, self.batch_config.batch_size)
+            )
             for batch in batches:
+                if stop.is_set():
+                    break
                 total_processed_batches += 1
-                logger.info(f"==> Processing batch {total_processed_batches} with {len(batch)} records")
-                
-                # Submit batch to all sinks concurrently
-                future_to_sink = {}
-                for sink in self.data_sinks:
-                    logger.info(f"Submitting batch to sink: {sink.__class__.__name__}")
-                    logger.info(f"Batch data size: {len(batch)}")
-                    logger.info(f"Batch 2 records: {batch[-2:]}")
-                    future = executor.submit(sink.upsert_batch, batch)
-                    future_to_sink[future] = sink.__class__.__name__
-                
-                # Collect results from all sinks
-                for future in as_completed(future_to_sink):
-                    sink_name = future_to_sink[future]
-                    try:
-                        result = future.result()
-                        sink_results[sink_name].append(result)
-                        logger.info(f"Batch completed for {sink_name}: {result.success_rate:.1f}% success rate")
-                    except Exception as e:
-                        logger.error(f"Error in sink {sink_name}: {str(e)}")
-                        # Create failed result
-                        failed_result = BatchResult(
-                            total_records=len(batch),
-                            successful_records=0,
-                            failed_records=len(batch),
-                            errors=[str(e)]
-                        )
-                        sink_results[sink_name].append(failed_result)
+                logger.debug("==> Processing batch %s with %s records", total_processed_batches, len(batch))
+                if self.checkpointer:
+                    number, sink_records = self.checkpointer.emitted(batch)
+                else:
+                    number, sink_records = total_processed_batches, dict.fromkeys(sink_queues, batch)
+                tracker.add(batch)
+                for sink_name, sink_queue in sink_queues.items():
+                    # Blocks while this sink is depth batches behind: memory-bounded backpressure
+                    sink_queue.put((number, batch, sink_records[sink_name]))
+        except BaseException:
+            stop.set()
+            raise
+        finally:
+            for sink_queue in sink_queues.values():
+                for _ in range(workers_per_sink):
+                    sink_queue.put(_STAGE_DONE)
+            for consumer in consumers:
+                consumer.join()
+            stop.set()  # Release the reader if the transform stage stopped early
         
-        # Aggregate results
-        aggregated_results = self._aggregate_results(sink_results, total_processed_batches)
-        return aggregated_results
+        tracker.raise_failure()
+        return self._aggregate_results(tracker.sink_results, total_processed_batches, time.perf_counter() - start)
     
     def _aggregate_results(self, sink_results: Dict[str, List[BatchResult]], 
-                          total_processed_batches: int) -> Dict[str, Any]:
+                          total_processed_batches: int, elapsed_seconds: Optional[float] = None) -> Dict[str, Any]:
         """Aggregate results from all sinks"""
-        aggregated = {
-            'total_processed_batches': total_processed_batches,
-            'sinks': {}
-        }
-        
-        for sink_name, results in sink_results.items():
-            total_records = sum(r.total_records for r in results)
-            successful_records = sum(r.successful_records for r in results)
-            failed_records = sum(r.failed_records for r in results)
-            all_errors = []
-            for r in results:
-                all_errors.extend(r.errors)
-            
-            success_rate = (successful_records / total_records * 100) if total_records > 0 else 0
-            
-            aggregated['sinks'][sink_name] = {
-                'total_records': total_records,
-                'successful_records': successful_records,
-                'failed_records': failed_records,
-                'success_rate': round(success_rate, 2),
-                'error_count': len(all_errors)
-            }
-        
-        return aggregated
+        return aggregate_results(sink_results, total_processed_batches,
+                                 self.data_source.get_statistics(), self.batch_processor.get_statistics(),
+                                 self.dead_letters.statistics() if self.dead_letters else None,
+                                 elapsed_seconds)
     
-    def _cleanup_resources(self) -> None:
+    def _cleanup_resources(self, succeeded: bool = False) -> None:
         """Cleanup all resources"""
         try:
             logger.info("Cleaning up resources")
+            for sink in self.data_sinks:
+                # One sink failing to finalize must not keep the others from restoring their state
+                try:
+                    sink.finalize(succeeded)
+                except Exception as e:
+                    logger.error(f"Error finalizing sink {sink.__class__.__name__}: {str(e)}")
             self.data_source.close()
+            self.batch_processor.close()
             for sink in self.data_sinks:
                 sink.close()
+            if self.dead_letters:
+                self.dead_letters.close()
+            self.telemetry.close()
             logger.info("Resource cleanup completed")
         except Exception as e:
             logger.warning(f"Error during resource cleanup: {str(e)}")
@@ -1,13 +1,27 @@
 # pipeline_factory.py
 import logging
-from typing import List, Optional
+from typing import List, Tuple, Optional
 from etl_athena_to_es_dynamodb.models import (AWSConfig, AthenaConfig, OpenSearchConfig, 
-                   DocumentConfig, DynamoDBConfig, BatchConfig)
+                   DocumentConfig, DynamoDBConfig, BatchConfig, ShardConfig,
+                   ChangeDetectionConfig, CheckpointConfig, DeadLetterConfig, TelemetryConfig)
 from etl_athena_to_es_dynamodb.athena_source import AthenaDataSource
+from etl_athena_to_es_dynamodb.sharded_athena_source import ShardedAthenaDataSource
 from etl_athena_to_es_dynamodb.opensearch_sink import OpenSearchDataSink
 from etl_athena_to_es_dynamodb.dynamodb_sink import DynamoDBDataSink
 from etl_athena_to_es_dynamodb.batch_processor import SimpleBatchProcessor
+from etl_athena_to_es_dynamodb.change_detector import ChangeDetectingBatchProcessor
+from etl_athena_to_es_dynamodb.transform_pool import ProcessPoolTransformProcessor
+from etl_athena_to_es_dynamodb.checkpoint import FileCheckpointStore, RunCheckpointer
+from etl_athena_to_es_dynamodb.dead_letter import DeadLetterSpool, DeadLetterReplayer
+from etl_athena_to_es_dynamodb.telemetry import Telemetry
+from etl_athena_to_es_dynamodb.telemetry_exporters import PrometheusTextFileExporter, EMFExporter, OpenTelemetryExporter
 from etl_athena_to_es_dynamodb.pipeline import DataPipeline
+from etl_athena_to_es_dynamodb.interfaces import BatchProcessor, DataSink
+from etl_athena_to_es_dynamodb.async_adapters import SyncDataSourceAdapter, SyncDataSinkAdapter, SyncBatchProcessorAdapter
+from etl_athena_to_es_dynamodb.async_athena_source import AsyncAthenaDataSource
+from etl_athena_to_es_dynamodb.async_opensearch_sink import AsyncOpenSearchDataSink
+from etl_athena_to_es_dynamodb.async_dynamodb_sink import AsyncDynamoDBDataSink
+from etl_athena_to_es_dynamodb.async_pipeline import AsyncDataPipeline
 from etl_athena_to_es_dynamodb.exceptions import ConfigurationError
 
 logger = logging.getLogger(__name__)
@@ -15,6 +29,68 @@ logger = logging.getLogger(__name__)
 class PipelineFactory:
     """Factory for creating data pipeline instances (Factory Pattern, SRP)"""
     
+    @staticmethod
+    def _check_blue_green(opensearch_config: Optional[OpenSearchConfig],
+                          change_detection_config: Optional[ChangeDetectionConfig]) -> None:
+        """A blue/green generation starts empty, so every record has to reach it"""
+        if opensearch_config and opensearch_config.blue_green_load and change_detection_config:
+            raise ConfigurationError("Change detection cannot be combined with blue/green loads; "
+                                     "unchanged records would be missing from the new index")
+    
+    @staticmethod
+    def _create_batch_processor(batch_config: BatchConfig, change_detection_config: Optional[ChangeDetectionConfig],
+                                sink_targets: List[str], telemetry: Optional[Telemetry] = None) -> BatchProcessor:
+        batch_processor = SimpleBatchProcessor(telemetry)
+        if batch_config.transform_workers:
+            # Before change detection, so its digests hash already-parsed records
+            batch_processor = ProcessPoolTransformProcessor(
+                batch_processor, batch_config.transform_workers, ordered=batch_config.transform_ordered
+            )
+        if change_detection_config:
+            # Digests are scoped to the sink set, so adding a sink re-sends everything to it
+            batch_processor = ChangeDetectingBatchProcessor(
+                batch_processor, change_detection_config, namespace='|'.join(sink_targets)
+            )
+        return batch_processor
+    
+    @staticmethod
+    def _create_sinks(aws_config: AWSConfig, document_config: DocumentConfig,
+                      opensearch_config: Optional[OpenSearchConfig],
+                      dynamodb_config: Optional[DynamoDBConfig],
+                      telemetry: Optional[Telemetry] = None) -> Tuple[List[DataSink], List[str]]:
+        """Blocking sinks plus the target names that scope change detection digests"""
+        data_sinks = []
+        sink_targets = []
+        if opensearch_config:
+            data_sinks.append(OpenSearchDataSink(opensearch_config, document_config, telemetry))
+            sink_targets.append(f"opensearch:{opensearch_config.index_name}:{document_config.document_type}")
+            logger.info("OpenSearch sink added to pipeline")
+        if dynamodb_config:
+            data_sinks.append(DynamoDBDataSink(aws_config, dynamodb_config, document_config, telemetry))
+            sink_targets.append(f"dynamodb:{dynamodb_config.table_name}")
+            logger.info("DynamoDB sink added to pipeline")
+        return data_sinks, sink_targets
+    
+    @staticmethod
+    def _create_dead_letter_spool(dead_letter_config: Optional[DeadLetterConfig]) -> Optional[DeadLetterSpool]:
+        if dead_letter_config is None:
+            return None
+        return DeadLetterSpool(dead_letter_config.directory, dead_letter_config.segment_max_bytes)
+    
+    @staticmethod
+    def _create_telemetry(telemetry_config: Optional[TelemetryConfig]) -> Telemetry:
+        """Telemetry shared by all components; without a config it only feeds the run summary"""
+        exporters = []
+        for name in (telemetry_config.exporters if telemetry_config else []):
+            if name == 'prometheus':
+                exporters.append(PrometheusTextFileExporter(telemetry_config.prometheus_path))
+            elif name == 'emf':
+                exporters.append(EMFExporter(telemetry_config.emf_namespace))
+            elif name == 'otel':
+                exporters.append(OpenTelemetryExporter(telemetry_config.service_name))
+            logger.info(f"Telemetry exporter enabled: {name}")
+        return Telemetry(exporters)
+    
     @staticmethod
     def create_pipeline(
         aws_config: AWSConfig,
@@ -22,40 +98,149 @@ class PipelineFactory:
         document_config: DocumentConfig,
         opensearch_config: Optional[OpenSearchConfig] = None,
         dynamodb_config: Optional[DynamoDBConfig] = None,
-        batch_config: Optional[BatchConfig] = None
+        batch_config: Optional[BatchConfig] = None,
+        shard_config: Optional[ShardConfig] = None,
+        change_detection_config: Optional[ChangeDetectionConfig] = None,
+        checkpoint_config: Optional[CheckpointConfig] = None,
+        dead_letter_config: Optional[DeadLetterConfig] = None,
+        telemetry_config: Optional[TelemetryConfig] = None
     ) -> DataPipeline:
         """Create a configured data pipeline"""
         
         # Validate that at least one sink is configured
         if not opensearch_config and not dynamodb_config:
             raise ConfigurationError("At least one sink (OpenSearch or DynamoDB) must be configured")
+        if checkpoint_config and opensearch_config and opensearch_config.blue_green_load:
+            # A failed blue/green run discards its index, so there is nothing to resume into
+            raise ConfigurationError("Checkpointing cannot be combined with blue/green loads")
+        PipelineFactory._check_blue_green(opensearch_config, change_detection_config)
         
         logger.info("Creating data pipeline components")
+        telemetry = PipelineFactory._create_telemetry(telemetry_config)
         
         # Create data source
-        data_source = AthenaDataSource(aws_config, athena_config)
+        data_source = AthenaDataSource(aws_config, athena_config, telemetry)
+        if shard_config:
+            data_source = ShardedAthenaDataSource(data_source, shard_config)
+            logger.info(f"Athena source sharded with strategy: {shard_config.strategy}")
         
         # Create data sinks
-        data_sinks = []
-        if opensearch_config:
-            data_sinks.append(OpenSearchDataSink(opensearch_config, document_config))
-            logger.info("OpenSearch sink added to pipeline")
-        if dynamodb_config:
-            data_sinks.append(DynamoDBDataSink(aws_config, dynamodb_config, document_config))
-            logger.info("DynamoDB sink added to pipeline")
-        
-        # Create batch processor
-        batch_processor = SimpleBatchProcessor()
+        data_sinks, sink_targets = PipelineFactory._create_sinks(aws_config, document_config,
+                                                                 opensearch_config, dynamodb_config, telemetry)
         
         # Use default batch config if not provided
         if batch_config is None:
             batch_config = BatchConfig()
         
+        # Create batch processor
+        batch_processor = PipelineFactory._create_batch_processor(batch_config, change_detection_config,
+                                                                  sink_targets, telemetry)
+        
+        checkpointer = None
+        if checkpoint_config:
+            checkpointer = RunCheckpointer(FileCheckpointStore(checkpoint_config.path), resume=checkpoint_config.resume)
+        
         logger.info(f"Pipeline created with {len(data_sinks)} sinks, batch size: {batch_config.batch_size}")
         
         return DataPipeline(
             data_source=data_source,
             data_sinks=data_sinks,
             batch_processor=batch_processor,
-            batch_config=batch_config
-        )
\ No newline at end of file
+            batch_config=batch_config,
+            checkpointer=checkpointer,
+            dead_letters=PipelineFactory._create_dead_letter_spool(dead_letter_config),
+            telemetry=telemetry
+        )
+    
+    @staticmethod
+    def create_async_pipeline(
+        aws_config: AWSConfig,
+        athena_config: AthenaConfig,
+        document_config: DocumentConfig,
+        opensearch_config: Optional[OpenSearchConfig] = None,
+        dynamodb_config: Optional[DynamoDBConfig] = None,
+        batch_config: Optional[BatchConfig] = None,
+        shard_config: Optional[ShardConfig] = None,
+        change_detection_config: Optional[ChangeDetectionConfig] = None,
+        checkpoint_config: Optional[CheckpointConfig] = None,
+        dead_letter_config: Optional[DeadLetterConfig] = None,
+        telemetry_config: Optional[TelemetryConfig] = None
+    ) -> AsyncDataPipeline:
+        """Create the asyncio pipeline; components without a native async version run through adapters"""
+        if not opensearch_config and not dynamodb_config:
+            raise ConfigurationError("At least one sink (OpenSearch or DynamoDB) must be configured")
+        if checkpoint_config:
+            raise ConfigurationError("Checkpointing is only supported by the sync pipeline engine")
+        PipelineFactory._check_blue_green(opensearch_config, change_detection_config)
+        
+        logger.info("Creating async data pipeline components")
+        telemetry = PipelineFactory._create_telemetry(telemetry_config)
+        
+        athena_source = AthenaDataSource(aws_config, athena_config, telemetry)
+        if shard_config:
+            data_source = SyncDataSourceAdapter(ShardedAthenaDataSource(athena_source, shard_config))
+            logger.info(f"Athena source sharded with strategy: {shard_config.strategy}")
+        else:
+            data_source = AsyncAthenaDataSource(athena_source)
+        
+        data_sinks = []
+        sink_targets = []
+        if opensearch_config:
+            unsupported = AsyncOpenSearchDataSink.unsupported_features(opensearch_config, document_config)
+            if unsupported:
+                logger.info(f"Using the blocking OpenSearch sink in worker threads for: {', '.join(unsupported)}")
+                data_sinks.append(SyncDataSinkAdapter(OpenSearchDataSink(opensearch_config, document_config, telemetry)))
+            else:
+                data_sinks.append(AsyncOpenSearchDataSink(opensearch_config, document_config, telemetry))
+            sink_targets.append(f"opensearch:{opensearch_config.index_name}:{document_config.document_type}")
+        if dynamodb_config:
+            if AsyncDynamoDBDataSink.is_supported(dynamodb_config):
+                data_sinks.append(AsyncDynamoDBDataSink(aws_config, dynamodb_config, document_config, telemetry))
+            else:
+                logger.info("Using the blocking DynamoDB sink in worker threads")
+                data_sinks.append(SyncDataSinkAdapter(DynamoDBDataSink(aws_config, dynamodb_config, document_config,
+                                                                       telemetry)))
+            sink_targets.append(f"dynamodb:{dynamodb_config.table_name}")
+        
+        if batch_config is None:
+            batch_config = BatchConfig()
+        
+        batch_processor = SyncBatchProcessorAdapter(
+            PipelineFactory._create_batch_processor(batch_config, change_detection_config, sink_targets, telemetry)
+        )
+        
+        logger.info(f"Async pipeline created with {len(data_sinks)} sinks, batch size: {batch_config.batch_size}")
+        
+        return AsyncDataPipeline(
+            data_source=data_source,
+            data_sinks=data_sinks,
+            batch_processor=batch_processor,
+            batch_config=batch_config,
+            dead_letters=PipelineFactory._create_dead_letter_spool(dead_letter_config),
+            telemetry=telemetry
+        )
+    
+    @staticmethod
+    def create_dead_letter_replayer(
+        aws_config: AWSConfig,
+        document_config: DocumentConfig,
+        dead_letter_config: DeadLetterConfig,
+        opensearch_config: Optional[OpenSearchConfig] = None,
+        dynamodb_config: Optional[DynamoDBConfig] = None,
+        batch_config: Optional[BatchConfig] = None
+    ) -> DeadLetterReplayer:
+        """Replayer routing each sink's spool, from either engine, to the blocking sink of the same target"""
+        if opensearch_config:
+            # A replay writes a few records into the live index, never into a new generation
+            opensearch_config = opensearch_config.model_copy(update={'blue_green_load': False, 'bulk_load_mode': False})
+        data_sinks, _ = PipelineFactory._create_sinks(aws_config, document_config, opensearch_config, dynamodb_config)
+        routes = {}
+        for sink in data_sinks:
+            name = sink.__class__.__name__
+            routes[name] = sink
+            routes[f"Async{name}"] = sink
+        return DeadLetterReplayer(
+            PipelineFactory._create_dead_letter_spool(dead_letter_config),
+            routes,
+            batch_size=(batch_config or BatchConfig()).batch_size
+        )
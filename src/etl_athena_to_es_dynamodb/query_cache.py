@@ -0,0 +1,91 @@
+# query_cache.py
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Optional, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+class QueryResultCache:
+    """On-disk map from a normalized query fingerprint to a finished Athena execution (SRP)"""
+
+    def __init__(self, path: str, ttl_seconds: int, max_entries: int):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = self._load()
+
+    @staticmethod
+    def fingerprint(query: str, kind: str) -> str:
+        """Hash of the query with whitespace collapsed; kind separates CSV from UNLOAD results"""
+        normalized = re.sub(r'\s+', ' ', query).strip().rstrip(';').strip()
+        return hashlib.sha256(f"{kind}:{normalized}".encode('utf-8')).hexdigest()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('entries', {})
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable query cache {self.path}: {str(e)}")
+            return {}
+
+    def _save(self) -> None:
+        """Write atomically so a crash never leaves a truncated cache"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'entries': self._entries}, f)
+        os.replace(tmp_path, self.path)
+
+    def _is_expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return now - entry['created_at'] > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached entry for key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            now = time.time()
+            if self._is_expired(entry, now):
+                del self._entries[key]
+                self._save()
+                return None
+            entry['last_used_at'] = now
+            self._save()
+            return dict(entry)
+
+    def put(self, key: str, query_execution_id: str, result_location: str) -> None:
+        """Record a finished execution, evicting expired then least recently used entries"""
+        with self._lock:
+            now = time.time()
+            self._entries[key] = {
+                'query_execution_id': query_execution_id,
+                'result_location': result_location,
+                'created_at': now,
+                'last_used_at': now
+            }
+            for expired_key in [k for k, e in self._entries.items() if self._is_expired(e, now)]:
+                del self._entries[expired_key]
+            overflow = len(self._entries) - self.max_entries
+            if overflow > 0:
+                by_last_use = sorted(self._entries, key=lambda k: self._entries[k]['last_used_at'])
+                for old_key in by_last_use[:overflow]:
+                    del self._entries[old_key]
+            self._save()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._save()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,77 @@
+# rate_limiter.py
+import time
+import threading
+from typing import Callable, Dict, Any
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket whose refill rate follows AIMD feedback (SRP).
+    Callers acquire an estimate before a request and settle the actual cost afterwards,
+    so the bucket can go negative and later callers wait off the difference.
+    """
+
+    def __init__(self, initial_rate: float, min_rate: float, max_rate: float,
+                 increase_step: float = 1.0, decrease_factor: float = 0.5,
+                 decrease_cooldown: float = 1.0,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = min(max(initial_rate, min_rate), max_rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = self.rate  # Allow one second of burst
+        self._last_refill = clock()
+        self._last_decrease = float('-inf')
+        self.throttle_count = 0
+        self.consumed_units = 0.0
+        self.wait_seconds = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.rate, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self, units: float = 1.0) -> None:
+        """Take units now and wait off any deficit; concurrent callers queue behind each other"""
+        with self._lock:
+            self._refill(self._clock())
+            self._tokens -= units
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.wait_seconds += delay
+        if delay > 0:
+            self._sleep(delay)
+
+    def settle(self, estimated_units: float, consumed_units: float) -> None:
+        """Charge the difference between the acquired estimate and the reported consumption"""
+        with self._lock:
+            self._tokens -= consumed_units - estimated_units
+            self.consumed_units += consumed_units
+
+    def on_success(self, units: float = 1.0) -> None:
+        """Additive increase: about increase_step per second of traffic at the current rate"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase_step * units / self.rate)
+
+    def on_throttle(self) -> None:
+        """Multiplicative decrease, at most once per cooldown, and drain the bucket"""
+        with self._lock:
+            self.throttle_count += 1
+            now = self._clock()
+            if now - self._last_decrease >= self.decrease_cooldown:
+                self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+                self._last_decrease = now
+            self._tokens = min(self._tokens, 0.0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current controller state for batch results"""
+        with self._lock:
+            return {
+                'current_rate': round(self.rate, 2),
+                'throttle_count': self.throttle_count,
+                'consumed_capacity_units': round(self.consumed_units, 2),
+                'rate_limit_wait_seconds': round(self.wait_seconds, 3)
+            }
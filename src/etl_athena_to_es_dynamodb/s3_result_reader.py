@@ -0,0 +1,186 @@
+# s3_result_reader.py
+import csv
+import codecs
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Iterator, List, Tuple, Dict
+import etl_athena_to_es_dynamodb.utils as utils
+from etl_athena_to_es_dynamodb.exceptions import DataSourceError
+
+logger = logging.getLogger(__name__)
+
+class S3ResultReader:
+    """Streams an Athena result CSV from S3 using ranged GETs (SRP)"""
+
+    def __init__(self, s3_client, output_location: str, chunk_size: int):
+        self.s3_client = s3_client
+        self.bucket, self.key = utils.parse_s3_uri(output_location)
+        self.chunk_size = chunk_size
+        self._content_length = None
+
+    @property
+    def content_length(self) -> int:
+        """Size of the result object in bytes"""
+        if self._content_length is None:
+            response = self.s3_client.head_object(Bucket=self.bucket, Key=self.key)
+            self._content_length = response['ContentLength']
+            logger.info(f"Result object s3://{self.bucket}/{self.key} is {self._content_length} bytes")
+        return self._content_length
+
+    def _get_range(self, start: int, end: int) -> Iterator[bytes]:
+        """Stream the bytes of [start, end] as they arrive"""
+        response = self.s3_client.get_object(
+            Bucket=self.bucket,
+            Key=self.key,
+            Range=f"bytes={start}-{end}"
+        )
+        yield from response['Body'].iter_chunks()
+
+    @property
+    def range_count(self) -> int:
+        """Number of chunk_size ranges covering the object"""
+        return -(-self.content_length // self.chunk_size)
+
+    def _range_bounds(self, index: int) -> Tuple[int, int]:
+        """Inclusive byte bounds of the range at index"""
+        start = index * self.chunk_size
+        return start, min(start + self.chunk_size, self.content_length) - 1
+
+    def iter_bytes(self) -> Iterator[bytes]:
+        """Yield the result object sequentially, one ranged GET at a time"""
+        for index in range(self.range_count):
+            yield from self._get_range(*self._range_bounds(index))
+
+    def iter_lines(self) -> Iterator[str]:
+        """Decode the byte stream into complete '\\n'-terminated lines"""
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        pending = ''
+        for chunk in self.iter_bytes():
+            pending += decoder.decode(chunk)
+            lines = pending.split('\n')
+            pending = lines.pop()
+            for line in lines:
+                yield line + '\n'
+        pending += decoder.decode(b'', final=True)
+        if pending:
+            yield pending
+
+    def iter_rows(self) -> Iterator[List[str]]:
+        """Parse the result CSV incrementally; the first row is the header"""
+        yield from csv.reader(self.iter_lines())
+
+
+class ParallelS3ResultReader(S3ResultReader):
+    """Fetches result ranges on a pool of connections and stitches rows back together"""
+
+    def __init__(self, s3_client, output_location: str, chunk_size: int,
+                 concurrency: int, max_inflight_ranges: int, preserve_order: bool = True):
+        super().__init__(s3_client, output_location, chunk_size)
+        self.concurrency = concurrency
+        self.max_inflight_ranges = max(1, max_inflight_ranges)
+        self.preserve_order = preserve_order
+
+    def _fetch_range(self, index: int) -> bytes:
+        """Download one whole range"""
+        return b''.join(self._get_range(*self._range_bounds(index)))
+
+    def _iter_ranges(self) -> Iterator[Tuple[int, bytes]]:
+        """
+        Yield (index, bytes) for every range.
+        Downloaded-but-unconsumed ranges count against max_inflight_ranges, which bounds memory.
+        Range 0 (it holds the header) is always yielded first; later ranges follow in index
+        order when preserve_order is set, otherwise as soon as they complete.
+        """
+        total = self.range_count
+        pending = {}
+        ready: Dict[int, bytes] = {}
+        next_index = 0
+        next_to_yield = 0
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='s3-range-reader')
+        try:
+            while next_to_yield < total and (next_index < total or pending or ready):
+                while next_index < total and len(pending) + len(ready) < self.max_inflight_ranges:
+                    pending[executor.submit(self._fetch_range, next_index)] = next_index
+                    next_index += 1
+
+                if pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        ready[pending.pop(future)] = future.result()
+
+                while next_to_yield in ready:
+                    yield next_to_yield, ready.pop(next_to_yield)
+                    next_to_yield += 1
+
+                if not self.preserve_order and next_to_yield > 0:
+                    for index in sorted(ready):
+                        yield index, ready.pop(index)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def iter_bytes(self) -> Iterator[bytes]:
+        """Yield the result object in order, prefetching ranges in parallel"""
+        for _, data in self._iter_ranges():
+            yield data
+
+    def iter_rows(self) -> Iterator[List[str]]:
+        """Parse the result CSV; rows come out of order unless preserve_order is set"""
+        if self.preserve_order:
+            yield from super().iter_rows()
+            return
+        yield from self._iter_unordered_rows()
+
+    def _iter_unordered_rows(self) -> Iterator[List[str]]:
+        """
+        Parse the complete lines inside each range as soon as it arrives.
+        Lines that straddle a range boundary are kept as small head/tail fragments and
+        stitched once every range is in. Line breaks are treated as row breaks, so this
+        mode requires rows without embedded newlines; a row of the wrong width is an error.
+        """
+        fragments: Dict[int, Tuple[bytes, bytes]] = {}
+        middles: Dict[int, bytes] = {}
+        column_count = None
+
+        def parse(block: bytes) -> Iterator[List[str]]:
+            try:
+                for row in csv.reader(block.decode('utf-8').split('\n'), strict=True):
+                    if not row:
+                        continue
+                    if column_count is not None and len(row) != column_count:
+                        raise csv.Error(f"row has {len(row)} columns, expected {column_count}")
+                    yield row
+            except csv.Error as e:
+                raise DataSourceError(
+                    f"Unordered read failed ({str(e)}); the result likely contains embedded "
+                    "newlines, read it with preserve_order"
+                )
+
+        for index, data in self._iter_ranges():
+            first_newline = data.find(b'\n')
+            if first_newline == -1:
+                if index == 0 and self.range_count > 1:
+                    raise DataSourceError("Header row is larger than one read range")
+                middles[index] = data
+                continue
+            last_newline = data.rfind(b'\n')
+            head, body, tail = data[:first_newline], data[first_newline + 1:last_newline], data[last_newline + 1:]
+            fragments[index] = (head, tail)
+
+            if index == 0:
+                header = next(csv.reader([head.decode('utf-8')]))
+                column_count = len(header)
+                yield header
+            if body:
+                yield from parse(body)
+
+        carry = b''
+        for index in range(self.range_count):
+            if index in middles:
+                carry += middles[index]
+                continue
+            head, tail = fragments[index]
+            if index > 0 and carry + head:
+                yield from parse(carry + head)
+            carry = tail
+        if carry:
+            yield from parse(carry)
@@ -0,0 +1,159 @@
+# sharded_athena_source.py
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Dict, Any
+from etl_athena_to_es_dynamodb.athena_source import AthenaDataSource
+from etl_athena_to_es_dynamodb.interfaces import DataSource
+from etl_athena_to_es_dynamodb.models import DataRecord, ShardConfig, ShardProgress
+from etl_athena_to_es_dynamodb.exceptions import DataSourceError, ConfigurationError
+from etl_athena_to_es_dynamodb.utils import SHARD_FILTER_PLACEHOLDER
+
+logger = logging.getLogger(__name__)
+
+_SHARD_DONE = object()
+
+class ShardedAthenaDataSource(DataSource):
+    """Fans one logical query out into disjoint Athena sub-queries and merges their streams (SRP)"""
+
+    CHUNK_SIZE = 500  # Records handed to the merge queue at a time
+
+    def __init__(self, athena_source: AthenaDataSource, shard_config: ShardConfig):
+        if shard_config.strategy == 'values' and not shard_config.shard_values:
+            raise ConfigurationError("The 'values' shard strategy needs shard_values")
+        if athena_source.athena_config.unload_to_parquet and athena_source.athena_config.unload_location:
+            raise ConfigurationError("Sharded UNLOAD needs a fresh location per shard; leave unload_location unset")
+        self.athena_source = athena_source
+        self.shard_config = shard_config
+        self.shard_progress: List[ShardProgress] = []
+        logger.info(f"ShardedAthenaDataSource initialized with {len(self.shard_predicates())} shards")
+
+    @property
+    def produces_batches(self) -> bool:
+        return self.athena_source.produces_batches
+
+    def shard_predicates(self) -> List[str]:
+        """One SQL predicate per shard; together they cover every row exactly once"""
+        key = self.shard_config.shard_key
+        if self.shard_config.strategy == 'mod':
+            count = self.shard_config.shard_count
+            # Non-numeric or NULL keys fall into shard 0 so no row is lost
+            return [f"coalesce(mod(try_cast({key} AS bigint), {count}), 0) = {index}" for index in range(count)]
+
+        predicates = []
+        for value in self.shard_config.shard_values:
+            if '..' in value:
+                low, high = value.split('..', 1)
+                predicates.append(f"{key} BETWEEN '{low.strip()}' AND '{high.strip()}'")
+            else:
+                predicates.append(f"{key} = '{value.strip()}'")
+        return predicates
+
+    @staticmethod
+    def build_shard_query(query: str, predicate: str) -> str:
+        """Put the predicate at the shard filter placeholder, or filter the query's output"""
+        if SHARD_FILTER_PLACEHOLDER in query:
+            return query.replace(SHARD_FILTER_PLACEHOLDER, f"({predicate})")
+        return f"SELECT * FROM (\n{query.strip().rstrip(';')}\n) WHERE {predicate}"
+
+    def _read_shard(self, shard: ShardProgress, query: str, output: queue.Queue, stop: threading.Event) -> None:
+        """Run one shard query and push its records onto the merge queue in chunks"""
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    output.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def started(query_execution_id: str) -> None:
+            shard.query_execution_id = query_execution_id
+            # The merge may have stopped the shards before this ID was recorded
+            if stop.is_set():
+                self.athena_source.stop_query(query_execution_id)
+
+        try:
+            shard.state = 'running'
+            shard_query = self.build_shard_query(query, shard.predicate)
+            if self.athena_source.produces_batches:
+                chunks = self.athena_source.fetch_batches(shard_query, stop, started)
+            else:
+                chunks = self._chunk(self.athena_source.fetch_data(shard_query, stop, started))
+
+            for chunk in chunks:
+                if not put((shard, chunk)):
+                    return
+                shard.records += len(chunk)
+            shard.state = 'completed'
+            put((shard, _SHARD_DONE))
+        except Exception as e:
+            shard.state = 'failed'
+            shard.error = str(e)
+            put((shard, e))
+
+    def _chunk(self, records: Iterator[DataRecord]) -> Iterator[List[DataRecord]]:
+        chunk = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= self.CHUNK_SIZE:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _merge(self, query: str) -> Iterator[List[DataRecord]]:
+        """Yield chunks from all shards as they arrive"""
+        self.shard_progress = [
+            ShardProgress(shard_index=index, predicate=predicate)
+            for index, predicate in enumerate(self.shard_predicates())
+        ]
+        # Create clients on this thread; the lazy properties are not thread-safe
+        _ = self.athena_source.athena_client
+        _ = self.athena_source.s3_client
+
+        output = queue.Queue(maxsize=self.shard_config.queue_size)
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=self.shard_config.max_concurrent_queries)
+        remaining = len(self.shard_progress)
+        try:
+            for shard in self.shard_progress:
+                executor.submit(self._read_shard, shard, query, output, stop)
+
+            while remaining:
+                shard, item = output.get()
+                if item is _SHARD_DONE:
+                    remaining -= 1
+                    logger.info(f"Shard {shard.shard_index} completed with {shard.records} records; "
+                                f"{remaining} of {len(self.shard_progress)} shards remaining")
+                    continue
+                if isinstance(item, Exception):
+                    raise DataSourceError(f"Shard {shard.shard_index} failed: {str(item)}")
+                yield item
+        finally:
+            stop.set()
+            # Don't block on shards still waiting for Athena; they exit on their next poll or put
+            executor.shutdown(wait=False, cancel_futures=True)
+            for shard in self.shard_progress:
+                if shard.state == 'running' and shard.query_execution_id:
+                    self.athena_source.stop_query(shard.query_execution_id)
+
+    def fetch_data(self, query: str) -> Iterator[DataRecord]:
+        """Fetch records from all shards, in arrival order"""
+        for chunk in self._merge(query):
+            yield from chunk
+
+    def fetch_batches(self, query: str) -> Iterator[List[DataRecord]]:
+        """Fetch the inner source's batches from all shards, in arrival order"""
+        yield from self._merge(query)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            'shards': [shard.model_dump() for shard in self.shard_progress],
+            **self.athena_source.get_statistics()
+        }
+
+    def close(self) -> None:
+        """Close Athena connections"""
+        self.athena_source.close()
@@ -0,0 +1,163 @@
+# telemetry.py
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager, ExitStack
+from typing import Iterable, Iterator, List, Dict, Tuple, Optional, Any, TypeVar
+from etl_athena_to_es_dynamodb.interfaces import TelemetryExporter
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0)
+SIZE_BUCKETS = (1, 10, 100, 1000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+
+class Histogram:
+    """Bucket counts plus count, sum, min and max of the observed values"""
+    __slots__ = ('bounds', 'counts', 'count', 'sum', 'min', 'max')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile, capped at the largest value seen"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        cumulative = []
+        seen = 0
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            seen += count
+            cumulative.append((bound, seen))
+        return {
+            'buckets': cumulative,
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min if self.count else 0.0,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99)
+        }
+
+class Telemetry:
+    """
+    Counters, histograms and timed spans shared by every pipeline stage (SRP).
+    Measurements are aggregated in-process; exporters publish them at the end of the run,
+    except those that take each measurement as it happens (OpenTelemetry).
+    """
+
+    def __init__(self, exporters: Optional[List[TelemetryExporter]] = None):
+        self.exporters = exporters or []
+        self._live_exporters = [exporter for exporter in self.exporters if exporter.receives_measurements]
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple, float] = {}
+        self._histograms: Dict[Tuple, Histogram] = {}
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, Any]) -> Tuple:
+        return (name, tuple(sorted((key, str(value)) for key, value in labels.items())))
+
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        for exporter in self._live_exporters:
+            exporter.record('counter', name, value, dict(key[1]))
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = SIZE_BUCKETS, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+        for exporter in self._live_exporters:
+            exporter.record('histogram', name, value, dict(key[1]))
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[None]:
+        """Time a block into the <name>_seconds histogram and trace it with the exporters that trace"""
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for exporter in self.exporters:
+                stack.enter_context(exporter.span(name, attributes))
+            try:
+                yield
+            finally:
+                self.observe(f"{name}_seconds", time.perf_counter() - start, LATENCY_BUCKETS, **attributes)
+
+    def timed(self, name: str, iterable: Iterable[T], **attributes) -> Iterator[T]:
+        """Yield from iterable, timing each step as a span; for stages that are generators"""
+        iterator = iter(iterable)
+        while True:
+            with self.span(name, **attributes):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def counter_value(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(self._key(name, labels), 0)
+
+    def histogram(self, name: str, **labels) -> Optional[Histogram]:
+        with self._lock:
+            return self._histograms.get(self._key(name, labels))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Every counter and histogram with its labels, for the exporters"""
+        with self._lock:
+            return {
+                'timestamp': time.time(),
+                'counters': [
+                    {'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(self._counters.items())
+                ],
+                'histograms': [
+                    {'name': name, 'labels': dict(labels), **histogram.snapshot()}
+                    for (name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0])
+                ]
+            }
+
+    def export(self) -> None:
+        """Publish a snapshot through every exporter; a failing exporter must not fail the run"""
+        if not self.exporters:
+            return
+        snapshot = self.snapshot()
+        for exporter in self.exporters:
+            try:
+                exporter.export(snapshot)
+            except Exception as e:
+                logger.warning(f"Telemetry export through {exporter.__class__.__name__} failed: {str(e)}")
+
+    def close(self) -> None:
+        """Export the final figures and release the exporters"""
+        self.export()
+        for exporter in self.exporters:
+            try:
+                exporter.close()
+            except Exception as e:
+                logger.warning(f"Error closing {exporter.__class__.__name__}: {str(e)}")
@@ -0,0 +1,170 @@
+# telemetry_exporters.py
+import os
+import re
+import sys
+import json
+import math
+import logging
+import threading
+from typing import List, Dict, Tuple, Any, ContextManager
+from etl_athena_to_es_dynamodb.interfaces import TelemetryExporter
+from etl_athena_to_es_dynamodb.exceptions import ConfigurationError
+
+logger = logging.getLogger(__name__)
+
+def _unit(name: str) -> str:
+    if name.endswith('_seconds'):
+        return 'Seconds'
+    if name.endswith('_bytes'):
+        return 'Bytes'
+    return 'Count'
+
+class PrometheusTextFileExporter(TelemetryExporter):
+    """Writes the Prometheus text format to a file for node_exporter's textfile collector (SRP)"""
+
+    def __init__(self, path: str, prefix: str = 'etl_'):
+        self.path = path
+        self.prefix = prefix
+
+    def _name(self, name: str) -> str:
+        return self.prefix + re.sub(r'[^a-zA-Z0-9_:]', '_', name)
+
+    @staticmethod
+    def _labels(labels: Dict[str, str], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = list(labels.items()) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+        return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+    @staticmethod
+    def _bound(bound: float) -> str:
+        return '+Inf' if math.isinf(bound) else repr(float(bound))
+
+    def render(self, snapshot: Dict[str, Any]) -> str:
+        lines: List[str] = []
+        typed = set()
+        for counter in snapshot['counters']:
+            name = self._name(counter['name']) + '_total'
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{self._labels(counter['labels'])} {counter['value']}")
+        for histogram in snapshot['histograms']:
+            name = self._name(histogram['name'])
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            for bound, count in histogram['buckets']:
+                lines.append(f"{name}_bucket{self._labels(histogram['labels'], (('le', self._bound(bound)),))} {count}")
+            lines.append(f"{name}_sum{self._labels(histogram['labels'])} {histogram['sum']}")
+            lines.append(f"{name}_count{self._labels(histogram['labels'])} {histogram['count']}")
+        return '\n'.join(lines) + '\n'
+
+    def export(self, snapshot: Dict[str, Any]) -> None:
+        """Replace the file atomically; the collector must never read half a scrape"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render(snapshot))
+        os.replace(tmp_path, self.path)
+        logger.info(f"Metrics written to {self.path}")
+
+class EMFExporter(TelemetryExporter):
+    """
+    Prints CloudWatch Embedded Metric Format documents to stdout (SRP).
+    ECS awslogs and the CloudWatch agent turn them into metrics without PutMetricData calls.
+    One document per label set; histograms are reported as their count, sum, max and p99.
+    """
+
+    def __init__(self, namespace: str, stream=None):
+        self.namespace = namespace
+        self.stream = stream
+
+    def documents(self, snapshot: Dict[str, Any]) -> List[Dict[str, Any]]:
+        groups: Dict[Tuple, Dict[str, Any]] = {}
+
+        def add(labels: Dict[str, str], name: str, value: float, unit: str) -> None:
+            key = tuple(sorted(labels.items()))
+            group = groups.setdefault(key, {'labels': labels, 'metrics': [], 'values': {}})
+            group['metrics'].append({'Name': name, 'Unit': unit})
+            group['values'][name] = value
+
+        for counter in snapshot['counters']:
+            add(counter['labels'], counter['name'], counter['value'], _unit(counter['name']))
+        for histogram in snapshot['histograms']:
+            name, labels, unit = histogram['name'], histogram['labels'], _unit(histogram['name'])
+            add(labels, f"{name}_count", histogram['count'], 'Count')
+            add(labels, f"{name}_sum", histogram['sum'], unit)
+            add(labels, f"{name}_max", histogram['max'], unit)
+            add(labels, f"{name}_p99", histogram['p99'], unit)
+
+        timestamp = int(snapshot['timestamp'] * 1000)
+        return [
+            {
+                '_aws': {
+                    'Timestamp': timestamp,
+                    'CloudWatchMetrics': [{
+                        'Namespace': self.namespace,
+                        'Dimensions': [sorted(group['labels'])],
+                        'Metrics': group['metrics']
+                    }]
+                },
+                **group['labels'],
+                **group['values']
+            }
+            for group in groups.values()
+        ]
+
+    def export(self, snapshot: Dict[str, Any]) -> None:
+        stream = self.stream or sys.stdout
+        for document in self.documents(snapshot):
+            stream.write(json.dumps(document) + '\n')
+        stream.flush()
+
+class OpenTelemetryExporter(TelemetryExporter):
+    """
+    Forwards measurements and spans to the OpenTelemetry API (SRP).
+    Where they go is up to the SDK the process is started with (opentelemetry-instrument and the
+    OTEL_* environment variables); without an SDK the API is a no-op.
+    """
+
+    def __init__(self, service_name: str):
+        try:
+            from opentelemetry import metrics, trace
+        except ImportError:
+            raise ConfigurationError("OpenTelemetry export needs the 'otel' extra (opentelemetry-api)")
+        self._tracer = trace.get_tracer(service_name)
+        self._meter = metrics.get_meter(service_name)
+        self._instruments: Dict[Tuple[str, str], Any] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def receives_measurements(self) -> bool:
+        return True
+
+    def _instrument(self, kind: str, name: str):
+        instrument = self._instruments.get((kind, name))
+        if instrument is None:
+            with self._lock:
+                instrument = self._instruments.get((kind, name))
+                if instrument is None:
+                    unit = {'Seconds': 's', 'Bytes': 'By', 'Count': '1'}[_unit(name)]
+                    create = self._meter.create_counter if kind == 'counter' else self._meter.create_histogram
+                    instrument = self._instruments[(kind, name)] = create(name, unit=unit)
+        return instrument
+
+    def record(self, kind: str, name: str, value: float, labels: Dict[str, str]) -> None:
+        instrument = self._instrument(kind, name)
+        if kind == 'counter':
+            instrument.add(value, attributes=labels)
+        else:
+            instrument.record(value, attributes=labels)
+
+    def span(self, name: str, attributes: Dict[str, Any]) -> ContextManager:
+        return self._tracer.start_as_current_span(name, attributes={k: str(v) for k, v in attributes.items()})
+
+    def export(self, snapshot: Dict[str, Any]) -> None:
+        """Measurements were already handed over as they happened; the SDK exports on its own schedule"""
+        pass
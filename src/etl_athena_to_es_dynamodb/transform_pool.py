@@ -0,0 +1,111 @@
+# transform_pool.py
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future, FIRST_COMPLETED, wait
+from typing import Iterator, List, Dict, Tuple, Any
+from etl_athena_to_es_dynamodb.interfaces import BatchProcessor
+from etl_athena_to_es_dynamodb.models import DataRecord, BatchResult
+from etl_athena_to_es_dynamodb.exceptions import BatchProcessingError
+
+logger = logging.getLogger(__name__)
+
+def convert_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Worker entry point: parse the array-valued string fields of each row"""
+    return [DataRecord.convert_object_to_dict(row) for row in rows]
+
+class ProcessPoolTransformProcessor(BatchProcessor):
+    """
+    Wraps another BatchProcessor and converts each batch in worker processes (Decorator, SRP).
+    Only the plain row dicts cross the process boundary; the converted rows are seeded into
+    the original records as their parsed form, so to_dict() in the sinks no longer parses JSON.
+    """
+    
+    def __init__(self, inner: BatchProcessor, workers: int, ordered: bool = True):
+        self.inner = inner
+        self.workers = workers
+        self.ordered = ordered
+        self.max_pending = workers * 2  # Keep every worker busy while bounding batches in memory
+        self._executor = None
+        self._submitted: Dict[Future, List[DataRecord]] = {}
+        self._stats = {'transformed_batches': 0, 'transformed_records': 0}
+        logger.info(f"Process-pool transform enabled with {workers} workers ({'ordered' if ordered else 'unordered'})")
+    
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """Lazy initialization of the worker pool; workers don't inherit the pipeline's threads"""
+        if self._executor is None:
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context(method))
+        return self._executor
+    
+    @property
+    def preserves_order(self) -> bool:
+        return self.ordered and self.inner.preserves_order
+    
+    def _submit(self, batch: List[DataRecord]) -> Future:
+        future = self.executor.submit(convert_rows, [record.data for record in batch])
+        self._submitted[future] = batch
+        return future
+    
+    def _finish(self, future: Future) -> List[DataRecord]:
+        batch = self._submitted.pop(future)
+        rows = future.result()
+        self._stats['transformed_batches'] += 1
+        self._stats['transformed_records'] += len(rows)
+        for record, row in zip(batch, rows):
+            record.cache_parsed(row)
+        return batch
+    
+    def _ordered(self, batches: Iterator[List[DataRecord]]) -> Iterator[List[DataRecord]]:
+        pending = deque()
+        for batch in batches:
+            pending.append(self._submit(batch))
+            if len(pending) >= self.max_pending:
+                yield self._finish(pending.popleft())
+        while pending:
+            yield self._finish(pending.popleft())
+    
+    def _unordered(self, batches: Iterator[List[DataRecord]]) -> Iterator[List[DataRecord]]:
+        pending = set()
+        for batch in batches:
+            pending.add(self._submit(batch))
+            if len(pending) >= self.max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield self._finish(future)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield self._finish(future)
+    
+    def _transformed(self, batches: Iterator[List[DataRecord]]) -> Iterator[List[DataRecord]]:
+        try:
+            yield from (self._ordered(batches) if self.ordered else self._unordered(batches))
+        except BatchProcessingError:
+            raise
+        except Exception as e:
+            logger.error(f"Error during record transform: {str(e)}")
+            raise BatchProcessingError(f"Record transform failed: {str(e)}")
+    
+    def process_batches(self, data_iterator: Iterator[DataRecord],
+                        batch_size: int) -> Iterator[List[DataRecord]]:
+        """Batch with the inner processor, then convert each batch in the pool"""
+        return self._transformed(self.inner.process_batches(data_iterator, batch_size))
+    
+    def process_record_batches(self, batch_iterator: Iterator[List[DataRecord]],
+                               batch_size: int) -> Iterator[List[DataRecord]]:
+        return self._transformed(self.inner.process_record_batches(batch_iterator, batch_size))
+    
+    def on_batch_completed(self, batch: List[DataRecord], sink_results: Dict[str, BatchResult]) -> None:
+        self.inner.on_batch_completed(batch, sink_results)
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        return {**self.inner.get_statistics(), 'transform': dict(self._stats)}
+    
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = None
+        self.inner.close()
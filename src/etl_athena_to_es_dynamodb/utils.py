@@ -1,9 +1,28 @@
 from datetime import datetime
+from typing import Tuple
+from urllib.parse import urlparse
+
+# Sharded sources replace this with a per-shard predicate on the raw (pre-aggregation) columns
+SHARD_FILTER_PLACEHOLDER = "TRUE /* shard_filter */"
 
 def get_utc_time():
     return datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S')
 
-def get_athena_source_query() -> str:
+def parse_s3_uri(uri: str) -> Tuple[str, str]:
+    """Split an s3://bucket/key URI into (bucket, key)"""
+    parsed = urlparse(uri)
+    if parsed.scheme != 's3' or not parsed.netloc:
+        raise ValueError(f"Not an S3 URI: {uri}")
+    return parsed.netloc, parsed.path.lstrip('/')
+
+def get_athena_source_query(native_types: bool = False) -> str:
+    """
+    Vehicle extract grouped by orgno.
+    child_data is an array of JSON values by default; with native_types it stays an
+    array of ROWs, which UNLOAD can write as Parquet (JSON is not a Parquet type).
+    """
+    json_cast_open = "" if native_types else "cast ("
+    json_cast_close = "" if native_types else "as json\n        )"
 
     query = f"""
 with raw_data as (
@@ -45,13 +64,14 @@ with raw_data as (
     
     WHERE
       cc = 'se' AND d = '2025-08-27'
+      AND {SHARD_FILTER_PLACEHOLDER}
 )
 
 
 select 
     orgno
     , ARRAY_AGG(
-        cast (
+        {json_cast_open}
             CAST(
               ROW(
                 cast(orgno as bigint),
@@ -100,8 +120,7 @@ select
 
               )
             )
-            as json
-        )
+            {json_cast_close}
       ) as child_data
 from raw_data
 group by orgno
@@ -0,0 +1,424 @@
+"""In-process stand-ins for the AWS clients used by the pipeline"""
+import asyncio
+import csv
+import io
+import json
+import time
+import threading
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+from opensearchpy.exceptions import NotFoundError, TransportError
+from opensearchpy.serializer import JSONSerializer
+from etl_athena_to_es_dynamodb.interfaces import DataSource, DataSink
+from etl_athena_to_es_dynamodb.models import DataRecord, BatchResult
+
+
+class FakeStreamingBody:
+    def __init__(self, data: bytes, read_size: int = 7):
+        self._data = data
+        self._read_size = read_size
+
+    def read(self):
+        return self._data
+
+    def iter_chunks(self, chunk_size: int = 1024):
+        size = min(chunk_size, self._read_size)
+        for i in range(0, len(self._data), size):
+            yield self._data[i:i + size]
+
+
+class FakeS3Client:
+    """Serves objects from memory and honours Range headers"""
+
+    def __init__(self):
+        self.objects = {}
+        self.get_calls = []
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[(Bucket, Key)] = Body
+
+    def _lookup(self, bucket, key, operation):
+        if (bucket, key) not in self.objects:
+            raise ClientError({'Error': {'Code': 'NoSuchKey', 'Message': 'Not found'}}, operation)
+        return self.objects[(bucket, key)]
+
+    def head_object(self, Bucket, Key):
+        return {'ContentLength': len(self._lookup(Bucket, Key, 'HeadObject'))}
+
+    def get_object(self, Bucket, Key, Range=None):
+        data = self._lookup(Bucket, Key, 'GetObject')
+        self.get_calls.append(Range)
+        if Range:
+            start, end = Range.split('=')[1].split('-')
+            data = data[int(start):int(end) + 1]
+        return {'Body': FakeStreamingBody(data)}
+
+    def get_paginator(self, name):
+        assert name == 'list_objects_v2'
+        return self
+
+    def paginate(self, Bucket, Prefix):
+        contents = [
+            {'Key': key, 'Size': len(body)}
+            for (bucket, key), body in sorted(self.objects.items())
+            if bucket == Bucket and key.startswith(Prefix)
+        ]
+        return iter([{'Contents': contents}])
+
+
+class FakePaginator:
+    def __init__(self, pages):
+        self._pages = pages
+
+    def paginate(self, **kwargs):
+        return iter(self._pages)
+
+
+class FakeAthenaClient:
+    """Completes every query immediately and serves rows from memory"""
+
+    def __init__(self, headers, rows, output_location='s3://results/query.csv', page_size=1000,
+                 polls_until_done=0, final_state='SUCCEEDED', stuck_queries=()):
+        self.headers = headers
+        self.rows = rows
+        self.output_location = output_location
+        self.page_size = page_size
+        self.polls_until_done = polls_until_done
+        self.final_state = final_state
+        self.started_queries = []
+        self.start_kwargs = []
+        self.polls = {}
+        self.stuck_queries = set(stuck_queries)  # Stay RUNNING until stopped
+        self.stopped_queries = []
+
+    def start_query_execution(self, QueryString, **kwargs):
+        self.started_queries.append(QueryString)
+        self.start_kwargs.append(kwargs)
+        return {'QueryExecutionId': f"qid-{len(self.started_queries)}"}
+
+    def get_query_execution(self, QueryExecutionId):
+        self.polls[QueryExecutionId] = self.polls.get(QueryExecutionId, 0) + 1
+        done = self.polls[QueryExecutionId] > self.polls_until_done and QueryExecutionId not in self.stuck_queries
+        state = 'CANCELLED' if QueryExecutionId in self.stopped_queries else self.final_state if done else 'RUNNING'
+        return {
+            'QueryExecution': {
+                'QueryExecutionId': QueryExecutionId,
+                'Status': {'State': state},
+                'Statistics': {'DataScannedInBytes': 1024, 'EngineExecutionTimeInMillis': 10},
+                'ResultConfiguration': {'OutputLocation': self.output_location},
+            }
+        }
+
+    def stop_query_execution(self, QueryExecutionId):
+        self.stopped_queries.append(QueryExecutionId)
+        return {}
+
+    def get_paginator(self, name):
+        all_rows = [self.headers] + self.rows
+        pages = []
+        for i in range(0, len(all_rows), self.page_size):
+            chunk = all_rows[i:i + self.page_size]
+            pages.append({'ResultSet': {'Rows': [
+                {'Data': [{'VarCharValue': v} for v in row]} for row in chunk
+            ]}})
+        return FakePaginator(pages)
+
+
+def to_athena_csv(headers, rows) -> bytes:
+    """Render rows the way Athena writes its result CSV (every field quoted)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_ALL, lineterminator='\n')
+    writer.writerow(headers)
+    writer.writerows(rows)
+    return buffer.getvalue().encode('utf-8')
+
+
+class FakeDynamoDBClient:
+    """Low-level client: deserializes UpdateItem calls into a plain dict per orgno"""
+
+    def __init__(self, throttle_first=0, errors_first=0):
+        self.items = {}
+        self.threads = set()
+        self.throttle_first = throttle_first
+        self.throttled = 0
+        self.errors_first = errors_first  # Calls answered with a 500 before any other outcome
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._deserializer = TypeDeserializer()
+
+    def update_item(self, TableName, Key, AttributeUpdates, ReturnConsumedCapacity=None, **kwargs):
+        orgno = self._deserializer.deserialize(Key['orgno'])
+        with self._lock:
+            self.threads.add(threading.get_ident())
+            if self.errors < self.errors_first:
+                self.errors += 1
+                raise ClientError({'Error': {'Code': 'InternalServerError', 'Message': 'Internal server error'},
+                                   'ResponseMetadata': {'HTTPStatusCode': 500}}, 'UpdateItem')
+            if self.throttled < self.throttle_first:
+                self.throttled += 1
+                raise ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException', 'Message': 'Slow down'}}, 'UpdateItem')
+            item = self.items.setdefault(orgno, {'orgno': orgno})
+            item.update({k: self._deserializer.deserialize(v['Value']) for k, v in AttributeUpdates.items()})
+        if ReturnConsumedCapacity:
+            return {'ConsumedCapacity': {'TableName': TableName, 'CapacityUnits': 2.0}}
+        return {}
+
+
+class FakeDynamoDBResource:
+    """Stores items by orgno; the first calls can leave some requests unprocessed"""
+
+    def __init__(self, unprocessed_per_call=()):
+        self.items = {}
+        self.unprocessed_per_call = list(unprocessed_per_call)
+        self.batch_calls = []
+
+    def batch_write_item(self, RequestItems, ReturnConsumedCapacity=None):
+        (table_name, requests), = RequestItems.items()
+        assert len(requests) <= 25
+        keys = [r['PutRequest']['Item']['orgno'] for r in requests]
+        assert len(keys) == len(set(keys)), "duplicate keys in one BatchWriteItem request"
+        self.batch_calls.append(len(requests))
+        unprocessed = self.unprocessed_per_call.pop(0) if self.unprocessed_per_call else 0
+        processed = requests[:len(requests) - unprocessed]
+        for request in processed:
+            item = request['PutRequest']['Item']
+            self.items[item['orgno']] = item
+        left = requests[len(processed):]
+        return {'UnprocessedItems': {table_name: left} if left else {}}
+
+
+class FakeTransport:
+    def __init__(self):
+        self.serializer = JSONSerializer()
+
+    def close(self):
+        pass
+
+
+class FakeIndices:
+    """indices namespace holding flat settings per index"""
+
+    def __init__(self, settings=None):
+        self.settings = settings or {}
+        self.aliases = {}  # alias -> set of indices
+        self.bodies = {}
+        self.calls = []
+
+    def create(self, index, body=None, **kwargs):
+        self.calls.append(('create', index))
+        self.bodies[index] = body
+        self.settings[index] = {name: str(value) for name, value in (body or {}).get('settings', {}).items()}
+
+    def exists(self, index, **kwargs):
+        return index in self.settings or index in self.aliases
+
+    def exists_alias(self, name, **kwargs):
+        return name in self.aliases
+
+    def get(self, index, **kwargs):
+        prefix = index.rstrip('*')
+        return {name: {} for name in self.settings if name.startswith(prefix)}
+
+    def get_alias(self, name, **kwargs):
+        if name not in self.aliases:
+            raise NotFoundError(404, 'alias_not_found', {})
+        return {index: {'aliases': {name: {}}} for index in self.aliases[name]}
+
+    def update_aliases(self, body, **kwargs):
+        self.calls.append(('update_aliases', body))
+        for action in body['actions']:
+            op, spec = next(iter(action.items()))
+            indices = self.aliases.setdefault(spec['alias'], set())
+            if op == 'add':
+                indices.add(spec['index'])
+            else:
+                indices.discard(spec['index'])
+
+    def delete(self, index, **kwargs):
+        self.calls.append(('delete', index))
+        self.settings.pop(index, None)
+
+    def get_settings(self, index, flat_settings=False, **kwargs):
+        self.calls.append(('get_settings', index))
+        return {index: {'settings': dict(self.settings.get(index, {}))}}
+
+    def put_settings(self, index, body, **kwargs):
+        self.calls.append(('put_settings', index, dict(body)))
+        current = self.settings.setdefault(index, {})
+        for name, value in body.items():
+            if value is None:
+                current.pop(name, None)
+            else:
+                current[name] = str(value)
+
+    def refresh(self, index, **kwargs):
+        self.calls.append(('refresh', index))
+
+    def forcemerge(self, index, max_num_segments=None, **kwargs):
+        self.calls.append(('forcemerge', index, max_num_segments))
+
+
+class FakeOpenSearchClient:
+    """
+    Parses NDJSON _bulk bodies and answers every action; ids in fail_ids get a 400.
+    Each id is rejected with a 429 on its first reject_attempts sends, and the first
+    reject_requests whole requests fail with a 429 TransportError. With strict_updates, an
+    update without doc_as_upsert of a document missing from its index gets a 404, as in OpenSearch.
+    """
+
+    def __init__(self, fail_ids=(), latency=0.0, reject_attempts=0, reject_requests=0, strict_updates=False):
+        self.transport = FakeTransport()
+        self.indices = FakeIndices()
+        self.fail_ids = set(fail_ids)
+        self.latency = latency
+        self.reject_attempts = reject_attempts
+        self.reject_requests = reject_requests
+        self.attempts = {}
+        self.delete_calls = []
+        self.requests = []
+        self.documents = {}
+        self.strict_updates = strict_updates
+        self.indexed = set()  # (index, id) of every document written
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def bulk(self, body, request_timeout=None, **kwargs):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.latency)
+            with self._lock:
+                rejected = self.reject_requests > 0
+                self.reject_requests -= 1
+            if rejected:
+                raise TransportError(429, 'es_rejected_execution_exception', {})
+            return self._bulk(body, request_timeout)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _bulk(self, body, request_timeout):
+        lines = body.decode('utf-8').splitlines()
+        actions = []
+        items = []
+        index = 0
+        while index < len(lines):
+            header = json.loads(lines[index])
+            op_type, meta = next(iter(header.items()))
+            source = json.loads(lines[index + 1]) if op_type != 'delete' else None
+            index += 1 if source is None else 2
+            actions.append((op_type, meta, source))
+            doc_id = str(meta.get('_id'))
+            with self._lock:
+                self.attempts[doc_id] = self.attempts.get(doc_id, 0) + 1
+                attempt = self.attempts[doc_id]
+            if attempt <= self.reject_attempts:
+                items.append({op_type: {'_id': doc_id, 'status': 429,
+                                        'error': {'type': 'es_rejected_execution_exception'}}})
+                continue
+            if doc_id in self.fail_ids:
+                items.append({op_type: {'_id': doc_id, 'status': 400, 'error': {'type': 'mapper_parsing_exception'}}})
+                continue
+            location = (meta.get('_index'), doc_id)
+            if self.strict_updates and op_type == 'update' and not source.get('doc_as_upsert') \
+                    and location not in self.indexed:
+                items.append({op_type: {'_id': doc_id, 'status': 404, 'error': {'type': 'document_missing_exception'}}})
+                continue
+            with self._lock:
+                self.indexed.add(location)
+                self.documents[doc_id] = source
+            items.append({op_type: {'_id': doc_id, 'status': 200}})
+        with self._lock:
+            self.requests.append({'actions': actions, 'bytes': len(body), 'request_timeout': request_timeout})
+        return {'errors': any(list(item.values())[0]['status'] >= 300 for item in items), 'items': items}
+
+
+    def delete_by_query(self, index, body, routing=None, **kwargs):
+        """Supports the stale-children query: parent_id shoulds minus an ids must_not"""
+        query = body['query']['bool']
+        parents = {clause['parent_id']['id'] for clause in query['should']}
+        keep = {doc_id for clause in query['must_not'] for doc_id in clause['ids']['values']}
+        with self._lock:
+            self.delete_calls.append({'index': index, 'routing': routing, 'body': body})
+            stale = [doc_id for doc_id, source in self.documents.items()
+                     if ((source or {}).get('doc', {}).get('relation_type') or {}).get('parent') in parents
+                     and doc_id not in keep]
+            for doc_id in stale:
+                del self.documents[doc_id]
+        return {'deleted': len(stale)}
+
+
+class FakeAsyncOpenSearchClient:
+    """AsyncOpenSearch stand-in delegating to FakeOpenSearchClient, tracking concurrent requests"""
+
+    def __init__(self, latency=0.0, **kwargs):
+        self.inner = FakeOpenSearchClient(**kwargs)
+        self.transport = self.inner.transport
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def bulk(self, body, request_timeout=None, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            return self.inner.bulk(body, request_timeout=request_timeout)
+        finally:
+            self.in_flight -= 1
+
+    async def close(self):
+        pass
+
+
+class FakeAsyncDynamoDBClient:
+    """aiobotocore stand-in delegating to FakeDynamoDBClient, tracking concurrent requests"""
+
+    def __init__(self, latency=0.0, **kwargs):
+        self.inner = FakeDynamoDBClient(**kwargs)
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def update_item(self, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            return self.inner.update_item(**kwargs)
+        finally:
+            self.in_flight -= 1
+
+
+class ListDataSource(DataSource):
+    """Yields a fixed list of row dicts as DataRecords"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetch_data(self, query):
+        for row in self.rows:
+            yield DataRecord.from_dict(dict(row))
+
+    def close(self):
+        pass
+
+
+class RecordingSink(DataSink):
+    """Keeps every record it receives; fails the whole batch while fail is set"""
+
+    def __init__(self, fail=False):
+        self.received = []
+        self.fail = fail
+
+    def upsert_batch(self, records):
+        if self.fail:
+            return BatchResult(total_records=len(records), successful_records=0,
+                               failed_records=len(records), errors=['boom'])
+        self.received.extend(records)
+        return BatchResult(total_records=len(records), successful_records=len(records), failed_records=0)
+
+    def close(self):
+        pass
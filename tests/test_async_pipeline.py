@@ -0,0 +1,142 @@
+import asyncio
+import pytest
+from fakes import FakeAsyncDynamoDBClient, FakeAsyncOpenSearchClient, ListDataSource, RecordingSink
+from etl_athena_to_es_dynamodb.async_adapters import SyncDataSourceAdapter, SyncDataSinkAdapter, SyncBatchProcessorAdapter
+from etl_athena_to_es_dynamodb.async_dynamodb_sink import AsyncDynamoDBDataSink
+from etl_athena_to_es_dynamodb.async_opensearch_sink import AsyncOpenSearchDataSink
+from etl_athena_to_es_dynamodb.async_pipeline import AsyncDataPipeline
+from etl_athena_to_es_dynamodb.batch_processor import SimpleBatchProcessor
+from etl_athena_to_es_dynamodb.change_detector import ChangeDetectingBatchProcessor
+from etl_athena_to_es_dynamodb.exceptions import DataPipelineError
+from etl_athena_to_es_dynamodb.models import (AWSConfig, BatchConfig, ChangeDetectionConfig, DataRecord,
+                                              DocumentConfig, DynamoDBConfig, OpenSearchConfig)
+
+ROWS = [{'orgno': str(i), 'name': f'n{i}'} for i in range(400)]
+DOCUMENT_CONFIG = DocumentConfig(document_type='parent', child_relation_type='owner')
+
+
+def make_dynamodb_sink(client):
+    sink = AsyncDynamoDBDataSink(AWSConfig(region='eu-north-1'),
+                                 DynamoDBConfig(table_name='t', write_concurrency=64), DOCUMENT_CONFIG)
+    sink._client = client
+    return sink
+
+
+def make_opensearch_sink(client):
+    sink = AsyncOpenSearchDataSink(OpenSearchConfig(endpoint='localhost', index_name='idx', bulk_max_actions=10,
+                                                    bulk_concurrency=20), DOCUMENT_CONFIG)
+    sink._client = client
+    return sink
+
+
+def test_async_sinks_keep_many_requests_in_flight():
+    dynamodb = FakeAsyncDynamoDBClient(latency=0.01)
+    opensearch = FakeAsyncOpenSearchClient(latency=0.01)
+    pipeline = AsyncDataPipeline(
+        SyncDataSourceAdapter(ListDataSource(ROWS)),
+        [make_dynamodb_sink(dynamodb), make_opensearch_sink(opensearch)],
+        SyncBatchProcessorAdapter(SimpleBatchProcessor()),
+        BatchConfig(batch_size=100, async_batches_in_flight=4)
+    )
+    results = pipeline.run('SELECT 1')
+
+    assert results['total_processed_batches'] == 4
+    assert results['sinks']['AsyncDynamoDBDataSink']['successful_records'] == len(ROWS)
+    assert results['sinks']['AsyncOpenSearchDataSink']['successful_records'] == len(ROWS)
+    assert len(dynamodb.inner.items) == len(ROWS)
+    # Far beyond what the ten-thread BatchConfig.max_workers cap allows
+    assert dynamodb.max_in_flight > 64
+    assert 10 < opensearch.max_in_flight <= 20
+
+
+def test_sync_components_run_through_adapters(tmp_path):
+    sink = RecordingSink()
+
+    def run():
+        processor = ChangeDetectingBatchProcessor(
+            SimpleBatchProcessor(), ChangeDetectionConfig(digest_store_path=str(tmp_path / 'd.sqlite3')), namespace='n'
+        )
+        return AsyncDataPipeline(SyncDataSourceAdapter(ListDataSource(ROWS)), [SyncDataSinkAdapter(sink)],
+                                 SyncBatchProcessorAdapter(processor), BatchConfig(batch_size=50)).run('SELECT 1')
+
+    first = run()
+    second = run()
+    assert len(sink.received) == len(ROWS)
+    assert first['sinks']['RecordingSink']['successful_records'] == len(ROWS)
+    assert second['batch_processor']['change_detection']['skipped_records'] == len(ROWS)
+
+
+def test_throttled_updates_are_retried():
+    client = FakeAsyncDynamoDBClient(throttle_first=3)
+    sink = make_dynamodb_sink(client)
+    sink.dynamodb_config = sink.dynamodb_config.model_copy(update={'batch_write_base_delay': 0.001})
+    result = asyncio.run(sink.upsert_batch([DataRecord(data=row) for row in ROWS[:10]]))
+    assert result.successful_records == 10
+
+
+def test_failing_batch_completion_fails_the_run_instead_of_hanging():
+    class FailingCompletion(SimpleBatchProcessor):
+        def on_batch_completed(self, batch, sink_results):
+            raise RuntimeError('digest store is locked')
+
+    pipeline = AsyncDataPipeline(SyncDataSourceAdapter(ListDataSource(ROWS)), [SyncDataSinkAdapter(RecordingSink())],
+                                 SyncBatchProcessorAdapter(FailingCompletion()),
+                                 BatchConfig(batch_size=10, queue_depth=1, async_batches_in_flight=1))
+
+    with pytest.raises(DataPipelineError, match='digest store is locked'):
+        asyncio.run(asyncio.wait_for(pipeline.execute('SELECT 1'), timeout=10))
+
+
+def test_processor_adapter_lets_the_processor_read_ahead():
+    class ReadAheadProcessor(SimpleBatchProcessor):
+        """Pulls the next source batch before emitting the current one, like the transform pool"""
+
+        def __init__(self):
+            super().__init__()
+            self.calls = 0
+
+        def process_record_batches(self, batch_iterator, batch_size):
+            self.calls += 1
+            pending = None
+            for batch in batch_iterator:
+                if pending is not None:
+                    yield pending
+                pending = batch
+            if pending is not None:
+                yield pending
+
+    processor = ReadAheadProcessor()
+    sink = RecordingSink()
+    results = AsyncDataPipeline(SyncDataSourceAdapter(ListDataSource(ROWS)), [SyncDataSinkAdapter(sink)],
+                                SyncBatchProcessorAdapter(processor), BatchConfig(batch_size=50)).run('SELECT 1')
+
+    assert processor.calls == 1
+    assert results['total_processed_batches'] == 8
+    assert sorted(int(record.data['orgno']) for record in sink.received) == list(range(len(ROWS)))
+
+
+def test_async_opensearch_sink_builds_chunks_only_as_request_slots_free():
+    client = FakeAsyncOpenSearchClient(latency=0.01)
+    sink = make_opensearch_sink(client)
+    sink.config = sink.config.model_copy(update={'bulk_concurrency': 2})
+    built = []
+    first_request_after = []
+    iter_actions = sink.action_builder.iter_actions
+
+    def counted_actions(*args, **kwargs):
+        for action in iter_actions(*args, **kwargs):
+            built.append(action)
+            yield action
+
+    async def bulk(body, request_timeout=None, **kwargs):
+        first_request_after.append(len(built))
+        return await FakeAsyncOpenSearchClient.bulk(client, body, request_timeout)
+
+    sink.action_builder.iter_actions = counted_actions
+    client.bulk = bulk
+    result = asyncio.run(sink.upsert_batch([DataRecord(data=row) for row in ROWS[:100]]))
+
+    assert result.successful_records == 100
+    # Two chunks of ten, plus the action that closed the second one
+    assert first_request_after[0] <= 21
+    assert client.max_in_flight <= 2
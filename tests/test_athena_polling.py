@@ -0,0 +1,58 @@
+import asyncio
+import itertools
+import pytest
+from fakes import FakeAthenaClient
+from etl_athena_to_es_dynamodb.athena_source import AthenaDataSource
+from etl_athena_to_es_dynamodb.exceptions import DataSourceError
+from etl_athena_to_es_dynamodb.models import AWSConfig, AthenaConfig
+
+
+def make_source(athena, **config):
+    source = AthenaDataSource(
+        AWSConfig(region='eu-north-1'),
+        AthenaConfig(database='db', table='t', s3_output_location='s3://results/',
+                     poll_initial_interval=0.001, poll_max_interval=0.004, **config)
+    )
+    source._athena_client = athena
+    return source
+
+
+def test_poll_intervals_back_off_to_the_cap():
+    source = make_source(FakeAthenaClient([], []), poll_backoff_multiplier=2)
+
+    assert list(itertools.islice(source._poll_intervals(), 5)) == [0.001, 0.002, 0.004, 0.004, 0.004]
+
+
+def test_wait_returns_query_execution_after_running_polls():
+    athena = FakeAthenaClient([], [], polls_until_done=3)
+    source = make_source(athena)
+
+    query_execution = source._wait_for_query_completion('qid-1')
+
+    assert query_execution['Status']['State'] == 'SUCCEEDED'
+    assert athena.polls['qid-1'] == 4
+
+
+def test_wait_times_out_with_configured_timeout():
+    source = make_source(FakeAthenaClient([], [], polls_until_done=10**6), query_timeout_seconds=0.02)
+
+    with pytest.raises(DataSourceError, match='timeout'):
+        source._wait_for_query_completion('qid-1')
+
+
+def test_wait_raises_on_failed_query():
+    source = make_source(FakeAthenaClient([], [], final_state='FAILED'))
+
+    with pytest.raises(DataSourceError, match='failed'):
+        source._wait_for_query_completion('qid-1')
+
+
+def test_async_wait_awaits_many_queries_concurrently():
+    athena = FakeAthenaClient([], [], polls_until_done=2)
+    source = make_source(athena)
+    ids = [f'qid-{i}' for i in range(20)]
+
+    results = asyncio.run(source.wait_for_queries_async(ids))
+
+    assert [r['QueryExecutionId'] for r in results] == ids
+    assert all(athena.polls[qid] == 3 for qid in ids)
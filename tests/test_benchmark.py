@@ -0,0 +1,57 @@
+import json
+from benchmarks.dataset import generate_rows
+from benchmarks.fakes import draw
+from benchmarks.run_pipeline import BenchmarkScenario, run_benchmark, compare
+
+VEHICLE_FIELDS = [
+    'orgno', 'vehicle_status', 'vehicle_type', 'brand', 'vehicle_year', 'model_year', 'last_ownership_change',
+    'pre_registered_date', 'first_in_traffic_date', 'first_on_roads_date', 'next_inspection_due_date',
+    'registered_for_commercial_traffic', 'imported', 'leasing', 'purchased_on_credit', 'odometer_reading',
+    'odometer_unit', 'fuel_type_1', 'fuel_type_2', 'fuel_type_3'
+]
+
+SCENARIO = BenchmarkScenario(
+    organizations=120, batch_size=40, max_workers=2, athena_query_seconds=0.0, s3_read_chunk_size=64 * 1024,
+    s3_latency=0.0, opensearch_latency=0.0, opensearch_jitter=0.0, opensearch_bulk_max_actions=50,
+    opensearch_reject_rate=0.05, opensearch_request_reject_rate=0.1, opensearch_retry_base_delay=0.001,
+    dynamodb_latency=0.0, dynamodb_jitter=0.0, dynamodb_unprocessed_rate=0.05
+)
+
+
+def test_rows_have_the_shape_of_the_source_query():
+    rows = list(generate_rows(50, seed=7))
+
+    assert rows == list(generate_rows(50, seed=7))
+    for orgno, child_data in rows:
+        vehicles = json.loads(child_data)
+        assert vehicles
+        for vehicle in vehicles:
+            assert list(vehicle) == VEHICLE_FIELDS
+            assert vehicle['orgno'] == int(orgno)
+
+
+def test_faults_depend_on_the_key_and_attempt_not_on_call_order():
+    assert draw(3, 'reject', 'doc-1', 1) == draw(3, 'reject', 'doc-1', 1)
+    assert draw(3, 'reject', 'doc-1', 1) != draw(3, 'reject', 'doc-1', 2)
+
+
+def test_benchmark_retries_injected_faults_and_reports_per_stage():
+    report = run_benchmark(SCENARIO)
+
+    assert report['records'] == 120
+    assert report['faults']['opensearch_rejected_actions'] > 0
+    assert report['faults']['opensearch_rejected_requests'] > 0
+    assert report['faults']['dynamodb_unprocessed_items'] > 0
+    for sink_name in ('OpenSearchDataSink', 'DynamoDBDataSink'):
+        assert report['sinks'][sink_name]['failed_records'] == 0
+        latency = report['batch_latency_seconds'][sink_name]
+        assert latency['count'] == 3
+        assert 0 < latency['p50'] <= latency['p99'] <= latency['max']
+    assert report['records_per_second'] > 0
+    assert report['peak_rss_mb'] > 0
+    assert report['cpu_seconds']['total'] > 0
+
+    again = run_benchmark(SCENARIO)
+    assert again['faults'] == report['faults']
+    assert again['documents'] == report['documents']
+    assert any(line.startswith('records_per_second') for line in compare(again, report))
@@ -0,0 +1,55 @@
+import pytest
+from fakes import ListDataSource, RecordingSink
+from etl_athena_to_es_dynamodb.batch_processor import SimpleBatchProcessor
+from etl_athena_to_es_dynamodb.change_detector import ChangeDetectingBatchProcessor
+from etl_athena_to_es_dynamodb.exceptions import ConfigurationError
+from etl_athena_to_es_dynamodb.models import (AWSConfig, AthenaConfig, BatchConfig, ChangeDetectionConfig,
+                                              DocumentConfig, OpenSearchConfig)
+from etl_athena_to_es_dynamodb.pipeline import DataPipeline
+from etl_athena_to_es_dynamodb.pipeline_factory import PipelineFactory
+
+ROWS = [{'orgno': str(i), 'child_data': f'[{{"brand": "b{i}"}}]'} for i in range(10)]
+
+
+def run(tmp_path, rows, sink):
+    processor = ChangeDetectingBatchProcessor(
+        SimpleBatchProcessor(),
+        ChangeDetectionConfig(digest_store_path=str(tmp_path / 'digests.sqlite3')),
+        namespace='test'
+    )
+    pipeline = DataPipeline(ListDataSource(rows), [sink], processor, BatchConfig(batch_size=4))
+    return pipeline.execute('SELECT 1')
+
+
+def test_second_run_only_forwards_changed_records(tmp_path):
+    run(tmp_path, ROWS, RecordingSink())
+
+    changed_rows = [dict(row) for row in ROWS]
+    changed_rows[3]['child_data'] = '[{"brand": "changed"}]'
+    sink = RecordingSink()
+    results = run(tmp_path, changed_rows + [{'orgno': '99', 'child_data': '[]'}], sink)
+
+    assert sorted(r.data['orgno'] for r in sink.received) == ['3', '99']
+    assert results['batch_processor']['change_detection']['skipped_records'] == 9
+    assert results['batch_processor']['change_detection']['changed_records'] == 2
+
+
+def test_digests_of_failed_batches_are_not_committed(tmp_path):
+    results = run(tmp_path, ROWS, RecordingSink(fail=True))
+    assert results['batch_processor']['change_detection']['committed_records'] == 0
+
+    sink = RecordingSink()
+    run(tmp_path, ROWS, sink)
+    assert len(sink.received) == len(ROWS)
+
+
+@pytest.mark.parametrize('create', [PipelineFactory.create_pipeline, PipelineFactory.create_async_pipeline])
+def test_change_detection_is_rejected_for_blue_green_loads(tmp_path, create):
+    with pytest.raises(ConfigurationError, match='blue/green'):
+        create(
+            AWSConfig(region='eu-north-1'),
+            AthenaConfig(database='db', table='t', s3_output_location='s3://results/'),
+            DocumentConfig(document_type='parent', child_relation_type='owner'),
+            opensearch_config=OpenSearchConfig(endpoint='localhost', index_name='idx', blue_green_load=True),
+            change_detection_config=ChangeDetectionConfig(digest_store_path=str(tmp_path / 'digests.sqlite3'))
+        )
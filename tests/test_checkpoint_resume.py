@@ -0,0 +1,122 @@
+import pytest
+from fakes import FakeAthenaClient, FakeS3Client, RecordingSink, to_athena_csv
+from etl_athena_to_es_dynamodb.athena_source import AthenaDataSource
+from etl_athena_to_es_dynamodb.batch_processor import SimpleBatchProcessor
+from etl_athena_to_es_dynamodb.checkpoint import FileCheckpointStore, RunCheckpointer
+from etl_athena_to_es_dynamodb.models import AWSConfig, AthenaConfig, BatchConfig
+from etl_athena_to_es_dynamodb.pipeline import DataPipeline
+from etl_athena_to_es_dynamodb.transform_pool import ProcessPoolTransformProcessor
+from etl_athena_to_es_dynamodb.exceptions import BatchProcessingError, ConfigurationError, DataPipelineError
+
+ROWS = [[str(i)] for i in range(23)]
+QUERY = 'SELECT orgno FROM t'
+
+
+class SearchSink(RecordingSink):
+    """Raises on the given batch numbers, like a sink whose cluster went away"""
+
+    def __init__(self, raise_on=()):
+        super().__init__()
+        self.raise_on = set(raise_on)
+        self.calls = 0
+
+    def upsert_batch(self, records):
+        self.calls += 1
+        if self.calls in self.raise_on:
+            raise RuntimeError('connection lost')
+        return super().upsert_batch(records)
+
+
+class TableSink(RecordingSink):
+    pass
+
+
+class CrashingProcessor(SimpleBatchProcessor):
+    """Dies after yielding the given number of batches"""
+
+    def __init__(self, batches):
+        super().__init__()
+        self.batches = batches
+
+    def process_record_batches(self, batch_iterator, batch_size):
+        for index, batch in enumerate(super().process_record_batches(batch_iterator, batch_size)):
+            if index == self.batches:
+                raise BatchProcessingError('worker died')
+            yield batch
+
+
+@pytest.fixture
+def athena():
+    return FakeAthenaClient(['orgno'], ROWS)
+
+
+@pytest.fixture
+def s3():
+    client = FakeS3Client()
+    client.put_object(Bucket='results', Key='query.csv', Body=to_athena_csv(['orgno'], ROWS))
+    return client
+
+
+def run(athena, s3, tmp_path, sinks, resume=False, processor=None):
+    source = AthenaDataSource(
+        AWSConfig(region='eu-north-1'),
+        AthenaConfig(database='db', table='t', s3_output_location='s3://results/', s3_read_concurrency=1)
+    )
+    source._athena_client = athena
+    source._s3_client = s3
+    checkpointer = RunCheckpointer(FileCheckpointStore(str(tmp_path / 'checkpoints.json')), resume=resume)
+    pipeline = DataPipeline(source, sinks, processor or SimpleBatchProcessor(),
+                            BatchConfig(batch_size=5, max_workers=2), checkpointer=checkpointer)
+    return pipeline.execute(QUERY)
+
+
+def orgnos(sink):
+    return [record.data['orgno'] for record in sink.received]
+
+
+def test_resume_continues_each_sink_where_it_left_off(athena, s3, tmp_path):
+    search, table = SearchSink(raise_on={3}), TableSink()
+    run(athena, s3, tmp_path, [search, table])
+
+    checkpoint = FileCheckpointStore(str(tmp_path / 'checkpoints.json')).load(RunCheckpointer.run_key(QUERY))
+    assert checkpoint.sink_offsets == {'SearchSink': 10, 'TableSink': 23}
+    assert checkpoint.source_state['query_execution_id'] == 'qid-1'
+
+    resumed_search, resumed_table = SearchSink(), TableSink()
+    results = run(athena, s3, tmp_path, [resumed_search, resumed_table], resume=True)
+
+    assert len(athena.started_queries) == 1  # The checkpointed execution was read again
+    assert orgnos(resumed_search) == [str(i) for i in range(10, 23)]
+    assert resumed_table.received == []
+    assert results['sinks']['TableSink']['total_records'] == 0
+    assert FileCheckpointStore(str(tmp_path / 'checkpoints.json')).load(RunCheckpointer.run_key(QUERY)) is None
+
+
+def test_crashed_run_resumes_without_gaps_or_duplicates(athena, s3, tmp_path):
+    first = TableSink()
+    with pytest.raises(DataPipelineError):
+        run(athena, s3, tmp_path, [first], processor=CrashingProcessor(batches=2))
+
+    resumed = TableSink()
+    run(athena, s3, tmp_path, [resumed], resume=True)
+
+    assert orgnos(first) + orgnos(resumed) == [row[0] for row in ROWS]
+    assert len(athena.started_queries) == 1
+
+
+def test_run_without_resume_discards_the_checkpoint(athena, s3, tmp_path):
+    run(athena, s3, tmp_path, [SearchSink(raise_on={1})])
+
+    sink = SearchSink()
+    run(athena, s3, tmp_path, [sink])
+
+    assert orgnos(sink) == [row[0] for row in ROWS]
+    assert len(athena.started_queries) == 2
+
+
+def test_checkpointing_rejects_unordered_processors(tmp_path):
+    processor = ProcessPoolTransformProcessor(SimpleBatchProcessor(), workers=1, ordered=False)
+    checkpointer = RunCheckpointer(FileCheckpointStore(str(tmp_path / 'checkpoints.json')))
+
+    with pytest.raises(ConfigurationError):
+        DataPipeline(None, [TableSink()], processor, BatchConfig(), checkpointer=checkpointer)
@@ -0,0 +1,124 @@
+import pytest
+from fakes import FakeOpenSearchClient, FakeDynamoDBResource, ListDataSource, RecordingSink
+from etl_athena_to_es_dynamodb.batch_processor import SimpleBatchProcessor
+from etl_athena_to_es_dynamodb.dead_letter import DeadLetterSpool, DeadLetterReplayer
+from etl_athena_to_es_dynamodb.dynamodb_sink import DynamoDBDataSink
+from etl_athena_to_es_dynamodb.models import (AWSConfig, BatchConfig, OpenSearchConfig, DynamoDBConfig,
+                                              DocumentConfig, DataRecord, FailedRecord)
+from etl_athena_to_es_dynamodb.opensearch_sink import OpenSearchDataSink
+from etl_athena_to_es_dynamodb.pipeline import DataPipeline
+
+ROWS = [{'orgno': str(i), 'child_data': f'[{{"regno": "R{i}"}}]'} for i in range(12)]
+
+
+def opensearch_sink(client, document_type='parent'):
+    sink = OpenSearchDataSink(OpenSearchConfig(endpoint='localhost', index_name='idx'),
+                              DocumentConfig(document_type=document_type, child_relation_type='vehicle'))
+    sink._client = client
+    return sink
+
+
+def test_failed_records_are_spooled_and_replayed(tmp_path):
+    spool = DeadLetterSpool(str(tmp_path / 'dlq'))
+    sink = opensearch_sink(FakeOpenSearchClient(fail_ids={'3', '7'}))
+    results = DataPipeline(ListDataSource(ROWS), [sink], SimpleBatchProcessor(),
+                           BatchConfig(batch_size=5, max_workers=1), dead_letters=spool).execute('SELECT 1')
+
+    assert results['sinks']['OpenSearchDataSink']['dead_lettered_records'] == 2
+    spooled = [f for path in spool.segments('OpenSearchDataSink') for f in spool.read(path)]
+    assert [f.data for f in spooled] == [ROWS[3], ROWS[7]]
+    assert 'mapper_parsing_exception' in spooled[0].error
+
+    client = FakeOpenSearchClient()
+    replayer = DeadLetterReplayer(DeadLetterSpool(str(tmp_path / 'dlq')),
+                                  {'OpenSearchDataSink': opensearch_sink(client)}, batch_size=100)
+    replayed = replayer.replay()
+    replayer.close()
+
+    assert sorted(client.documents) == ['3', '7']
+    assert replayed['OpenSearchDataSink'][0].successful_records == 2
+    assert replayer.spool.sink_names() == []
+
+
+def test_failed_child_fails_its_parent_record():
+    sink = opensearch_sink(FakeOpenSearchClient(), document_type='child')
+    records = [DataRecord.from_dict(row) for row in ROWS[:3]]
+    child_id = sink.child_id('1', {'regno': 'R1'})
+    sink._client.fail_ids = {child_id}
+
+    result = sink.upsert_batch(records)
+
+    assert [failure.data['orgno'] for failure in result.failures] == ['1']
+
+
+def test_records_failing_again_are_respooled(tmp_path):
+    spool = DeadLetterSpool(str(tmp_path / 'dlq'))
+    batch_sink = DynamoDBDataSink(
+        AWSConfig(region='eu-north-1'),
+        DynamoDBConfig(table_name='vehicles', overwrite_by_pkeys=['orgno'], batch_write_max_retries=0,
+                       batch_write_base_delay=0.001),
+        DocumentConfig(document_type='parent', child_relation_type='vehicle')
+    )
+    batch_sink._resource = FakeDynamoDBResource(unprocessed_per_call=[25])
+    result = batch_sink.upsert_batch([DataRecord.from_dict(row) for row in ROWS[:2]])
+    spool.write('DynamoDBDataSink', result.failures)
+    spool.close()
+    first_segments = spool.segments('DynamoDBDataSink')
+
+    batch_sink._resource = FakeDynamoDBResource(unprocessed_per_call=[25])
+    replayer = DeadLetterReplayer(spool, {'DynamoDBDataSink': batch_sink}, batch_size=10)
+    replayer.replay()
+    replayer.close()
+
+    segments = spool.segments('DynamoDBDataSink')
+    assert len(segments) == 1 and segments != first_segments
+    assert [f.data['orgno'] for f in spool.read(segments[0])] == ['0', '1']
+
+
+def test_segment_of_a_crashed_run_is_readable_up_to_its_torn_tail(tmp_path):
+    spool = DeadLetterSpool(str(tmp_path / 'dlq'))
+    spool.write('OpenSearchDataSink', [FailedRecord(data=row, error='boom') for row in ROWS[:3]])
+    # Snapshot the flushed but unfinished segment, as a crash would leave it, plus a torn write
+    with open(spool.segments('OpenSearchDataSink')[0], 'rb') as f:
+        crashed = f.read()
+    spool.close()
+    path = str(tmp_path / 'crashed.ndjson.gz')
+    with open(path, 'wb') as f:
+        f.write(crashed + b'\x1f\x8b\x08garbage')
+
+    assert [f.data['orgno'] for f in spool.read(path)] == ['0', '1', '2']
+
+
+def test_replay_claims_segments_and_runs_within_prepare_and_finalize(tmp_path):
+    class LifecycleSink(RecordingSink):
+        def __init__(self, crash=False):
+            super().__init__()
+            self.crash = crash
+            self.calls = []
+
+        def prepare(self):
+            self.calls.append('prepare')
+
+        def upsert_batch(self, records):
+            if self.crash:
+                raise OSError('replay host died')
+            return super().upsert_batch(records)
+
+        def finalize(self, succeeded):
+            self.calls.append(('finalize', succeeded))
+
+    spool = DeadLetterSpool(str(tmp_path / 'dlq'))
+    spool.write('OpenSearchDataSink', [FailedRecord(data=row, error='boom') for row in ROWS[:3]])
+    spool.close()
+
+    crashing = LifecycleSink(crash=True)
+    with pytest.raises(OSError):
+        DeadLetterReplayer(spool, {'OpenSearchDataSink': crashing}, batch_size=10).replay()
+    assert crashing.calls == ['prepare', ('finalize', False)]
+    assert spool.segments('OpenSearchDataSink') == [] and len(spool.claimed('OpenSearchDataSink')) == 1
+
+    sink = LifecycleSink()
+    DeadLetterReplayer(spool, {'OpenSearchDataSink': sink}, batch_size=10).replay()
+    assert sink.calls == ['prepare', ('finalize', True)]
+    assert [record.data['orgno'] for record in sink.received] == ['0', '1', '2']
+    assert spool.sink_names() == []
@@ -0,0 +1,47 @@
+from fakes import FakeDynamoDBResource
+from etl_athena_to_es_dynamodb.dynamodb_sink import DynamoDBDataSink
+from etl_athena_to_es_dynamodb.models import AWSConfig, DynamoDBConfig, DocumentConfig, DataRecord
+
+
+def make_sink(resource, **config):
+    sink = DynamoDBDataSink(
+        AWSConfig(region='eu-north-1'),
+        DynamoDBConfig(table_name='vehicles', batch_write_base_delay=0.001, **config),
+        DocumentConfig(document_type='parent', child_relation_type='vehicle')
+    )
+    sink._resource = resource
+    return sink
+
+
+def records(orgnos):
+    return [DataRecord.from_dict({'orgno': str(o), 'child_data': f'[{{"brand": "b{o}"}}]'}) for o in orgnos]
+
+
+def test_auto_mode_uses_batch_write_when_overwrite_keys_are_set():
+    assert make_sink(FakeDynamoDBResource(), overwrite_by_pkeys=['orgno']).use_batch_write
+    assert not make_sink(FakeDynamoDBResource()).use_batch_write
+
+
+def test_batch_write_chunks_and_retries_unprocessed_items():
+    resource = FakeDynamoDBResource(unprocessed_per_call=[5, 2])
+    sink = make_sink(resource, overwrite_by_pkeys=['orgno'])
+
+    result = sink.upsert_batch(records(range(60)))
+
+    assert (result.successful_records, result.failed_records) == (60, 0)
+    assert len(resource.items) == 60
+    assert resource.items[7]['child_data'] == [{'brand': 'b7'}]
+    assert resource.batch_calls[:3] == [25, 5, 2]
+
+
+def test_duplicate_keys_are_collapsed_and_exhausted_retries_count_as_failed():
+    resource = FakeDynamoDBResource(unprocessed_per_call=[3, 3, 3])
+    sink = make_sink(resource, write_mode='batch_write', batch_write_max_retries=2)
+
+    result = sink.upsert_batch(records([1, 2, 3, 3, 4, 'x']))
+
+    # 'x' is invalid; keys 2, 3 (two records) and 4 stay unprocessed
+    assert result.total_records == 6
+    assert result.failed_records == 1 + 4
+    assert result.successful_records == 1
+    assert len(result.errors) == 2
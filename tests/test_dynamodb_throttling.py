@@ -0,0 +1,90 @@
+from fakes import FakeDynamoDBClient, FakeDynamoDBResource
+from etl_athena_to_es_dynamodb.dynamodb_sink import DynamoDBDataSink
+from etl_athena_to_es_dynamodb.models import AWSConfig, DynamoDBConfig, DocumentConfig, DataRecord
+from etl_athena_to_es_dynamodb.rate_limiter import AdaptiveRateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def make_sink(**config):
+    return DynamoDBDataSink(
+        AWSConfig(region='eu-north-1'),
+        DynamoDBConfig(table_name='vehicles', adaptive_throttling=True, initial_write_rate=1000, **config),
+        DocumentConfig(document_type='parent', child_relation_type='vehicle')
+    )
+
+
+def records(n):
+    return [DataRecord.from_dict({'orgno': str(i)}) for i in range(n)]
+
+
+def test_limiter_paces_requests_and_backs_off_multiplicatively():
+    clock = FakeClock()
+    limiter = AdaptiveRateLimiter(initial_rate=10, min_rate=1, max_rate=100, clock=clock, sleep=clock.sleep)
+
+    for _ in range(30):
+        limiter.acquire(1)
+    assert 1.9 < clock.now < 2.1
+
+    limiter.on_throttle()
+    limiter.on_throttle()  # within the cooldown, counted but not compounded
+    assert limiter.rate == 5
+    assert limiter.snapshot()['throttle_count'] == 2
+
+    for _ in range(50):
+        limiter.on_success(1)
+    assert 5 < limiter.rate <= 100
+
+
+def test_throttled_updates_are_retried_instead_of_failed():
+    client = FakeDynamoDBClient(throttle_first=3)
+    sink = make_sink()
+    sink._client = client
+
+    result = sink.upsert_batch(records(20))
+
+    assert (result.successful_records, result.failed_records) == (20, 0)
+    assert result.metrics['throttle_count'] == 3
+    assert result.metrics['current_rate'] < 1000
+    assert result.metrics['consumed_capacity_units'] == 40
+
+
+def test_transient_server_errors_are_retried_with_botocore_retries_off():
+    client = FakeDynamoDBClient(errors_first=2)
+    sink = make_sink(batch_write_base_delay=0.001)
+    sink._client = client
+
+    result = sink.upsert_batch(records(1))
+
+    assert (result.successful_records, result.failed_records) == (1, 0)
+    assert client.errors == 2
+    assert result.metrics['throttle_count'] == 0
+
+
+def test_throttles_beyond_the_retry_budget_fail_the_record():
+    sink = make_sink(throttle_max_retries=1)
+    sink._client = FakeDynamoDBClient(throttle_first=2)
+
+    result = sink.upsert_batch(records(2))
+
+    assert (result.successful_records, result.failed_records) == (1, 1)
+
+
+def test_unprocessed_batch_items_count_as_throttles():
+    resource = FakeDynamoDBResource(unprocessed_per_call=[4])
+    sink = make_sink(write_mode='batch_write', batch_write_base_delay=0.001)
+    sink._resource = resource
+
+    result = sink.upsert_batch(records(10))
+
+    assert result.successful_records == 10
+    assert result.metrics['throttle_count'] == 1
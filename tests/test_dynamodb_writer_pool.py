@@ -0,0 +1,43 @@
+import time
+from fakes import FakeDynamoDBClient
+from etl_athena_to_es_dynamodb.dynamodb_sink import DynamoDBDataSink
+from etl_athena_to_es_dynamodb.models import AWSConfig, DynamoDBConfig, DocumentConfig, DataRecord
+
+
+class SlowClient(FakeDynamoDBClient):
+    def update_item(self, **kwargs):
+        time.sleep(0.005)
+        return super().update_item(**kwargs)
+
+
+def make_sink(client, write_concurrency):
+    sink = DynamoDBDataSink(
+        AWSConfig(region='eu-north-1'),
+        DynamoDBConfig(table_name='vehicles', write_concurrency=write_concurrency),
+        DocumentConfig(document_type='parent', child_relation_type='vehicle')
+    )
+    sink._client = client
+    return sink
+
+
+def test_concurrent_updates_merge_attributes_through_the_shared_client():
+    client = SlowClient()
+    sink = make_sink(client, write_concurrency=8)
+    records = [DataRecord.from_dict({'orgno': str(i), 'child_data': '[{"brand": "Volvo"}]'}) for i in range(100)]
+
+    result = sink.upsert_batch(records)
+    sink.close()
+
+    assert (result.successful_records, result.failed_records) == (100, 0)
+    assert client.items[42] == {'orgno': 42, 'child_data': [{'brand': 'Volvo'}]}
+    assert len(client.threads) > 1
+
+
+def test_serial_mode_stays_on_the_calling_thread():
+    client = FakeDynamoDBClient()
+    sink = make_sink(client, write_concurrency=1)
+
+    sink.upsert_batch([DataRecord.from_dict({'orgno': '1'})])
+
+    assert sink._executor is None
+    assert len(client.threads) == 1
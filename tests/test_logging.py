@@ -0,0 +1,76 @@
+import json
+import queue
+import logging
+import pytest
+import etl_athena_to_es_dynamodb.logging_setup as logging_setup
+from etl_athena_to_es_dynamodb.logging_setup import configure_logging, DroppingQueueHandler
+from etl_athena_to_es_dynamodb.models import LoggingConfig, DocumentConfig, Record
+from etl_athena_to_es_dynamodb.opensearch_actions import OpenSearchActionBuilder
+
+
+class CountingValue:
+    """A payload value that counts how often it is formatted"""
+
+    def __init__(self):
+        self.formatted = 0
+
+    def __repr__(self):
+        self.formatted += 1
+        return 'value'
+
+
+@pytest.fixture(autouse=True)
+def restore_logging():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+    logging_setup._payload_sample_rate = 0.0
+
+
+def build_actions(value):
+    builder = OpenSearchActionBuilder(DocumentConfig(document_type='parent', child_relation_type='vehicle'))
+    records = [Record({'orgno': str(i), 'brand': value}) for i in range(5)]
+    return list(builder.iter_actions(records, 'idx', {}))
+
+
+def test_payloads_are_formatted_only_when_sampled(tmp_path):
+    value = CountingValue()
+    session = configure_logging(LoggingConfig(level='DEBUG', file=str(tmp_path / 'etl.log')))
+    build_actions(value)
+    assert value.formatted == 0
+
+    configure_logging(LoggingConfig(level='DEBUG', file=str(tmp_path / 'etl.log'), payload_sample_rate=1.0))
+    build_actions(value)
+    session.stop()
+    assert value.formatted == 5
+
+
+def test_production_mode_writes_json_lines_from_a_background_thread(tmp_path):
+    path = tmp_path / 'etl.log'
+    session = configure_logging(LoggingConfig(mode='production', file=str(path)))
+    logging.getLogger('etl').info("Batch completed for %s", 'OpenSearchDataSink')
+    session.stop()
+
+    [entry] = [json.loads(line) for line in path.read_text().splitlines()]
+    assert entry['message'] == 'Batch completed for OpenSearchDataSink'
+    assert entry['level'] == 'INFO' and entry['logger'] == 'etl'
+
+
+def test_full_log_queue_drops_instead_of_blocking():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    log = logging.getLogger('etl.dropping')
+    log.propagate = False
+    log.addHandler(handler)
+    try:
+        for i in range(3):
+            log.warning("record %d", i)
+    finally:
+        log.removeHandler(handler)
+
+    assert handler.dropped == 2
+    assert handler.queue.get_nowait().getMessage() == 'record 0'
@@ -0,0 +1,77 @@
+from fakes import FakeOpenSearchClient
+from etl_athena_to_es_dynamodb.bulk_backpressure import BulkBackpressureController
+from etl_athena_to_es_dynamodb.models import DataRecord, OpenSearchConfig, DocumentConfig
+from etl_athena_to_es_dynamodb.opensearch_sink import OpenSearchDataSink
+
+RECORDS = [DataRecord(data={'orgno': str(i), 'name': f'n{i}'}) for i in range(20)]
+
+
+def make_sink(client, **overrides):
+    config = OpenSearchConfig(endpoint='localhost', index_name='idx', bulk_retry_base_delay=0.001, **overrides)
+    sink = OpenSearchDataSink(config, DocumentConfig(document_type='parent', child_relation_type='owner'))
+    sink._client = client
+    return sink
+
+
+def test_only_rejected_items_are_resent():
+    client = FakeOpenSearchClient(reject_attempts=1, fail_ids={'7'})
+    result = make_sink(client, bulk_max_actions=10).upsert_batch(RECORDS)
+
+    assert result.successful_records == 19
+    assert result.failed_records == 1
+    # Both chunks are resent once, and every id is sent exactly twice
+    assert len(client.requests) == 4
+    assert set(client.attempts.values()) == {2}
+    assert result.metrics['bulk_rejected_items'] == 20
+    assert result.metrics['bulk_retries'] == 2
+
+
+def test_whole_request_429_is_retried():
+    client = FakeOpenSearchClient(reject_requests=2)
+    result = make_sink(client).upsert_batch(RECORDS)
+    assert result.successful_records == 20
+    assert result.metrics['bulk_retries'] == 2
+
+
+def test_whole_request_429_past_max_retries_fails_the_records_it_carried():
+    client = FakeOpenSearchClient(reject_requests=100)
+    result = make_sink(client, bulk_max_retries=1).upsert_batch(RECORDS[:2])
+
+    assert result.failed_records == 2
+    assert [failure.data['orgno'] for failure in result.failures] == ['0', '1']
+
+
+def test_rejections_past_max_retries_count_as_failed():
+    client = FakeOpenSearchClient(reject_attempts=5)
+    result = make_sink(client, bulk_max_retries=2).upsert_batch(RECORDS)
+    assert result.successful_records == 0
+    assert result.failed_records == 20
+
+
+def test_adaptive_sink_reports_controller_state():
+    client = FakeOpenSearchClient(reject_attempts=1)
+    result = make_sink(client, adaptive_bulk=True, bulk_max_actions=100, bulk_min_actions=5,
+                       bulk_concurrency=4).upsert_batch(RECORDS)
+    assert result.successful_records == 20
+    assert result.metrics['bulk_size'] < 100
+    assert result.metrics['bulk_concurrency'] == 3
+    assert result.metrics['rejection_rate'] == 0.5
+
+
+def test_controller_shrinks_on_rejection_and_grows_back():
+    now = [0.0]
+    controller = BulkBackpressureController(max_actions=100, min_actions=10, max_concurrency=4,
+                                            target_latency=1.0, clock=lambda: now[0])
+    controller.on_response(100, 30, 0.1)
+    assert (controller.bulk_size, controller.concurrency) == (50, 3)
+
+    controller.on_response(50, 10, 0.1)  # Within the cooldown: no second decrease
+    assert controller.bulk_size == 50
+
+    now[0] = 5.0
+    controller.on_response(50, 0, 2.0)  # Slow but clean: gentle size decrease only
+    assert (controller.bulk_size, controller.concurrency) == (40, 3)
+
+    for _ in range(BulkBackpressureController.GROW_CONCURRENCY_AFTER):
+        controller.on_response(40, 0, 0.1)
+    assert (controller.bulk_size, controller.concurrency) == (100, 4)
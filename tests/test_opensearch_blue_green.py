@@ -0,0 +1,88 @@
+import json
+import pytest
+from opensearchpy.exceptions import TransportError
+from fakes import FakeOpenSearchClient, ListDataSource
+from etl_athena_to_es_dynamodb.batch_processor import SimpleBatchProcessor
+from etl_athena_to_es_dynamodb.exceptions import DataSinkError
+from etl_athena_to_es_dynamodb.models import BatchConfig, OpenSearchConfig, DocumentConfig
+from etl_athena_to_es_dynamodb.opensearch_sink import OpenSearchDataSink
+from etl_athena_to_es_dynamodb.pipeline import DataPipeline
+
+
+def make_sink(tmp_path, client, **overrides):
+    mapping_path = tmp_path / 'mapping.json'
+    mapping_path.write_text(json.dumps({
+        'settings': {'index': {'number_of_replicas': 2, 'refresh_interval': '30s'}},
+        'mappings': {'properties': {'orgno': {'type': 'keyword'}}}
+    }))
+    config = OpenSearchConfig(endpoint='localhost', index_name='companies', blue_green_load=True,
+                              index_mapping_path=str(mapping_path),
+                              bulk_load_marker_path=str(tmp_path / 'bulk_load.json'), **overrides)
+    sink = OpenSearchDataSink(config, DocumentConfig(document_type='parent', child_relation_type='owner'))
+    sink._client = client
+    return sink
+
+
+def load(tmp_path, client, rows, **overrides):
+    sink = make_sink(tmp_path, client, **overrides)
+    DataPipeline(ListDataSource(rows), [sink], SimpleBatchProcessor(), BatchConfig()).execute('SELECT 1')
+
+
+def test_load_goes_to_new_generation_and_alias_moves_on_success(tmp_path):
+    client = FakeOpenSearchClient(strict_updates=True)
+    load(tmp_path, client, [{'orgno': '1'}])
+
+    [generation] = client.indices.aliases['companies']
+    assert generation.startswith('companies_v')
+    assert {action[1]['_index'] for request in client.requests for action in request['actions']} == {generation}
+    # Created for ingest, then given the mapping file's settings once live
+    assert client.indices.bodies[generation]['settings']['index.refresh_interval'] == '-1'
+    assert client.indices.bodies[generation]['mappings'] == {'properties': {'orgno': {'type': 'keyword'}}}
+    assert client.indices.settings[generation]['index.refresh_interval'] == '30s'
+    assert client.indices.settings[generation]['index.number_of_replicas'] == '2'
+
+
+def test_failed_load_is_discarded_and_alias_kept(tmp_path):
+    client = FakeOpenSearchClient(strict_updates=True)
+    load(tmp_path, client, [{'orgno': '1'}])
+    live = set(client.indices.aliases['companies'])
+
+    client.fail_ids = {'2'}
+    load(tmp_path, client, [{'orgno': '2'}])
+
+    assert client.indices.aliases['companies'] == live
+    assert set(client.indices.get(index='companies_v*')) == live
+
+
+def test_old_generations_are_pruned_by_retention(tmp_path):
+    client = FakeOpenSearchClient(strict_updates=True)
+    for _ in range(4):
+        load(tmp_path, client, [{'orgno': '1'}], index_retain_generations=1)
+
+    generations = sorted(client.indices.get(index='companies_v*'))
+    assert len(generations) == 2
+    assert client.indices.aliases['companies'] == {generations[-1]}
+
+
+def test_concrete_index_under_the_alias_name_fails_before_a_generation_is_created(tmp_path):
+    client = FakeOpenSearchClient(strict_updates=True)
+    client.indices.create(index='companies')
+    sink = make_sink(tmp_path, client)
+
+    with pytest.raises(DataSinkError, match='concrete index'):
+        sink.prepare()
+    assert client.indices.get(index='companies_v*') == {}
+
+
+def test_generation_is_deleted_when_promotion_fails(tmp_path):
+    client = FakeOpenSearchClient(strict_updates=True)
+    sink = make_sink(tmp_path, client)
+    sink.prepare()
+
+    def failing_update_aliases(body, **kwargs):
+        raise TransportError(500, 'alias update failed', {})
+    client.indices.update_aliases = failing_update_aliases
+
+    with pytest.raises(TransportError):
+        sink.finalize(True)
+    assert client.indices.get(index='companies_v*') == {}
@@ -0,0 +1,55 @@
+from fakes import FakeOpenSearchClient
+from opensearchpy.serializer import JSONSerializer
+from etl_athena_to_es_dynamodb.bulk_chunker import BulkChunker
+from etl_athena_to_es_dynamodb.models import DataRecord, OpenSearchConfig, DocumentConfig
+from etl_athena_to_es_dynamodb.opensearch_sink import OpenSearchDataSink
+
+
+def actions(count, padding=0):
+    return [{'_op_type': 'update', '_index': 'idx', '_id': str(i), 'doc': {'pad': 'x' * padding}}
+            for i in range(count)]
+
+
+def test_chunks_respect_action_and_byte_limits():
+    chunker = BulkChunker(JSONSerializer(), max_actions=10, max_bytes=2000)
+    chunks = list(chunker.chunks(actions(50, padding=300)))
+
+    assert sum(len(chunk.actions) for chunk in chunks) == 50
+    assert all(len(chunk.actions) <= 10 and chunk.size_bytes <= 2000 for chunk in chunks)
+    assert all(len(chunk.body) == chunk.size_bytes for chunk in chunks)
+    assert [a['_id'] for chunk in chunks for a in chunk.actions] == [str(i) for i in range(50)]
+
+
+def test_oversized_action_is_sent_alone():
+    chunker = BulkChunker(JSONSerializer(), max_actions=10, max_bytes=1024)
+    chunks = list(chunker.chunks(actions(1) + actions(1, padding=5000) + actions(1)))
+    assert [len(chunk.actions) for chunk in chunks] == [1, 1, 1]
+
+
+def test_sink_splits_batch_into_capped_bulk_requests():
+    config = OpenSearchConfig(endpoint='localhost', index_name='idx', bulk_max_actions=4, bulk_max_bytes=100_000)
+    sink = OpenSearchDataSink(config, DocumentConfig(document_type='parent', child_relation_type='owner'))
+    sink._client = FakeOpenSearchClient(fail_ids={'3'})
+
+    records = [DataRecord(data={'orgno': str(i), 'name': f'n{i}'}) for i in range(10)]
+    result = sink.upsert_batch(records)
+
+    assert [len(request['actions']) for request in sink._client.requests] == [4, 4, 2]
+    assert result.successful_records == 9
+    assert result.failed_records == 1
+    assert result.metrics['bulk_requests'] == 3
+    assert result.metrics['bulk_actions'] == 10
+
+
+def test_parallel_bulk_keeps_concurrency_bounded():
+    config = OpenSearchConfig(endpoint='localhost', index_name='idx', bulk_max_actions=5, bulk_concurrency=3)
+    sink = OpenSearchDataSink(config, DocumentConfig(document_type='child', child_relation_type='brand'))
+    client = sink._client = FakeOpenSearchClient(latency=0.02)
+
+    records = [DataRecord(data={'orgno': str(i), 'child_data': '[{"brand": "a"}, {"brand": "b"}]'}) for i in range(20)]
+    result = sink.upsert_batch(records)
+    sink.close()
+
+    assert result.successful_records == 40
+    assert len(client.requests) == 8
+    assert 1 < client.max_in_flight <= 3
@@ -0,0 +1,59 @@
+import os
+from fakes import FakeOpenSearchClient, ListDataSource
+from etl_athena_to_es_dynamodb.batch_processor import SimpleBatchProcessor
+from etl_athena_to_es_dynamodb.models import BatchConfig, OpenSearchConfig, DocumentConfig
+from etl_athena_to_es_dynamodb.opensearch_sink import OpenSearchDataSink
+from etl_athena_to_es_dynamodb.pipeline import DataPipeline
+
+ORIGINAL = {'index.refresh_interval': '1s', 'index.number_of_replicas': '2'}
+
+
+def make_sink(tmp_path, client, **overrides):
+    config = OpenSearchConfig(endpoint='localhost', index_name='idx',
+                              bulk_load_marker_path=str(tmp_path / 'bulk_load.json'), **overrides)
+    sink = OpenSearchDataSink(config, DocumentConfig(document_type='parent', child_relation_type='owner'))
+    sink._client = client
+    return sink
+
+
+def make_client():
+    client = FakeOpenSearchClient()
+    client.indices.settings['idx'] = dict(ORIGINAL)
+    return client
+
+
+def test_pipeline_applies_ingest_profile_and_restores_it(tmp_path):
+    client = make_client()
+    sink = make_sink(tmp_path, client, bulk_load_mode=True, bulk_load_force_merge_segments=1)
+    seen_during_load = []
+    upsert = sink.upsert_batch
+    sink.upsert_batch = lambda records: seen_during_load.append(dict(client.indices.settings['idx'])) or upsert(records)
+
+    DataPipeline(ListDataSource([{'orgno': '1'}]), [sink], SimpleBatchProcessor(), BatchConfig()).execute('SELECT 1')
+
+    assert seen_during_load[0]['index.refresh_interval'] == '-1'
+    assert seen_during_load[0]['index.number_of_replicas'] == '0'
+    assert client.indices.settings['idx'] == ORIGINAL
+    assert ('forcemerge', 'idx', 1) in client.indices.calls
+    assert not os.path.exists(tmp_path / 'bulk_load.json')
+
+
+def test_interrupted_bulk_load_is_restored_by_the_next_run(tmp_path):
+    client = make_client()
+    make_sink(tmp_path, client, bulk_load_mode=True).prepare()  # Process dies before finalize
+    assert client.indices.settings['idx']['index.refresh_interval'] == '-1'
+
+    # A second bulk load keeps the saved originals instead of the ingest profile
+    sink = make_sink(tmp_path, client, bulk_load_mode=True)
+    sink.prepare()
+    sink.finalize(True)
+    assert client.indices.settings['idx'] == ORIGINAL
+
+
+def test_regular_run_restores_leftover_settings(tmp_path):
+    client = make_client()
+    make_sink(tmp_path, client, bulk_load_mode=True).prepare()
+
+    make_sink(tmp_path, client).prepare()
+    assert client.indices.settings['idx'] == ORIGINAL
+    assert not os.path.exists(tmp_path / 'bulk_load.json')
@@ -0,0 +1,99 @@
+import json
+from opensearchpy.exceptions import TransportError
+from fakes import FakeOpenSearchClient
+from etl_athena_to_es_dynamodb.models import DataRecord, OpenSearchConfig, DocumentConfig
+from etl_athena_to_es_dynamodb.opensearch_sink import OpenSearchDataSink
+
+
+def make_sink(client, **document_overrides):
+    document_config = DocumentConfig(document_type='child', child_relation_type='vehicle', **document_overrides)
+    sink = OpenSearchDataSink(OpenSearchConfig(endpoint='localhost', index_name='idx'), document_config)
+    sink._client = client
+    return sink
+
+
+def record(orgno, children):
+    return DataRecord(data={'orgno': orgno, 'child_data': json.dumps(children)})
+
+
+def test_rerun_updates_the_same_child_documents():
+    client = FakeOpenSearchClient()
+    batch = [record('1', [{'regno': 'AB123', 'color': 'red'}, {'regno': 'CD456', 'color': 'blue'}])]
+    make_sink(client).upsert_batch(batch)
+    make_sink(client).upsert_batch(batch)
+
+    assert len(client.documents) == 2
+    assert all(doc_id.startswith('1:') for doc_id in client.documents)
+
+
+def test_child_id_fields_keep_the_id_when_other_fields_change():
+    sink = make_sink(FakeOpenSearchClient(), child_id_fields=['regno'])
+    assert sink.child_id('1', {'regno': 'AB123', 'color': 'red'}) == sink.child_id('1', {'regno': 'AB123', 'color': 'green'})
+    assert sink.child_id('1', {'regno': 'AB123'}) != sink.child_id('2', {'regno': 'AB123'})
+
+
+def test_stale_children_of_written_parents_are_deleted():
+    client = FakeOpenSearchClient()
+    make_sink(client, child_id_fields=['regno']).upsert_batch([
+        record('1', [{'regno': 'AB123'}, {'regno': 'CD456'}]),
+        record('2', [{'regno': 'EF789'}])
+    ])
+
+    result = make_sink(client, child_id_fields=['regno'], delete_stale_children=True).upsert_batch([
+        record('1', [{'regno': 'AB123'}])
+    ])
+
+    remaining = sorted(source['doc']['regno'] for source in client.documents.values())
+    assert remaining == ['AB123', 'EF789']
+    assert result.metrics['stale_children_deleted'] == 1
+    assert client.delete_calls[0]['routing'] == '1'
+
+
+def test_parents_with_failed_children_are_not_cleaned_up():
+    client = FakeOpenSearchClient()
+    make_sink(client, child_id_fields=['regno']).upsert_batch([record('1', [{'regno': 'AB123'}, {'regno': 'CD456'}])])
+
+    sink = make_sink(client, child_id_fields=['regno'], delete_stale_children=True)
+    client.fail_ids = {sink.child_id('1', {'regno': 'AB123'})}
+    sink.upsert_batch([record('1', [{'regno': 'AB123'}])])
+
+    assert len(client.documents) == 2
+    assert client.delete_calls == []
+
+
+
+def test_children_of_parents_in_a_rejected_request_are_not_cleaned_up():
+    client = FakeOpenSearchClient()
+    make_sink(client, child_id_fields=['regno']).upsert_batch([record('1', [{'regno': 'AB123'}, {'regno': 'CD456'}])])
+
+    sink = make_sink(client, child_id_fields=['regno'], delete_stale_children=True)
+    sink.config = sink.config.model_copy(update={'bulk_max_retries': 1, 'bulk_retry_base_delay': 0.001})
+    client.reject_requests = 100
+    result = sink.upsert_batch([record('1', [{'regno': 'EF789'}])])
+
+    assert [failure.data['orgno'] for failure in result.failures] == ['1']
+    assert sorted(source['doc']['regno'] for source in client.documents.values()) == ['AB123', 'CD456']
+    assert client.delete_calls == []
+
+def test_failed_stale_delete_keeps_the_written_records():
+    class FailingDeleteClient(FakeOpenSearchClient):
+        def delete_by_query(self, index, body, routing=None, **kwargs):
+            raise TransportError(500, 'search_phase_execution_exception', {})
+
+    client = FailingDeleteClient()
+    result = make_sink(client, child_id_fields=['regno'], delete_stale_children=True).upsert_batch([
+        record('1', [{'regno': 'AB123'}])
+    ])
+
+    assert result.successful_records == 1 and result.failed_records == 0
+    assert result.failures == []
+    assert result.metrics['stale_delete_failures'] == 1
+
+
+def test_stale_delete_queries_stay_under_the_clause_limit():
+    client = FakeOpenSearchClient()
+    batch = [record(str(orgno), [{'regno': f"R{orgno}"}]) for orgno in range(1200)]
+    make_sink(client, child_id_fields=['regno'], delete_stale_children=True).upsert_batch(batch)
+
+    assert len(client.delete_calls) == 3
+    assert all(len(call['body']['query']['bool']['should']) <= 500 for call in client.delete_calls)
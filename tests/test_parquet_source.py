@@ -0,0 +1,51 @@
+import datetime
+import io
+import pytest
+from fakes import FakeAthenaClient, FakeS3Client
+from etl_athena_to_es_dynamodb.athena_source import AthenaDataSource
+from etl_athena_to_es_dynamodb.batch_processor import SimpleBatchProcessor
+from etl_athena_to_es_dynamodb.models import AWSConfig, AthenaConfig, DataRecord
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+
+
+def parquet_bytes(rows, row_group_size):
+    table = pa.Table.from_pylist(rows)
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, row_group_size=row_group_size)
+    return buffer.getvalue()
+
+
+def test_unload_mode_yields_one_batch_per_row_group():
+    rows = [
+        {'orgno': str(i), 'child_data': [{'brand': 'Volvo', 'first_in_traffic_date': datetime.date(2020, 1, i + 1)}]}
+        for i in range(5)
+    ]
+    s3 = FakeS3Client()
+    s3.put_object(Bucket='results', Key='unload/run1/part-0.parquet', Body=parquet_bytes(rows, row_group_size=2))
+    athena = FakeAthenaClient([], [])
+    source = AthenaDataSource(
+        AWSConfig(region='eu-north-1'),
+        AthenaConfig(database='db', table='t', s3_output_location='s3://results/',
+                     unload_to_parquet=True, unload_location='s3://results/unload/run1')
+    )
+    source._athena_client = athena
+    source._s3_client = s3
+
+    batches = list(source.fetch_batches('SELECT * FROM t'))
+
+    assert athena.started_queries[0].startswith('UNLOAD (SELECT * FROM t)')
+    assert [len(b) for b in batches] == [2, 2, 1]
+    assert batches[0][0].to_dict() == {
+        'orgno': '0', 'child_data': [{'brand': 'Volvo', 'first_in_traffic_date': '2020-01-01'}]
+    }
+
+
+def test_process_record_batches_only_slices_oversized_batches():
+    batches = [[DataRecord.from_dict({'orgno': str(i)}) for i in range(n)] for n in (3, 7, 0, 2)]
+
+    result = list(SimpleBatchProcessor().process_record_batches(iter(batches), batch_size=4))
+
+    assert [len(b) for b in result] == [3, 4, 3, 2]
+    assert result[0] is batches[0]
@@ -0,0 +1,76 @@
+import threading
+import time
+import pytest
+from fakes import ListDataSource, RecordingSink
+from etl_athena_to_es_dynamodb.batch_processor import SimpleBatchProcessor
+from etl_athena_to_es_dynamodb.exceptions import DataPipelineError
+from etl_athena_to_es_dynamodb.interfaces import DataSource
+from etl_athena_to_es_dynamodb.models import BatchConfig, BatchResult, DataRecord
+from etl_athena_to_es_dynamodb.pipeline import DataPipeline
+
+ROWS = [{'orgno': str(i)} for i in range(100)]
+
+
+class SlowSink(RecordingSink):
+    """Blocks each write until released, to stand in for a sink that falls behind"""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def upsert_batch(self, records):
+        self.release.wait(timeout=5)
+        return super().upsert_batch(records)
+
+
+class FailingSource(DataSource):
+    def fetch_data(self, query):
+        yield DataRecord(data={'orgno': '1'})
+        raise RuntimeError('source broke')
+
+    def close(self):
+        pass
+
+
+class CompletionRecorder(SimpleBatchProcessor):
+    def __init__(self):
+        super().__init__()
+        self.completed = []
+
+    def on_batch_completed(self, batch, sink_results):
+        self.completed.append(sorted(sink_results))
+
+
+def test_fast_sink_is_not_gated_by_slow_sink():
+    fast, slow = RecordingSink(), SlowSink()
+    pipeline = DataPipeline(ListDataSource(ROWS), [fast, slow], SimpleBatchProcessor(),
+                            BatchConfig(batch_size=10, max_workers=2, queue_depth=20))
+    runner = threading.Thread(target=pipeline.execute, args=('SELECT 1',))
+    runner.start()
+
+    deadline = time.monotonic() + 5
+    while len(fast.received) < len(ROWS) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(fast.received) == len(ROWS)
+    assert slow.received == []
+
+    slow.release.set()
+    runner.join(timeout=5)
+    assert len(slow.received) == len(ROWS)
+
+
+def test_every_batch_is_reported_once_all_sinks_wrote_it():
+    processor = CompletionRecorder()
+    slow = SlowSink()
+    slow.release.set()
+    aggregated = DataPipeline(ListDataSource(ROWS), [RecordingSink(), slow], processor,
+                              BatchConfig(batch_size=7, max_workers=4, queue_depth=2)).execute('SELECT 1')
+
+    assert aggregated['total_processed_batches'] == 15
+    assert processor.completed == [['RecordingSink', 'SlowSink']] * 15
+    assert aggregated['sinks']['SlowSink']['successful_records'] == len(ROWS)
+
+
+def test_source_errors_fail_the_run():
+    with pytest.raises(DataPipelineError, match='source broke'):
+        DataPipeline(FailingSource(), [RecordingSink()], SimpleBatchProcessor(), BatchConfig()).execute('SELECT 1')
@@ -0,0 +1,89 @@
+import time
+import asyncio
+from fakes import FakeAthenaClient, FakeS3Client, to_athena_csv
+from etl_athena_to_es_dynamodb.async_athena_source import AsyncAthenaDataSource
+from etl_athena_to_es_dynamodb.athena_source import AthenaDataSource
+from etl_athena_to_es_dynamodb.models import AWSConfig, AthenaConfig
+from etl_athena_to_es_dynamodb.query_cache import QueryResultCache
+from etl_athena_to_es_dynamodb.telemetry import Telemetry
+
+
+def test_fingerprint_ignores_whitespace_but_not_kind():
+    a = QueryResultCache.fingerprint("SELECT *\n  FROM t;", 'csv')
+
+    assert a == QueryResultCache.fingerprint("SELECT * FROM t", 'csv')
+    assert a != QueryResultCache.fingerprint("SELECT * FROM t", 'parquet')
+
+
+def test_cache_expires_and_evicts_least_recently_used(tmp_path):
+    path = str(tmp_path / 'cache.json')
+    cache = QueryResultCache(path, ttl_seconds=60, max_entries=2)
+    cache.put('a', 'qid-a', 's3://r/a.csv')
+    cache.put('b', 'qid-b', 's3://r/b.csv')
+    cache.get('a')
+    cache.put('c', 'qid-c', 's3://r/c.csv')
+
+    reloaded = QueryResultCache(path, ttl_seconds=60, max_entries=2)
+    assert reloaded.get('b') is None
+    assert reloaded.get('a')['query_execution_id'] == 'qid-a'
+
+    reloaded.ttl_seconds = 0
+    time.sleep(0.01)
+    assert reloaded.get('c') is None
+
+
+def test_retry_reads_cached_results_without_rerunning_the_query(tmp_path):
+    def make_source():
+        source = AthenaDataSource(
+            AWSConfig(region='eu-north-1'),
+            AthenaConfig(database='db', table='t', s3_output_location='s3://results/',
+                         result_reuse_max_age_minutes=60, result_cache_path=str(tmp_path / 'cache.json'))
+        )
+        source._athena_client = athena
+        source._s3_client = s3
+        return source
+
+    athena = FakeAthenaClient(['orgno'], [['1'], ['2']])
+    s3 = FakeS3Client()
+    s3.put_object(Bucket='results', Key='query.csv', Body=to_athena_csv(['orgno'], [['1'], ['2']]))
+
+    first = make_source()
+    assert len(list(first.fetch_data('SELECT orgno FROM t'))) == 2
+    second = make_source()
+    assert len(list(second.fetch_data('SELECT  orgno\nFROM t'))) == 2
+
+    assert len(athena.started_queries) == 1
+    assert athena.start_kwargs[0]['ResultReuseConfiguration']['ResultReuseByAgeConfiguration']['MaxAgeInMinutes'] == 60
+    assert first.get_statistics()['result_cache'] == {'hits': 0, 'misses': 1, 'athena_reused': 0}
+    assert second.get_statistics()['result_cache'] == {'hits': 1, 'misses': 0, 'athena_reused': 0}
+
+
+def test_async_source_keeps_the_cache_and_query_accounting(tmp_path):
+    telemetry = Telemetry()
+    athena = FakeAthenaClient(['orgno'], [['1'], ['2']])
+    s3 = FakeS3Client()
+    s3.put_object(Bucket='results', Key='query.csv', Body=to_athena_csv(['orgno'], [['1'], ['2']]))
+
+    def fetch(**cache):
+        source = AthenaDataSource(
+            AWSConfig(region='eu-north-1'),
+            AthenaConfig(database='db', table='t', s3_output_location='s3://results/',
+                         result_reuse_max_age_minutes=60, **cache),
+            telemetry
+        )
+        source._athena_client = athena
+        source._s3_client = s3
+        async_source = AsyncAthenaDataSource(source)
+
+        async def collect():
+            return [batch async for batch in async_source.fetch_batches('SELECT orgno FROM t', 10)]
+        return sum(len(batch) for batch in asyncio.run(collect())), async_source.get_statistics()
+
+    assert fetch() == (2, {'result_cache': {'hits': 0, 'misses': 0, 'athena_reused': 0}})
+    assert telemetry.histogram('athena_query_wait_seconds').count == 1
+    assert telemetry.counter_value('athena_data_scanned_bytes') == 1024
+
+    cache_path = str(tmp_path / 'cache.json')
+    assert fetch(result_cache_path=cache_path) == (2, {'result_cache': {'hits': 0, 'misses': 1, 'athena_reused': 0}})
+    assert fetch(result_cache_path=cache_path) == (2, {'result_cache': {'hits': 1, 'misses': 0, 'athena_reused': 0}})
+    assert len(athena.started_queries) == 2
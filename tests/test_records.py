@@ -0,0 +1,84 @@
+import pickle
+from boto3.dynamodb.types import TypeSerializer
+from fakes import FakeAthenaClient, FakeS3Client, FakeDynamoDBResource, to_athena_csv
+from etl_athena_to_es_dynamodb.athena_source import AthenaDataSource
+from etl_athena_to_es_dynamodb.dynamodb_sink import DynamoDBDataSink
+from etl_athena_to_es_dynamodb.opensearch_actions import OpenSearchActionBuilder
+from etl_athena_to_es_dynamodb.models import AWSConfig, AthenaConfig, DynamoDBConfig, DocumentConfig, DataRecord, Record
+
+ROW = {'orgno': '7', 'child_data': '[{"brand": "Volvo"}]'}
+
+
+def count_conversions(monkeypatch):
+    calls = []
+    convert = DataRecord.convert_object_to_dict
+
+    def counting(obj):
+        calls.append(obj)
+        return convert(obj)
+
+    monkeypatch.setattr(DataRecord, 'convert_object_to_dict', staticmethod(counting))
+    return calls
+
+
+def test_record_parses_once_however_many_sinks_read_it(monkeypatch):
+    calls = count_conversions(monkeypatch)
+    record = Record.from_dict(dict(ROW))
+    document_config = DocumentConfig(document_type='child', child_relation_type='vehicle')
+
+    actions = list(OpenSearchActionBuilder(document_config).iter_actions([record], 'vehicles', {}))
+    request = DynamoDBDataSink.update_item_request('vehicles', record, TypeSerializer())
+
+    assert len(calls) == 1
+    assert actions[0]['doc']['brand'] == 'Volvo'
+    assert request['Key'] == {'orgno': {'N': '7'}}
+    assert record.to_dict() is record.to_dict()
+
+
+def test_strict_data_record_also_caches_its_parsed_form(monkeypatch):
+    calls = count_conversions(monkeypatch)
+    record = DataRecord.from_dict(dict(ROW))
+
+    assert record.to_dict() is record.to_dict()
+    assert len(calls) == 1
+    assert record == DataRecord.from_dict(dict(ROW))
+
+
+def test_record_is_compact_and_picklable():
+    record = Record.from_dict(dict(ROW))
+
+    assert not hasattr(record, '__dict__')
+    assert pickle.loads(pickle.dumps(record)).to_dict() == record.to_dict()
+
+
+def test_batch_write_does_not_mutate_the_shared_parsed_form():
+    sink = DynamoDBDataSink(
+        AWSConfig(region='eu-north-1'),
+        DynamoDBConfig(table_name='vehicles', overwrite_by_pkeys=['orgno']),
+        DocumentConfig(document_type='parent', child_relation_type='vehicle')
+    )
+    sink._resource = FakeDynamoDBResource()
+    record = Record.from_dict(dict(ROW))
+
+    assert sink.upsert_batch([record]).successful_records == 1
+    assert record.to_dict()['orgno'] == '7'
+
+
+def fetch(strict_records):
+    athena = FakeAthenaClient(['orgno'], [['1'], ['2']])
+    s3 = FakeS3Client()
+    s3.put_object(Bucket='results', Key='query.csv', Body=to_athena_csv(['orgno'], [['1'], ['2']]))
+    source = AthenaDataSource(
+        AWSConfig(region='eu-north-1'),
+        AthenaConfig(database='db', table='t', s3_output_location='s3://results/', strict_records=strict_records)
+    )
+    source._athena_client = athena
+    source._s3_client = s3
+    return list(source.fetch_data('SELECT orgno FROM t'))
+
+
+def test_source_yields_lightweight_records_unless_strict():
+    assert all(type(record) is Record for record in fetch(strict_records=False))
+    strict = fetch(strict_records=True)
+    assert all(type(record) is DataRecord for record in strict)
+    assert [record.to_dict() for record in strict] == [{'orgno': '1'}, {'orgno': '2'}]
@@ -0,0 +1,97 @@
+import json
+import pytest
+from fakes import FakeAthenaClient, FakeS3Client, to_athena_csv
+from etl_athena_to_es_dynamodb.athena_source import AthenaDataSource
+from etl_athena_to_es_dynamodb.exceptions import DataSourceError
+from etl_athena_to_es_dynamodb.models import AWSConfig, AthenaConfig
+from etl_athena_to_es_dynamodb.s3_result_reader import S3ResultReader, ParallelS3ResultReader
+
+HEADERS = ['orgno', 'child_data']
+ROWS = [
+    ['5592902331', json.dumps([{'brand': 'Volvo', 'vehicle_type': 'Lätt lastbil'}], ensure_ascii=False)],
+    ['2021000076', '[{"brand": "Saab",\n"note": "multi\nline"}]'],
+    ['5560000000', ''],
+]
+
+
+def make_source(result_reader='auto', store=True):
+    athena = FakeAthenaClient(HEADERS, ROWS)
+    s3 = FakeS3Client()
+    if store:
+        s3.put_object(Bucket='results', Key='query.csv', Body=to_athena_csv(HEADERS, ROWS))
+    source = AthenaDataSource(
+        AWSConfig(region='eu-north-1'),
+        AthenaConfig(database='db', table='t', s3_output_location='s3://results/', result_reader=result_reader)
+    )
+    source._athena_client = athena
+    source._s3_client = s3
+    return source, s3
+
+
+def test_reader_reassembles_rows_across_small_ranges():
+    s3 = FakeS3Client()
+    s3.put_object(Bucket='results', Key='query.csv', Body=to_athena_csv(HEADERS, ROWS))
+    reader = S3ResultReader(s3, 's3://results/query.csv', chunk_size=5)
+
+    rows = list(reader.iter_rows())
+
+    assert rows == [HEADERS] + ROWS
+    assert len(s3.get_calls) > 1
+
+
+def test_s3_mode_yields_same_records_as_api_mode():
+    s3_source, s3 = make_source('s3')
+    api_source, _ = make_source('api')
+
+    s3_records = [r.to_dict() for r in s3_source.fetch_data('SELECT 1')]
+    api_records = [r.to_dict() for r in api_source.fetch_data('SELECT 1')]
+
+    assert s3_records == api_records
+    assert s3_records[0]['child_data'][0]['vehicle_type'] == 'Lätt lastbil'
+    assert s3.get_calls
+
+
+def test_auto_mode_falls_back_to_api_when_object_is_unreadable():
+    source, s3 = make_source('auto', store=False)
+
+    records = list(source.fetch_data('SELECT 1'))
+
+    assert len(records) == len(ROWS)
+    assert s3.get_calls == []
+
+
+def test_s3_mode_does_not_fall_back():
+    source, _ = make_source('s3', store=False)
+
+    with pytest.raises(DataSourceError):
+        list(source.fetch_data('SELECT 1'))
+
+
+def parallel_reader(body, preserve_order, chunk_size=16):
+    s3 = FakeS3Client()
+    s3.put_object(Bucket='results', Key='query.csv', Body=body)
+    return ParallelS3ResultReader(s3, 's3://results/query.csv', chunk_size,
+                                  concurrency=3, max_inflight_ranges=2, preserve_order=preserve_order)
+
+
+def test_parallel_reader_preserves_order():
+    reader = parallel_reader(to_athena_csv(HEADERS, ROWS), preserve_order=True)
+
+    assert list(reader.iter_rows()) == [HEADERS] + ROWS
+
+
+def test_parallel_reader_unordered_yields_every_row_once():
+    rows = [[str(i), f'[{{"brand": "Bränd {i}"}}]'] for i in range(200)]
+    reader = parallel_reader(to_athena_csv(HEADERS, rows), preserve_order=False, chunk_size=37)
+
+    result = list(reader.iter_rows())
+
+    assert result[0] == HEADERS
+    assert sorted(result[1:]) == sorted(rows)
+
+
+def test_parallel_reader_unordered_rejects_embedded_newlines():
+    reader = parallel_reader(to_athena_csv(HEADERS, ROWS), preserve_order=False, chunk_size=40)
+
+    with pytest.raises(DataSourceError):
+        list(reader.iter_rows())
@@ -0,0 +1,73 @@
+import time
+import pytest
+from fakes import FakeAthenaClient, FakeS3Client
+from etl_athena_to_es_dynamodb.athena_source import AthenaDataSource
+from etl_athena_to_es_dynamodb.exceptions import DataSourceError
+from etl_athena_to_es_dynamodb.models import AWSConfig, AthenaConfig, ShardConfig
+from etl_athena_to_es_dynamodb.sharded_athena_source import ShardedAthenaDataSource
+from etl_athena_to_es_dynamodb.utils import get_athena_source_query
+
+
+def make_source(shard_config, **athena_kwargs):
+    source = AthenaDataSource(
+        AWSConfig(region='eu-north-1'),
+        AthenaConfig(database='db', table='t', s3_output_location='s3://results/', result_reader='api',
+                     poll_initial_interval=0.001)
+    )
+    source._athena_client = FakeAthenaClient(['orgno'], [[str(i)] for i in range(1200)], **athena_kwargs)
+    source._s3_client = FakeS3Client()
+    return ShardedAthenaDataSource(source, shard_config)
+
+
+def test_mod_shards_filter_inside_the_source_query():
+    sharded = make_source(ShardConfig(strategy='mod', shard_count=3))
+    query = get_athena_source_query()
+
+    shard_queries = [sharded.build_shard_query(query, p) for p in sharded.shard_predicates()]
+
+    assert len(set(shard_queries)) == 3
+    assert "AND (coalesce(mod(try_cast(Orgnr AS bigint), 3), 0) = 2)" in shard_queries[2]
+
+
+def test_value_shards_support_ranges_and_wrap_queries_without_placeholder():
+    sharded = make_source(ShardConfig(strategy='values', shard_key='d', shard_values=['2025-08-01..2025-08-15', '2025-08-16']))
+
+    predicates = sharded.shard_predicates()
+
+    assert predicates == ["d BETWEEN '2025-08-01' AND '2025-08-15'", "d = '2025-08-16'"]
+    assert sharded.build_shard_query('SELECT d FROM t;', predicates[1]) == "SELECT * FROM (\nSELECT d FROM t\n) WHERE d = '2025-08-16'"
+
+
+def test_merge_streams_every_shard_and_reports_progress():
+    sharded = make_source(ShardConfig(strategy='mod', shard_count=4, max_concurrent_queries=2, queue_size=1))
+
+    records = list(sharded.fetch_data(get_athena_source_query()))
+
+    # The fake ignores predicates, so every shard returns the full result
+    assert len(records) == 4 * 1200
+    shards = sharded.get_statistics()['shards']
+    assert [s['state'] for s in shards] == ['completed'] * 4
+    assert [s['records'] for s in shards] == [1200] * 4
+
+
+def test_failed_shard_fails_the_merge():
+    sharded = make_source(ShardConfig(strategy='mod', shard_count=2), final_state='FAILED')
+
+    with pytest.raises(DataSourceError, match='Shard'):
+        list(sharded.fetch_data('SELECT 1'))
+
+
+def test_abandoned_merge_stops_the_shard_queries_still_running():
+    sharded = make_source(ShardConfig(strategy='mod', shard_count=2, queue_size=1), stuck_queries={'qid-2'})
+    client = sharded.athena_source.athena_client
+
+    records = sharded.fetch_data('SELECT 1')
+    next(records)
+    records.close()
+
+    assert 'qid-2' in client.stopped_queries
+    stuck = next(s for s in sharded.shard_progress if s.query_execution_id == 'qid-2')
+    deadline = time.monotonic() + 5
+    while stuck.state == 'running' and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert stuck.state == 'failed'
@@ -0,0 +1,109 @@
+import io
+import json
+import asyncio
+from fakes import FakeAsyncDynamoDBClient, FakeAsyncOpenSearchClient, FakeOpenSearchClient, FakeDynamoDBResource, ListDataSource
+from etl_athena_to_es_dynamodb.async_dynamodb_sink import AsyncDynamoDBDataSink
+from etl_athena_to_es_dynamodb.async_opensearch_sink import AsyncOpenSearchDataSink
+from etl_athena_to_es_dynamodb.batch_processor import SimpleBatchProcessor
+from etl_athena_to_es_dynamodb.dynamodb_sink import DynamoDBDataSink
+from etl_athena_to_es_dynamodb.models import AWSConfig, BatchConfig, DataRecord, OpenSearchConfig, DynamoDBConfig, DocumentConfig
+from etl_athena_to_es_dynamodb.opensearch_sink import OpenSearchDataSink
+from etl_athena_to_es_dynamodb.pipeline import DataPipeline
+from etl_athena_to_es_dynamodb.telemetry import Telemetry, LATENCY_BUCKETS
+from etl_athena_to_es_dynamodb.telemetry_exporters import PrometheusTextFileExporter, EMFExporter
+
+ROWS = [{'orgno': str(i), 'brand': 'Volvo'} for i in range(10)]
+DOCUMENT_CONFIG = DocumentConfig(document_type='parent', child_relation_type='vehicle')
+
+
+def run(telemetry):
+    search = OpenSearchDataSink(OpenSearchConfig(endpoint='localhost', index_name='idx'), DOCUMENT_CONFIG, telemetry)
+    search._client = FakeOpenSearchClient()
+    table = DynamoDBDataSink(AWSConfig(region='eu-north-1'),
+                             DynamoDBConfig(table_name='vehicles', overwrite_by_pkeys=['orgno']),
+                             DOCUMENT_CONFIG, telemetry)
+    table._resource = FakeDynamoDBResource()
+    pipeline = DataPipeline(ListDataSource(ROWS), [search, table], SimpleBatchProcessor(telemetry),
+                            BatchConfig(batch_size=4, max_workers=2), telemetry=telemetry)
+    return pipeline.execute('SELECT 1')
+
+
+def test_run_summary_reports_throughput_per_sink():
+    results = run(Telemetry())
+
+    assert results['elapsed_seconds'] > 0
+    for sink_name in ('OpenSearchDataSink', 'DynamoDBDataSink'):
+        sink = results['sinks'][sink_name]
+        assert sink['bytes_written'] > 0
+        assert sink['records_per_second'] > 0
+        assert sink['mb_per_second'] >= 0
+
+
+def test_stages_are_measured_and_written_for_prometheus(tmp_path):
+    path = tmp_path / 'etl.prom'
+    telemetry = Telemetry([PrometheusTextFileExporter(str(path))])
+    run(telemetry)
+
+    assert telemetry.counter_value('source_records') == 10
+    assert telemetry.histogram('batch_records').count == 3
+    assert telemetry.histogram('sink_write_seconds', sink='DynamoDBDataSink').count == 3
+    assert telemetry.histogram('opensearch_bulk_request_seconds').count == 3
+    assert telemetry.histogram('dynamodb_request_seconds', operation='BatchWriteItem').count == 3
+
+    text = path.read_text()
+    assert '# TYPE etl_sink_write_seconds histogram' in text
+    assert 'etl_sink_write_seconds_bucket{sink="OpenSearchDataSink",le="+Inf"} 3' in text
+    assert 'etl_sink_records_total{outcome="success",sink="DynamoDBDataSink"} 10' in text
+    assert 'etl_pipeline_transform_seconds_count' in text
+
+
+def test_emf_documents_carry_labels_as_dimensions():
+    telemetry = Telemetry()
+    telemetry.increment('sink_bytes', 2048, sink='OpenSearchDataSink')
+    for seconds in (0.02, 0.03, 4.0):
+        telemetry.observe('sink_write_seconds', seconds, LATENCY_BUCKETS, sink='OpenSearchDataSink')
+    stream = io.StringIO()
+
+    EMFExporter('Etl', stream).export(telemetry.snapshot())
+
+    [document] = [json.loads(line) for line in stream.getvalue().splitlines()]
+    metrics = document['_aws']['CloudWatchMetrics'][0]
+    assert metrics['Namespace'] == 'Etl'
+    assert metrics['Dimensions'] == [['sink']]
+    assert {'Name': 'sink_bytes', 'Unit': 'Bytes'} in metrics['Metrics']
+    assert document['sink'] == 'OpenSearchDataSink'
+    assert document['sink_write_seconds_count'] == 3
+    assert document['sink_write_seconds_max'] == 4.0
+    assert document['sink_write_seconds_p99'] == 4.0
+
+
+def test_failing_exporter_does_not_fail_the_run():
+    class BrokenExporter(PrometheusTextFileExporter):
+        def export(self, snapshot):
+            raise OSError('disk full')
+
+    results = run(Telemetry([BrokenExporter('unused.prom')]))
+
+    assert results['sinks']['OpenSearchDataSink']['successful_records'] == 10
+
+
+def test_async_sinks_emit_the_same_request_metrics():
+    telemetry = Telemetry()
+    search = AsyncOpenSearchDataSink(OpenSearchConfig(endpoint='localhost', index_name='idx', bulk_max_actions=4,
+                                                      bulk_retry_base_delay=0.001), DOCUMENT_CONFIG, telemetry)
+    search._client = FakeAsyncOpenSearchClient(reject_attempts=1)
+    table = AsyncDynamoDBDataSink(AWSConfig(region='eu-north-1'),
+                                  DynamoDBConfig(table_name='vehicles', batch_write_base_delay=0.001),
+                                  DOCUMENT_CONFIG, telemetry)
+    table._client = FakeAsyncDynamoDBClient(throttle_first=2)
+    records = [DataRecord(data=row) for row in ROWS]
+
+    async def write():
+        return await asyncio.gather(search.upsert_batch(records), table.upsert_batch(records))
+
+    assert [result.failed_records for result in asyncio.run(write())] == [0, 0]
+    assert telemetry.histogram('opensearch_bulk_request_seconds').count == 6
+    assert telemetry.histogram('opensearch_bulk_request_actions').sum == 2 * len(ROWS)
+    assert telemetry.counter_value('opensearch_bulk_rejected_actions') == len(ROWS)
+    assert telemetry.histogram('dynamodb_request_seconds', operation='UpdateItem').count == len(ROWS) + 2
+    assert telemetry.counter_value('dynamodb_throttled_requests', operation='UpdateItem') == 2
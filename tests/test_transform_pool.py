@@ -0,0 +1,47 @@
+import json
+from fakes import ListDataSource, RecordingSink
+from etl_athena_to_es_dynamodb.batch_processor import SimpleBatchProcessor
+from etl_athena_to_es_dynamodb.change_detector import ChangeDetectingBatchProcessor
+from etl_athena_to_es_dynamodb.models import BatchConfig, ChangeDetectionConfig
+from etl_athena_to_es_dynamodb.pipeline import DataPipeline
+from etl_athena_to_es_dynamodb.transform_pool import ProcessPoolTransformProcessor
+
+ROWS = [{'orgno': str(i), 'child_data': json.dumps([{'regno': f'R{i}-{j}'} for j in range(3)]),
+         'other': "[{'python': 'literal'}]"} for i in range(60)]
+
+
+def run(ordered):
+    sink = RecordingSink()
+    processor = ProcessPoolTransformProcessor(SimpleBatchProcessor(), workers=2, ordered=ordered)
+    results = DataPipeline(ListDataSource(ROWS), [sink], processor,
+                           BatchConfig(batch_size=7, max_workers=1)).execute('SELECT 1')
+    return sink, results
+
+
+def test_records_arrive_parsed_and_in_order():
+    sink, results = run(ordered=True)
+
+    assert [r.data['orgno'] for r in sink.received] == [row['orgno'] for row in ROWS]
+    first = sink.received[0]
+    assert first._parsed is not None  # Seeded by the worker, not parsed in the sink
+    assert first.to_dict()['child_data'] == [{'regno': 'R0-0'}, {'regno': 'R0-1'}, {'regno': 'R0-2'}]
+    assert first.to_dict()['other'] == [{'python': 'literal'}]
+    assert results['batch_processor']['transform'] == {'transformed_batches': 9, 'transformed_records': 60}
+
+
+def test_unordered_mode_delivers_every_record():
+    sink, _ = run(ordered=False)
+    assert sorted(int(r.data['orgno']) for r in sink.received) == list(range(60))
+
+
+def test_change_detection_over_the_pool_keeps_its_statistics_and_shuts_it_down(tmp_path):
+    pool = ProcessPoolTransformProcessor(SimpleBatchProcessor(), workers=2)
+    processor = ChangeDetectingBatchProcessor(
+        pool, ChangeDetectionConfig(digest_store_path=str(tmp_path / 'digests.sqlite3')), namespace='test'
+    )
+    results = DataPipeline(ListDataSource(ROWS), [RecordingSink()], processor,
+                           BatchConfig(batch_size=7, max_workers=1)).execute('SELECT 1')
+
+    assert results['batch_processor']['transform'] == {'transformed_batches': 9, 'transformed_records': 60}
+    assert results['batch_processor']['change_detection']['committed_records'] == 60
+    assert pool._executor is None